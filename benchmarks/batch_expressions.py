@@ -0,0 +1,60 @@
+"""
+Compares evaluating one formula across many variable bindings with Parser, with compiled expressions and with a single
+vectorised batch evaluation (requires numpy).
+
+Usage: python -m benchmarks.batch_expressions [binding count]
+"""
+import sys
+import time
+
+import numpy
+
+from utils.expressions import compile_expression
+from utils.string_utils import Parser
+
+XP_CURVE = "base * level * level / (1 + level / scale) - bonus / level"
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print("{:<24} {:10.3f} ms".format(label, (time.perf_counter() - start) * 1000.0))
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    # Every 1000th level is 0 so we exercise the per element division by zero reporting
+    levels = numpy.arange(count, dtype=float) % 1000
+    bonuses = numpy.linspace(0.0, 50.0, count)
+    bindings = [{"base": 100, "level": levels[i], "scale": 20, "bonus": bonuses[i]} for i in range(count)]
+
+    def with_parser():
+        values = list()
+        for variables in bindings:
+            try:
+                values.append(Parser(XP_CURVE, variables).getValue())
+            except Exception:
+                values.append(None)
+        return values
+
+    def with_compiled():
+        compiled = compile_expression(XP_CURVE)
+        values = list()
+        for variables in bindings:
+            try:
+                values.append(compiled.evaluate(variables))
+            except Exception:
+                values.append(None)
+        return values
+
+    print("Bindings: " + str(count))
+    timed("Parser", with_parser)
+    timed("Compiled", with_compiled)
+    values, errors = timed("Batch", lambda: compile_expression(XP_CURVE).evaluate_batch({"base": 100, "level": levels, "scale": 20, "bonus": bonuses}))
+    print("Division by zero errors: " + str(len(errors)))
+
+
+if __name__ == '__main__':
+    main()
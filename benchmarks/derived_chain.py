@@ -0,0 +1,65 @@
+"""
+Measures derived property evaluation over dependency chains: one entry whose properties each depend on the previous one,
+and a chain of entries in separate categories that each depend on the previous category's live entry.
+
+Usage: python -m benchmarks.derived_chain [chain depth]
+"""
+import sys
+import time
+
+from data.categories import Category, CategoryProperty
+from data.entries import Entry
+from engine import LitRPGEngine
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print("{:<40} {:10.3f} ms".format(label, (time.perf_counter() - start) * 1000.0))
+    return result
+
+
+def build_local_chain(engine, depth):
+    properties = [CategoryProperty("p0", False)] + [CategoryProperty("p" + str(i), False, "p" + str(i - 1) + " + 1") for i in range(1, depth)]
+    engine.add_category(Category("Local Chain", properties, "{0}", "{0}"))
+    engine.add_entry(Entry("Local Chain", ["0"] + [""] * (depth - 1)))
+    return engine.get_entry_key_by_index(engine.get_history_index())
+
+
+def build_remote_chain(engine, depth):
+    engine.add_category(Category("Link 0", [CategoryProperty("v", False)], "{0}", "{0}"))
+    for i in range(1, depth):
+        engine.add_category(Category("Link " + str(i), [CategoryProperty("v", False, "link_" + str(i - 1) + "__v + 1")], "{0}", "{0}"))
+
+    keys = list()
+    with engine.batch():
+        for i in range(depth):
+            engine.add_entry(Entry("Link " + str(i), ["0" if i == 0 else ""]))
+            keys.append(engine.get_entry_key_by_index(engine.get_history_index()))
+    return keys
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    engine = LitRPGEngine()
+    engine.add_character("Benchmark")
+
+    print("Chain depth: " + str(depth))
+    key = build_local_chain(engine, depth)
+    timed("Local chain - cold", lambda: engine.get_derived_value(key, depth - 1))
+    timed("Local chain - cached", lambda: engine.get_derived_value(key, depth - 1))
+    engine.update_existing_entry_values(key, ["1"] + [""] * (depth - 1))
+    timed("Local chain - after editing the root", lambda: engine.get_derived_value(key, depth - 1))
+
+    keys = build_remote_chain(engine, depth)
+    timed("Entry chain - cold", lambda: engine.get_derived_value(keys[-1], 0))
+    timed("Entry chain - cached", lambda: engine.get_derived_value(keys[-1], 0))
+    engine.update_existing_entry_values(keys[0], ["1"])
+    timed("Entry chain - after editing the root", lambda: engine.get_derived_value(keys[-1], 0))
+    engine.update_existing_entry_values(key, ["2"] + [""] * (depth - 1))
+    timed("Entry chain - after an unrelated edit", lambda: engine.get_derived_value(keys[-1], 0))
+    timed("Entry chain - previous history index", lambda: engine.get_derived_value(keys[-2], 0, engine.get_history_index() - 1))
+
+
+if __name__ == '__main__':
+    main()
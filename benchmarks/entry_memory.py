@@ -0,0 +1,66 @@
+"""
+Measures the memory used by a synthetic session's entries with and without the columnar entry store.
+
+Usage: python -m benchmarks.entry_memory [entry count]
+"""
+import gc
+import json
+import random
+import sys
+import tracemalloc
+
+from data.entries import Entry
+from data.entry_ids import EntryIds
+from data.entry_store import EntryStore
+
+
+def build_session_json(entry_count, chain_length=20, seed=1):
+    # Revision chains where most updates only touch a short 'level' style field but carry a long description
+    random.seed(seed)
+    entry_ids = EntryIds()
+    entries = dict()
+    while len(entries) < entry_count:
+        description = " ".join(random.choice(["sword", "of", "the", "ancient", "king", "glows", "faintly"]) for _ in range(80))
+        parent_key = None
+        for revision in range(chain_length):
+            entry = Entry("Skills", ["Skill " + str(len(entries)), "Level: " + str(revision), description, ""], unique_key=entry_ids.allocate(), parent_key=parent_key, character=random.randint(0, 3))
+            data = entry_ids.export_entry(entry)
+            entries[data["unique_key"]] = data
+            parent_key = entry.unique_key
+            if len(entries) >= entry_count:
+                break
+
+    # Round trip so our strings are distinct objects, as they would be after loading a save file
+    return json.dumps(entries)
+
+
+def measure(session_json, columnar):
+    gc.collect()
+    tracemalloc.start()
+    entries = {key: Entry.from_json(data) for key, data in json.loads(session_json).items()}
+    entry_ids = EntryIds()  # Kept alive so the uuid mapping is counted, as it is in the engine
+    entries, _, _ = entry_ids.import_entries(entries, [], {})
+    if columnar:
+        store = EntryStore()
+        for entry in entries.values():
+            entry.attach(store)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+
+def main():
+    entry_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    session_json = build_session_json(entry_count)
+
+    plain, plain_peak = measure(session_json, False)
+    columnar, columnar_peak = measure(session_json, True)
+    print("Entries: " + str(entry_count))
+    print("Plain entries:    {:8.1f} MiB (peak {:8.1f} MiB)".format(plain / 2 ** 20, plain_peak / 2 ** 20))
+    print("Columnar entries: {:8.1f} MiB (peak {:8.1f} MiB)".format(columnar / 2 ** 20, columnar_peak / 2 ** 20))
+    print("Saving:           {:8.1f}%".format(100.0 * (plain - columnar) / plain))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures what delta encoded revisions save for a session - its snapshot size with revisions written in full vs as
+deltas, and the memory its entries take when every revision holds its own values vs shares its parent's unchanged ones.
+
+Usage: python -m benchmarks.revision_deltas [session path | entry count]
+"""
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.entry_memory import build_session_json
+from data.entries import Entry
+from data.revision_deltas import decode_entries, encode_entries
+from data.session_reader import is_legacy_session, read_session
+
+
+def build_session_file(entry_count):
+    # A minimal snapshot around the synthetic entries, written in full
+    entries = json.loads(build_session_json(entry_count))
+    data = {"credentials": None, "tags": dict(), "characters": ["A", "B", "C", "D"], "categories": dict(), "history": list(entries), "history_index": len(entries) - 1, "entries": entries}
+    session_file = tempfile.NamedTemporaryFile("w", suffix=".litrpg", delete=False)
+    with session_file:
+        json.dump(data, session_file, indent=4)
+    return session_file.name
+
+
+def measure_sizes(path):
+    # Both as our saves write them
+    with open(path, "r") as json_file:
+        data = json.load(json_file)
+    decode_entries(data["entries"])
+    full = len(json.dumps(data, indent=4).encode())
+    encode_entries(data["entries"])
+    encoded = len(json.dumps(data, indent=4).encode())
+    return full, encoded
+
+
+def measure_memory(path, shared):
+    gc.collect()
+    tracemalloc.start()
+    if shared:
+        entries = read_session(path)["entries"]
+    else:
+        with open(path, "r") as json_file:
+            entries = json.load(json_file)["entries"]
+        decode_entries(entries)
+        entries = {uuid_str: Entry.from_json(data) for uuid_str, data in entries.items()}
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entries
+    return current
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else "100000"
+    generated = not os.path.exists(argument)
+    path = build_session_file(int(argument)) if generated else argument
+    try:
+        if is_legacy_session(path):
+            print("Legacy sessions have no revision deltas - save it in the current format first.")
+            return
+
+        full, encoded = measure_sizes(path)
+        separate = measure_memory(path, False)
+        shared = measure_memory(path, True)
+        print("Session: " + (argument + " synthetic entries" if generated else path))
+        print("Full revisions file:  {:8.1f} MiB".format(full / 2 ** 20))
+        print("Delta revisions file: {:8.1f} MiB ({:.1f}% smaller)".format(encoded / 2 ** 20, 100.0 * (full - encoded) / full))
+        print("Separate values:      {:8.1f} MiB".format(separate / 2 ** 20))
+        print("Shared values:        {:8.1f} MiB ({:.1f}% smaller)".format(shared / 2 ** 20, 100.0 * (separate - shared) / separate))
+    finally:
+        if generated:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
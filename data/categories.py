@@ -1,7 +1,8 @@
 class CategoryProperty:
-    def __init__(self, property_name, requires_large_input_box):
+    def __init__(self, property_name, requires_large_input_box, expression=None):
         self.property_name = property_name
         self.requires_large_input_box = requires_large_input_box
+        self.expression = expression  # Parser syntax - if set this property is derived rather than user entered
 
     def get_property_name(self):
         return self.property_name
@@ -9,13 +10,19 @@ class CategoryProperty:
     def requires_large_input(self):
         return self.requires_large_input_box
 
+    def get_expression(self):
+        return self.expression
+
+    def is_derived(self):
+        return self.expression is not None and self.expression.strip() != ""
+
     @classmethod
     def from_json(cls, data):
         return cls(**data)
 
 
 class Category:
-    def __init__(self, name, properties, new_history_entry, update_history_entry, print_to_overview=False, can_change_over_time=True, is_singleton=False, notes_only=False):
+    def __init__(self, name, properties, new_history_entry, update_history_entry, print_to_overview=False, can_change_over_time=True, is_singleton=False, notes_only=False, modifications=None, modifiers=None):
         self.name = name
         self.properties = properties
         self.new_history_entry = new_history_entry
@@ -24,6 +31,14 @@ class Category:
         self.can_change_over_time = can_change_over_time
         self.is_singleton = is_singleton
         self.notes_only = notes_only
+        if modifications is None:
+            self.modifications = list()  # [State Variable, Expression] applied to the character's state by each entry
+        else:
+            self.modifications = modifications
+        if modifiers is None:
+            self.modifiers = list()  # [Stat, Operation, Expression, Stage] stacked onto the character's stat by each entry
+        else:
+            self.modifiers = modifiers
 
     def get_name(self):
         return self.name
@@ -40,6 +55,12 @@ class Category:
     def get_print_to_overview(self):
         return self.print_to_overview
 
+    def get_modifications(self):
+        return self.modifications
+
+    def get_modifiers(self):
+        return self.modifiers
+
     @classmethod
     def from_json(cls, data):
         properties = list(map(CategoryProperty.from_json, data["properties"]))
@@ -49,5 +70,13 @@ class Category:
             notes_only = data["notes_only"]
         else:
             notes_only = False
+        if "modifications" in data:
+            modifications = data["modifications"]
+        else:
+            modifications = None
+        if "modifiers" in data:
+            modifiers = data["modifiers"]
+        else:
+            modifiers = None
 
-        return cls(data["name"], properties, data["new_history_entry"], data["update_history_entry"], data["print_to_overview"], data["can_change_over_time"], data["is_singleton"], notes_only)
+        return cls(data["name"], properties, data["new_history_entry"], data["update_history_entry"], data["print_to_overview"], data["can_change_over_time"], data["is_singleton"], notes_only, modifications, modifiers)
@@ -4,9 +4,13 @@ from data.categories import Category
 from data.entries import Entry
 from data.tags import Tag
 
+# Version of the .litrpg snapshot format we write. Files without one are format 1, which predates revision deltas
+FORMAT_VERSION = 2
+
 
 class SerializationData:
-    def __init__(self, credentials: str, tags: Dict[str, Tag], characters: list, categories: Dict[str, Category], history: list, history_index: int, entries: Dict[str, Entry]):
+    def __init__(self, credentials: str, tags: Dict[str, Tag], characters: list, categories: Dict[str, Category], history: list, history_index: int, entries: Dict[str, Entry], journal: dict = None):
+        self.format_version = FORMAT_VERSION  # First so readers know how to read everything after it
         self.credentials = credentials
         self.tags = tags
         self.characters = characters
@@ -14,10 +18,12 @@ class SerializationData:
         self.history = history
         self.history_index = history_index
         self.entries = entries
+        self.journal = journal  # {"id": Journal ID, "seq": Last journal record included}, None for unjournaled saves
 
     @classmethod
     def from_json(cls, data):
         tags = dict(map(lambda v: (v[0], Tag.from_json(v[1])), data["tags"].items()))
         categories = dict(map(lambda v: (v[0], Category.from_json(v[1])), data["categories"].items()))
-        entries = dict(map(lambda v: (v[0], Entry.from_json(v[1])), data["entries"].items()))
-        return cls(data["credentials"], tags, data["characters"], categories, data["history"], data["history_index"], entries)
+        # Entries from a streaming read (or replayed into one from a journal) can already be Entry objects
+        entries = dict(map(lambda v: (v[0], v[1] if isinstance(v[1], Entry) else Entry.from_json(v[1])), data["entries"].items()))
+        return cls(data["credentials"], tags, data["characters"], categories, data["history"], data["history_index"], entries, data.get("journal", None))
@@ -0,0 +1,269 @@
+import re
+from collections import OrderedDict
+
+from utils.expressions import compile_expression
+
+IDENTIFIER_PATTERN = re.compile(r"(?<![0-9.A-Za-z_])[A-Za-z_][A-Za-z0-9_]*")
+CONSTANTS = ("pi", "e")
+
+
+def to_variable_name(name):
+    # How a category / property name is referred to from within an expression
+    return re.sub(r"[^a-z0-9_]", "_", name.strip().lower())
+
+
+def get_entry_variables(category, entry):
+    # Variable Name -> Value for each of the entry's numeric properties
+    properties = category.get_properties()
+    values = entry.get_values()
+    variables = dict()
+    for field_index in range(min(len(properties), len(values))):
+        try:
+            variables[to_variable_name(properties[field_index].get_property_name())] = float(values[field_index])
+        except (TypeError, ValueError):
+            continue
+    return variables
+
+
+def format_value(value):
+    if value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class DerivedValueError(Exception):
+    pass
+
+
+class DependencyCycleError(DerivedValueError):
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__("Derived properties depend on themselves: " + " -> ".join(str(node) for node in cycle))
+
+
+class DerivedValues:
+    """
+    Lazily evaluated derived (computed) category properties.
+
+    A derived property holds an expression in Parser syntax. Its variables are either a property of the same entry (e.g.
+    'strength') or a property of the live entry of another category for the same character ('stats__strength'). Each
+    (Entry Key, Property Index) is a node in a dependency graph. Values are cached per history index, as the entry
+    another category resolves to depends on where we are in history, along with the reverse edges of every evaluation.
+    When an entry changes only its nodes and those downstream of them are invalidated, while changes to the history
+    itself drop the caches from the mutation point onwards.
+    """
+
+    def __init__(self, engine, cached_indices=16):
+        self.engine = engine
+        self.cached_indices = cached_indices
+        self.states = OrderedDict()  # History Index -> (Node -> Value, Node -> Dependent Nodes, Remote Lookups), LRU
+        self.compiled = dict()  # Category -> [(CompiledExpression, [(Identifier, Target)]) or None per property]
+        self.remote_variables = None  # 'category__property' -> (Category, Property Index)
+
+    def clear(self):
+        self.states.clear()
+        self.compiled.clear()
+        self.remote_variables = None
+
+    def invalidate_from(self, index):
+        for cached_index in [cached_index for cached_index in self.states.keys() if cached_index >= index]:
+            del self.states[cached_index]
+
+    def invalidate_entry(self, unique_key):
+        # Walk the reverse edges from each of this entry's nodes, dropping everything downstream
+        entry = self.engine.get_entry(unique_key)
+        field_count = max(len(entry.get_values()), len(self.__get_compiled(entry.get_category())))
+        for values, dependents, _ in self.states.values():
+            pending = [(unique_key, field_index) for field_index in range(field_count)]
+            while len(pending) != 0:
+                node = pending.pop()
+                values.pop(node, None)
+                pending.extend(dependents.pop(node, ()))
+
+    def is_derived(self, unique_key, field_index):
+        compiled = self.__get_compiled(self.engine.get_entry(unique_key).get_category())
+        return field_index < len(compiled) and compiled[field_index] is not None
+
+    def get_value(self, unique_key, field_index, index):
+        values, dependents, remotes = self.__get_state(index)
+        node = (unique_key, field_index)
+        if node not in values:
+            self.__evaluate(node, index, values, dependents, remotes)
+
+        value = values[node]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def check_cycles(self):
+        """
+        Checks the property definitions of every category for cycles, regardless of the entries that exist. Raises
+        DependencyCycleError with the offending (Category, Property) path.
+        """
+        categories = self.engine.get_categories()
+        edges = dict()
+        for category_name in categories:
+            for field_index, compiled in enumerate(self.__get_compiled(category_name)):
+                edges[(category_name, field_index)] = list()
+                if compiled is None:
+                    continue
+                for _, target in compiled[1]:
+                    if target is not None:
+                        edges[(category_name, field_index)].append((target[0] or category_name, target[1]))
+
+        state = dict()  # Node -> 1 while on our path, 2 once finished
+        for start in edges:
+            if start in state:
+                continue
+            stack = [(start, iter(edges[start]))]
+            state[start] = 1
+            while len(stack) != 0:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    state[node] = 2
+                    stack.pop()
+                elif state.get(child) == 1:
+                    path = [entry[0] for entry in stack]
+                    cycle = path[path.index(child):] + [child]
+                    raise DependencyCycleError([(category_name, categories[category_name].get_properties()[field_index].get_property_name()) for category_name, field_index in cycle])
+                elif child not in state and child in edges:
+                    state[child] = 1
+                    stack.append((child, iter(edges[child])))
+
+    def __get_state(self, index):
+        if index not in self.states:
+            self.states[index] = (dict(), dict(), dict())
+            while len(self.states) > self.cached_indices:
+                self.states.popitem(last=False)
+        self.states.move_to_end(index)
+        return self.states[index]
+
+    def __get_compiled(self, category_name):
+        if category_name in self.compiled:
+            return self.compiled[category_name]
+
+        categories = self.engine.get_categories()
+        properties = categories[category_name].get_properties()
+        local = {to_variable_name(prop.get_property_name()): i for i, prop in enumerate(properties)}
+        if self.remote_variables is None:
+            self.remote_variables = dict()
+            for name, category in categories.items():
+                for i, prop in enumerate(category.get_properties()):
+                    self.remote_variables[to_variable_name(name) + "__" + to_variable_name(prop.get_property_name())] = (name, i)
+        remote = self.remote_variables
+
+        # Resolve every variable up front, a target of None is left for evaluation to report as unrecognised
+        compiled = list()
+        for prop in properties:
+            if not prop.is_derived():
+                compiled.append(None)
+                continue
+
+            variables = list()
+            for identifier in dict.fromkeys(IDENTIFIER_PATTERN.findall(prop.get_expression())):
+                if identifier in CONSTANTS:
+                    continue
+                variable = to_variable_name(identifier)
+                if variable in local:
+                    variables.append((identifier, (None, local[variable])))
+                elif variable in remote and remote[variable][0] == category_name:
+                    variables.append((identifier, (None, remote[variable][1])))
+                elif variable in remote:
+                    variables.append((identifier, remote[variable]))
+                else:
+                    variables.append((identifier, None))
+            compiled.append((compile_expression(prop.get_expression()), variables))
+
+        self.compiled[category_name] = compiled
+        return compiled
+
+    def __resolve_remote(self, character, category_name, index, remotes):
+        # The live revision of another category for our character, this is why our caches are per history index
+        if (character, category_name) not in remotes:
+            keys = self.engine.state_at(index, character, category_name)
+            if keys is None or len(keys) == 0:
+                remotes[(character, category_name)] = DerivedValueError("No '" + category_name + "' entry exists at history index " + str(index))
+            elif len(keys) > 1:
+                remotes[(character, category_name)] = DerivedValueError("More than one '" + category_name + "' entry exists at history index " + str(index))
+            else:
+                remotes[(character, category_name)] = keys[0]
+        return remotes[(character, category_name)]
+
+    def __dependencies(self, node, index, remotes):
+        # Returns (compiled, [(Identifier, Node or Error)]) - compiled is None for plain user entered values
+        unique_key, field_index = node
+        entry = self.engine.get_entry(unique_key)
+        compiled = self.__get_compiled(entry.get_category())
+        if field_index >= len(compiled) or compiled[field_index] is None:
+            return None, []
+
+        dependencies = list()
+        for identifier, target in compiled[field_index][1]:
+            if target is None:
+                continue
+            category_name, target_index = target
+            if category_name is None:
+                dependencies.append((identifier, (unique_key, target_index)))
+            else:
+                remote_key = self.__resolve_remote(entry.character, category_name, index, remotes)
+                dependencies.append((identifier, remote_key if isinstance(remote_key, Exception) else (remote_key, target_index)))
+        return compiled[field_index], dependencies
+
+    def __evaluate(self, node, index, values, dependents, remotes):
+        # Iterative depth first evaluation so long chains don't exhaust the interpreter's stack
+        stack = [node]
+        path = dict()  # Nodes whose dependencies are being evaluated, in order
+        while len(stack) != 0:
+            current = stack[-1]
+            if current in values:
+                stack.pop()
+                continue
+
+            compiled, dependencies = self.__dependencies(current, index, remotes)
+            if current not in path:
+                path[current] = None
+                pending = [dependency for _, dependency in dependencies if not isinstance(dependency, Exception) and dependency not in values]
+                for dependency in pending:
+                    if dependency in path:
+                        nodes = list(path.keys())
+                        raise DependencyCycleError([self.__describe(cycle_node) for cycle_node in nodes[nodes.index(dependency):] + [dependency]])
+                if len(pending) != 0:
+                    stack.extend(pending)
+                    continue
+
+            # Everything we need is now available
+            for _, dependency in dependencies:
+                if not isinstance(dependency, Exception):
+                    dependents.setdefault(dependency, set()).add(current)
+            values[current] = self.__compute(current, compiled, dependencies, values)
+            del path[current]
+            stack.pop()
+
+    def __describe(self, node):
+        entry = self.engine.get_entry(node[0])
+        properties = self.engine.get_category(entry.get_category()).get_properties()
+        property_name = properties[node[1]].get_property_name() if node[1] < len(properties) else str(node[1])
+        return (entry.get_category(), property_name)
+
+    def __compute(self, node, compiled, dependencies, values):
+        try:
+            if compiled is None:
+                value = self.engine.get_entry(node[0]).get_values()[node[1]]
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    raise DerivedValueError("'" + str(value) + "' is not a number " + str(self.__describe(node)))
+
+            variables = dict()
+            for identifier, dependency in dependencies:
+                # Failures propagate as is so everything downstream reports the original cause
+                value = dependency if isinstance(dependency, Exception) else values[dependency]
+                if isinstance(value, Exception):
+                    return value
+                variables[identifier] = value
+            return compiled[0].evaluate(variables)
+        except Exception as error:
+            if isinstance(error, DerivedValueError):
+                return error
+            return DerivedValueError(str(error))
@@ -1,20 +1,28 @@
-import uuid
-
-
 class Entry:
-    def __init__(self, category, values, unique_key=None, parent_key=None, print_to_output=True, character=0, print_to_history=True):
-        if unique_key is None:
-            uuid_val = uuid.uuid4()
-            unique_key = str(uuid_val)
+    __slots__ = ("unique_key", "character", "category", "parent_key", "print_to_output", "print_to_history", "_values", "_table", "_row")
 
+    def __init__(self, category, values, unique_key=None, parent_key=None, print_to_output=True, character=0, print_to_history=True):
+        # Keys are compact integer ids assigned by the engine when the entry is added (see EntryIds)
         self.unique_key = unique_key
         self.character = character
         self.category = category
-        self.values = values
+        self._values = values
         self.parent_key = parent_key
         self.print_to_output = print_to_output
         self.print_to_history = print_to_history
 
+        # Optional columnar backing (see EntryStore)
+        self._table = None
+        self._row = -1
+
+    @property
+    def values(self):
+        return self.get_values()
+
+    @values.setter
+    def values(self, values):
+        self.set_values(values)
+
     def get_unique_key(self):
         return self.unique_key
 
@@ -22,10 +30,15 @@ class Entry:
         return self.category
 
     def get_values(self):
-        return self.values
+        if self._table is not None:
+            return self._table.get_row(self._row)
+        return self._values
 
     def set_values(self, values: list):
-        self.values = values
+        if self._table is not None:
+            self._table.set_row(self._row, values)
+        else:
+            self._values = values
 
     def get_parent_key(self):
         return self.parent_key
@@ -36,6 +49,48 @@ class Entry:
     def set_print_to_output(self, value):
         self.print_to_output = value
 
+    def is_stored(self):
+        return self._table is not None
+
+    def is_stored_in(self, table):
+        return self._table is table
+
+    def attach(self, store):
+        # Move our values into the category's columnar table - we become a light weight view onto a row
+        if self._table is not None:
+            return
+
+        self._table = store.get_table(self.category)
+        self._row = self._table.allocate(self._values)
+        self._values = None
+
+    def attach_row(self, table, row):
+        # Back our values with an existing row of table (e.g. a session database that reads them on demand)
+        self._values = None
+        self._table = table
+        self._row = row
+
+    def detach(self):
+        # Pull our values back out so we no longer depend on the table
+        if self._table is None:
+            return
+
+        self._values = self._table.get_row(self._row)
+        self._table.release(self._row)
+        self._table = None
+        self._row = -1
+
+    def to_json(self):
+        return {
+            "unique_key": self.unique_key,
+            "character": self.character,
+            "category": self.category,
+            "values": self.get_values(),
+            "parent_key": self.parent_key,
+            "print_to_output": self.print_to_output,
+            "print_to_history": self.print_to_history
+        }
+
     @classmethod
     def from_json(cls, data):
         return cls(**data)
@@ -0,0 +1,78 @@
+import uuid
+
+from data.entries import Entry
+from data.tags import Tag
+
+
+class EntryIds:
+    """
+    Internally every entry is keyed by a dense integer id. Save files (and the named ranges we write to sheets) use
+    uuid strings, so this keeps the id <-> uuid mapping and translates at that boundary. Entries created during a
+    session are only given a uuid the first time they cross the boundary.
+    """
+
+    def __init__(self):
+        self.next_id = 0
+        self.uuids = dict()  # Id -> uuid
+        self.ids = dict()  # uuid -> Id
+
+    def clear(self):
+        self.next_id = 0
+        self.uuids.clear()
+        self.ids.clear()
+
+    def allocate(self):
+        entry_id = self.next_id
+        self.next_id += 1
+        return entry_id
+
+    def get_uuid(self, entry_id):
+        if entry_id is None:
+            return None
+
+        if entry_id not in self.uuids:
+            uuid_str = str(uuid.uuid4())
+            self.uuids[entry_id] = uuid_str
+            self.ids[uuid_str] = entry_id
+        return self.uuids[entry_id]
+
+    def get_id(self, uuid_str):
+        if uuid_str is None:
+            return None
+
+        if uuid_str not in self.ids:
+            entry_id = self.allocate()
+            self.uuids[entry_id] = uuid_str
+            self.ids[uuid_str] = entry_id
+        return self.ids[uuid_str]
+
+    def import_entries(self, entries: dict, history: list, tags: dict):
+        # Translates uuid keyed save data into id keyed engine data, in place where possible
+        imported_entries = dict()
+        for entry in entries.values():
+            entry.unique_key = self.get_id(entry.unique_key)
+            imported_entries[entry.unique_key] = entry
+        for entry in imported_entries.values():
+            entry.parent_key = self.get_id(entry.parent_key or None)  # Hand edited saves may use "" for no parent
+
+        imported_history = [self.get_id(uuid_str) for uuid_str in history]
+
+        imported_tags = dict()
+        for tag in tags.values():
+            tag.tagged_entry_key = self.get_id(tag.tagged_entry_key)
+            imported_tags[tag.tagged_entry_key] = tag
+
+        return imported_entries, imported_history, imported_tags
+
+    def export_entry(self, entry: Entry):
+        # Our own copy of the values, so an export can be written out while the entry carries on changing
+        data = entry.to_json()
+        data["values"] = list(data["values"])
+        data["unique_key"] = self.get_uuid(entry.unique_key)
+        data["parent_key"] = self.get_uuid(entry.parent_key)
+        return data
+
+    def export_tag(self, tag: Tag):
+        data = dict(tag.__dict__)
+        data["tagged_entry_key"] = self.get_uuid(tag.tagged_entry_key)
+        return data
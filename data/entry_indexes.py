@@ -0,0 +1,82 @@
+class EntryIndexes:
+    """
+    Secondary indexes over all entries (regardless of history position) by category, by character and by both.
+
+    Each index maps to a dict used as an insertion ordered set of entry keys so lookups cost O(matching entries).
+    """
+
+    def __init__(self):
+        self.by_category = dict()  # Category -> Entry Keys
+        self.by_character = dict()  # Character -> Entry Keys
+        self.by_character_category = dict()  # (Character, Category) -> Entry Keys
+
+    def clear(self):
+        self.by_category.clear()
+        self.by_character.clear()
+        self.by_character_category.clear()
+
+    def rebuild(self, entries: dict):
+        self.clear()
+        for entry in entries.values():
+            self.add(entry)
+
+    def add(self, entry):
+        unique_key = entry.get_unique_key()
+        self.__index(self.by_category, entry.get_category(), unique_key)
+        self.__index(self.by_character, entry.character, unique_key)
+        self.__index(self.by_character_category, (entry.character, entry.get_category()), unique_key)
+
+    def remove(self, entry):
+        unique_key = entry.get_unique_key()
+        self.__unindex(self.by_category, entry.get_category(), unique_key)
+        self.__unindex(self.by_character, entry.character, unique_key)
+        self.__unindex(self.by_character_category, (entry.character, entry.get_category()), unique_key)
+
+    def rename_category(self, old_name, new_name):
+        if old_name not in self.by_category:
+            return
+
+        keys = self.by_category.pop(old_name)
+        if new_name in self.by_category:
+            self.by_category[new_name].update(keys)
+        else:
+            self.by_category[new_name] = keys
+
+        for character in list(self.by_character.keys()):
+            if (character, old_name) not in self.by_character_category:
+                continue
+
+            keys = self.by_character_category.pop((character, old_name))
+            if (character, new_name) in self.by_character_category:
+                self.by_character_category[(character, new_name)].update(keys)
+            else:
+                self.by_character_category[(character, new_name)] = keys
+
+    def get_category_keys(self, category_name):
+        if category_name in self.by_category:
+            return list(self.by_category[category_name].keys())
+        return []
+
+    def get_character_keys(self, character):
+        if character in self.by_character:
+            return list(self.by_character[character].keys())
+        return []
+
+    def get_keys(self, character, category_name):
+        if (character, category_name) in self.by_character_category:
+            return list(self.by_character_category[(character, category_name)].keys())
+        return []
+
+    @staticmethod
+    def __index(index, value, unique_key):
+        if value not in index:
+            index[value] = dict()
+        index[value][unique_key] = None
+
+    @staticmethod
+    def __unindex(index, value, unique_key):
+        if value not in index:
+            return
+        index[value].pop(unique_key, None)
+        if len(index[value]) == 0:
+            del index[value]
@@ -0,0 +1,94 @@
+import sys
+from array import array
+
+
+def intern_value(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class CategoryTable:
+    """
+    Column oriented storage for the values of every entry in a single category.
+
+    Each property position is a column (a list with one slot per row) and each row records how many values it holds so
+    the original list can be reproduced exactly. String values are interned so the many identical copies made by
+    revision chains (e.g. long descriptions) share a single object.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = list()
+        self.lengths = array("l")
+        self.free_rows = list()
+
+    def __len__(self):
+        return len(self.lengths) - len(self.free_rows)
+
+    def allocate(self, values):
+        if len(self.free_rows) != 0:
+            row = self.free_rows.pop()
+        else:
+            row = len(self.lengths)
+            self.lengths.append(0)
+            for column in self.columns:
+                column.append(None)
+
+        self.set_row(row, values)
+        return row
+
+    def release(self, row):
+        self.set_row(row, [])
+        self.free_rows.append(row)
+
+    def get_row(self, row):
+        columns = self.columns
+        return [columns[i][row] for i in range(self.lengths[row])]
+
+    def set_row(self, row, values):
+        # Grow our columns as required
+        while len(self.columns) < len(values):
+            self.columns.append([None] * len(self.lengths))
+
+        for i in range(len(values)):
+            self.columns[i][row] = intern_value(values[i])
+        for i in range(len(values), self.lengths[row]):
+            self.columns[i][row] = None
+        self.lengths[row] = len(values)
+
+
+class EntryStore:
+    def __init__(self):
+        self.tables = dict()  # Category -> CategoryTable
+
+    def get_table(self, category_name) -> CategoryTable:
+        if category_name not in self.tables:
+            self.tables[category_name] = CategoryTable(category_name)
+        return self.tables[category_name]
+
+    def rename_category(self, old_name, new_name, entries=()):
+        """
+        Entries are those of old_name, already moved to new_name. They're only needed if new_name still has a table
+        with rows in it, which the rows of those stored in old_name's table are then merged into.
+        """
+        if old_name not in self.tables:
+            return
+
+        # Entries point at their table directly so usually only our lookup needs to move
+        table = self.tables[old_name]
+        existing = self.tables.get(new_name, None)
+        if existing is None or len(existing) == 0:
+            del self.tables[old_name]
+            table.name = new_name
+            self.tables[new_name] = table
+            return
+
+        # Otherwise every row has to move across, or some entry would be left on a table we no longer know of
+        entries = [entry for entry in entries if entry.is_stored_in(table)]  # Not those still read from a database
+        if len(entries) != len(table):
+            raise ValueError("Can't merge category " + old_name + " into " + new_name + ", " + str(len(table)) + " entries are stored but " + str(len(entries)) + " were given.")
+        del self.tables[old_name]
+        for entry in entries:
+            entry.detach()
+            entry.attach(self)
@@ -0,0 +1,124 @@
+class EntryHistoryCache:
+    """
+    Incrementally maintained view of which revisions are 'live' up to the current history head.
+
+    Rather than walking the entire history every time the head moves, entries are applied (or unapplied) one at a time
+    as the head moves forwards (or backwards). Unapplying is the exact inverse of applying as long as the revision
+    linkage has not changed in between, so any mutation in the middle of history should rewind to just before the
+    mutation point, mutate, and then replay forwards.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.head = -1
+
+        # Caches
+        self.entry_revisions = dict()  # Absolute Parent -> Ordered List of Children for Entities
+        self.latest_entry_keys = dict()  # Character -> Category -> Absolute Parent -> Latest Revision
+
+    def clear(self):
+        self.head = -1
+        self.entry_revisions.clear()
+        self.latest_entry_keys.clear()
+
+    def move_to(self, index):
+        history = self.engine.get_history()
+        if self.head < index:
+            for unique_key in history.iterate_from(self.head + 1):
+                self.head += 1
+                self.__apply(unique_key)
+                if self.head == index:
+                    break
+
+        while self.head > index:
+            self.__unapply(history[self.head])
+            self.head -= 1
+
+    def rewind_to(self, index):
+        if index < self.head:
+            self.move_to(index)
+
+    def rebuild(self, index):
+        self.clear()
+        self.move_to(index)
+
+    def rename_category(self, old_name, new_name):
+        for categories in self.latest_entry_keys.values():
+            if old_name not in categories:
+                continue
+
+            # Maintain our order
+            renamed = dict()
+            for category_name, latest in categories.items():
+                if category_name == old_name:
+                    renamed[new_name] = latest
+                else:
+                    renamed[category_name] = latest
+
+            categories.clear()
+            categories.update(renamed)
+
+    def get_latest_keys(self, character, category):
+        if character not in self.latest_entry_keys or category not in self.latest_entry_keys[character]:
+            return None
+        return list(self.latest_entry_keys[character][category].values())
+
+    def get_revisions(self, root_key):
+        if root_key in self.entry_revisions:
+            return self.entry_revisions[root_key]
+        return None
+
+    def __apply(self, unique_key):
+        root_key = self.engine.get_absolute_parent(unique_key)
+        if root_key is None:
+            root_key = unique_key
+            self.entry_revisions[unique_key] = [unique_key]
+        else:
+            self.entry_revisions[root_key].append(unique_key)
+
+        # Our category pointers are keyed off the root entry
+        root_entry = self.engine.get_entry(root_key)
+        if root_entry.character not in self.latest_entry_keys:
+            self.latest_entry_keys[root_entry.character] = dict()
+        categories = self.latest_entry_keys[root_entry.character]
+        if root_entry.category not in categories:
+            categories[root_entry.category] = dict()
+        categories[root_entry.category][root_key] = unique_key
+
+    def __unapply(self, unique_key):
+        root_key = self.engine.get_absolute_parent(unique_key)
+        if root_key is None:
+            root_key = unique_key
+
+        # As we unapply in reverse order we should always be the tail of our chain
+        revisions = self.entry_revisions[root_key]
+        if revisions[-1] != unique_key:
+            raise KeyError("Entry revision cache is out of order for: " + str(unique_key))
+        revisions.pop()
+
+        root_entry = self.engine.get_entry(root_key)
+        categories = self.latest_entry_keys[root_entry.character]
+        latest = categories[root_entry.category]
+        if len(revisions) == 0:
+            del self.entry_revisions[root_key]
+            del latest[root_key]
+
+            # Don't leave empty husks around - callers treat missing and empty differently
+            if len(latest) == 0:
+                del categories[root_entry.category]
+            if len(categories) == 0:
+                del self.latest_entry_keys[root_entry.character]
+        else:
+            latest[root_key] = revisions[-1]
+
+    def validate(self):
+        reference = EntryHistoryCache(self.engine)
+        reference.move_to(self.head)
+
+        if list(reference.entry_revisions.items()) != list(self.entry_revisions.items()):
+            raise AssertionError("Incremental entry revision cache has diverged from a full rebuild.")
+
+        expected = {character: {category: list(latest.items()) for category, latest in categories.items()} for character, categories in reference.latest_entry_keys.items()}
+        actual = {character: {category: list(latest.items()) for category, latest in categories.items()} for character, categories in self.latest_entry_keys.items()}
+        if expected != actual:
+            raise AssertionError("Incremental latest entry cache has diverged from a full rebuild.")
@@ -0,0 +1,86 @@
+class HistoryCheckpoints:
+    """
+    Read only 'time travel' over the latest revision state.
+
+    Every interval entries we store a snapshot of Character -> Category -> Absolute Parent -> Latest Revision as it
+    stood at that point in history. Resolving the state at an arbitrary index copies the nearest preceding snapshot for
+    the requested character & category and replays at most interval entries on top of it, without ever touching the
+    engine's current history index. Snapshots are built lazily and dropped from the first position a mutation touches.
+
+    Replaying walks the engine's live history and revision links, so like them we're only used on the engine's thread.
+    """
+
+    def __init__(self, engine, interval=256):
+        self.engine = engine
+        self.interval = interval
+        self.checkpoints = list()  # Checkpoint n is the state after applying history[0 .. (n + 1) * interval - 1]
+
+    def clear(self):
+        self.checkpoints.clear()
+
+    def invalidate_from(self, index):
+        del self.checkpoints[max(0, index) // self.interval:]
+
+    def state_at(self, index, character, category):
+        index = min(index, len(self.engine.get_history()) - 1)
+        if index < 0:
+            return None
+
+        usable = (index + 1) // self.interval
+        self.__build_up_to(usable)
+
+        # Start from our nearest checkpoint
+        latest = dict()
+        if usable > 0:
+            checkpoint = self.checkpoints[usable - 1]
+            if character in checkpoint and category in checkpoint[character]:
+                latest = dict(checkpoint[character][category])
+
+        # Replay the remainder for just our character & category
+        position = usable * self.interval
+        for unique_key in self.engine.get_history().iterate_from(position):
+            if position > index:
+                break
+
+            root_key = self.__get_root_key(unique_key)
+            root_entry = self.engine.get_entry(root_key)
+            if root_entry.character == character and root_entry.category == category:
+                latest[root_key] = unique_key
+            position += 1
+
+        if len(latest) == 0:
+            return None
+        return list(latest.values())
+
+    def __build_up_to(self, count):
+        history = self.engine.get_history()
+        while len(self.checkpoints) < count:
+            # Copy the previous checkpoint - we will never mutate a stored checkpoint
+            state = dict()
+            if len(self.checkpoints) != 0:
+                for character, categories in self.checkpoints[-1].items():
+                    state[character] = {category: dict(latest) for category, latest in categories.items()}
+
+            # Replay a full interval of history on top of it
+            start = len(self.checkpoints) * self.interval
+            position = start
+            for unique_key in history.iterate_from(start):
+                if position >= start + self.interval:
+                    break
+
+                root_key = self.__get_root_key(unique_key)
+                root_entry = self.engine.get_entry(root_key)
+                if root_entry.character not in state:
+                    state[root_entry.character] = dict()
+                if root_entry.category not in state[root_entry.character]:
+                    state[root_entry.character][root_entry.category] = dict()
+                state[root_entry.character][root_entry.category][root_key] = unique_key
+                position += 1
+
+            self.checkpoints.append(state)
+
+    def __get_root_key(self, unique_key):
+        root_key = self.engine.get_absolute_parent(unique_key)
+        if root_key is None:
+            return unique_key
+        return root_key
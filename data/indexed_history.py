@@ -0,0 +1,239 @@
+import random
+
+
+class _HistoryNode:
+    __slots__ = ("key", "priority", "size", "left", "right", "parent")
+
+    def __init__(self, key, priority):
+        self.key = key
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+        self.parent = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    if node.left is not None:
+        node.left.parent = node
+    if node.right is not None:
+        node.right.parent = node
+
+
+def _split(node, count):
+    # Splits into (first count items, the rest)
+    if node is None:
+        return None, None
+
+    if _size(node.left) >= count:
+        left, node.left = _split(node.left, count)
+        _update(node)
+        if left is not None:
+            left.parent = None
+        return left, node
+    else:
+        node.right, right = _split(node.right, count - _size(node.left) - 1)
+        _update(node)
+        if right is not None:
+            right.parent = None
+        return node, right
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    else:
+        right.left = _merge(left, right.left)
+        _update(right)
+        return right
+
+
+class IndexedHistory:
+    """
+    An ordered sequence of unique entry keys that knows where each key lives.
+
+    Backed by an implicit treap (an order statistic tree keyed by position) with parent pointers, plus a key -> node
+    map. That makes positional access, key -> position lookup, insertion, deletion and moves all O(log n) rather than
+    the O(n) of a plain list. Supports the read only parts of the list API (len, indexing, slicing, iteration, index)
+    so existing callers can treat it as a list.
+    """
+
+    def __init__(self, keys=None):
+        self.__root = None
+        self.__nodes = dict()
+        if keys is not None:
+            self.__build(list(keys))
+
+    def __build(self, keys):
+        if len(keys) == 0:
+            return
+
+        # Build a perfectly balanced tree, then hand out priorities in breadth first order so the heap property holds
+        nodes = [_HistoryNode(key, 0.0) for key in keys]
+        for node in nodes:
+            if node.key in self.__nodes:
+                raise KeyError("Duplicate key in history: " + str(node.key))
+            self.__nodes[node.key] = node
+
+        def build(lo, hi):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = nodes[mid]
+            node.left = build(lo, mid)
+            node.right = build(mid + 1, hi)
+            _update(node)
+            return node
+
+        self.__root = build(0, len(nodes))
+        priorities = sorted((random.random() for _ in nodes), reverse=True)
+        level = [self.__root]
+        count = 0
+        while len(level) != 0:
+            next_level = []
+            for node in level:
+                node.priority = priorities[count]
+                count += 1
+                if node.left is not None:
+                    next_level.append(node.left)
+                if node.right is not None:
+                    next_level.append(node.right)
+            level = next_level
+
+    def __len__(self):
+        return _size(self.__root)
+
+    def __contains__(self, key):
+        return key in self.__nodes
+
+    def __iter__(self):
+        return self.iterate_from(0)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+
+            output = []
+            for key in self.iterate_from(start):
+                if len(output) >= stop - start:
+                    break
+                output.append(key)
+            return output
+
+        return self.__node_at(index).key
+
+    def __repr__(self):
+        return "IndexedHistory(" + repr(list(self)) + ")"
+
+    def __node_at(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if index < 0 or index >= length:
+            raise IndexError("history index out of range")
+
+        node = self.__root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def iterate_from(self, index):
+        # In order traversal starting at the given position
+        stack = []
+        node = self.__root
+        while node is not None:
+            left_size = _size(node.left)
+            if index < left_size:
+                stack.append(node)
+                node = node.left
+            elif index == left_size:
+                stack.append(node)
+                break
+            else:
+                index -= left_size + 1
+                node = node.right
+
+        while len(stack) != 0:
+            node = stack.pop()
+            yield node.key
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+    def index(self, key):
+        if key not in self.__nodes:
+            raise ValueError(str(key) + " is not in history")
+
+        node = self.__nodes[key]
+        position = _size(node.left)
+        while node.parent is not None:
+            if node is node.parent.right:
+                position += _size(node.parent.left) + 1
+            node = node.parent
+        return position
+
+    def insert(self, index, key):
+        if key in self.__nodes:
+            raise KeyError("Duplicate key in history: " + str(key))
+
+        length = len(self)
+        if index < 0:
+            index = max(0, index + length)
+        index = min(index, length)
+
+        node = _HistoryNode(key, random.random())
+        self.__nodes[key] = node
+        left, right = _split(self.__root, index)
+        self.__set_root(_merge(_merge(left, node), right))
+
+    def append(self, key):
+        self.insert(len(self), key)
+
+    def pop(self, index=-1):
+        node = self.__node_at(index)
+        index = self.index(node.key)
+        left, right = _split(self.__root, index)
+        middle, right = _split(right, 1)
+        self.__set_root(_merge(left, right))
+        del self.__nodes[middle.key]
+        return middle.key
+
+    def remove(self, key):
+        self.pop(self.index(key))
+
+    def swap(self, first, second):
+        # Positions don't change shape - just trade keys between the two nodes
+        first_node = self.__node_at(first)
+        second_node = self.__node_at(second)
+        first_node.key, second_node.key = second_node.key, first_node.key
+        self.__nodes[first_node.key] = first_node
+        self.__nodes[second_node.key] = second_node
+
+    def move(self, original_location, new_location):
+        self.insert(new_location, self.pop(original_location))
+
+    def __set_root(self, root):
+        self.__root = root
+        if root is not None:
+            root.parent = None
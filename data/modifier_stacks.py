@@ -0,0 +1,291 @@
+import random
+
+from data.derived_values import to_variable_name, get_entry_variables
+from utils.expressions import compile_expression
+
+OPERATIONS = ("+", "-", "*", "/")
+
+
+class _ModifierNode:
+    # Affine (multiply, add) is this entry's own modifier, total_* is the composition over its subtree in history order
+    __slots__ = ("key", "priority", "size", "left", "right", "parent", "multiply", "add", "total_multiply", "total_add")
+
+    def __init__(self, key, priority, multiply, add):
+        self.key = key
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+        self.parent = None
+        self.multiply = multiply
+        self.add = add
+        self.total_multiply = multiply
+        self.total_add = add
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _compose(first, second):
+    # Applying x -> x * m1 + a1 then x -> x * m2 + a2
+    return first[0] * second[0], first[1] * second[0] + second[1]
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    total = (node.multiply, node.add)
+    if node.left is not None:
+        node.left.parent = node
+        total = _compose((node.left.total_multiply, node.left.total_add), total)
+    if node.right is not None:
+        node.right.parent = node
+        total = _compose(total, (node.right.total_multiply, node.right.total_add))
+    node.total_multiply, node.total_add = total
+
+
+def _split(node, count):
+    # Splits into (first count modifiers, the rest)
+    if node is None:
+        return None, None
+
+    if _size(node.left) >= count:
+        left, node.left = _split(node.left, count)
+        _update(node)
+        if left is not None:
+            left.parent = None
+        return left, node
+    else:
+        node.right, right = _split(node.right, count - _size(node.left) - 1)
+        _update(node)
+        if right is not None:
+            right.parent = None
+        return node, right
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    else:
+        right.left = _merge(left, right.left)
+        _update(right)
+        return right
+
+
+class _ModifierSequence:
+    """
+    The modifiers of one (character, stat, stage) in history order. An implicit treap (as in IndexedHistory) where
+    every node also carries the composition of its subtree's modifiers, so the combined effect of any prefix is found
+    on a single root to leaf walk and changes only re-aggregate the nodes above them.
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self.root = None
+        self.nodes = dict()
+
+    def __len__(self):
+        return _size(self.root)
+
+    def count_before(self, index):
+        # Number of our modifiers at history positions before index
+        count = 0
+        node = self.root
+        while node is not None:
+            if self.history.index(node.key) < index:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def insert(self, unique_key, multiply, add, index):
+        node = _ModifierNode(unique_key, random.random(), multiply, add)
+        self.nodes[unique_key] = node
+        left, right = _split(self.root, self.count_before(index))
+        self.__set_root(_merge(_merge(left, node), right))
+
+    def append(self, unique_key, multiply, add):
+        node = _ModifierNode(unique_key, random.random(), multiply, add)
+        self.nodes[unique_key] = node
+        self.__set_root(_merge(self.root, node))
+
+    def remove(self, unique_key):
+        node = self.nodes.pop(unique_key)
+        position = _size(node.left)
+        while node.parent is not None:
+            if node is node.parent.right:
+                position += _size(node.parent.left) + 1
+            node = node.parent
+
+        left, right = _split(self.root, position)
+        _, right = _split(right, 1)
+        self.__set_root(_merge(left, right))
+
+    def set(self, unique_key, multiply, add):
+        # Re-aggregate on the way back up, the shape doesn't change
+        node = self.nodes[unique_key]
+        node.multiply = multiply
+        node.add = add
+        while node is not None:
+            _update(node)
+            node = node.parent
+
+    def prefix(self, index):
+        # Composition of our modifiers at history positions up to and including index
+        total = (1.0, 0.0)
+        node = self.root
+        while node is not None:
+            if self.history.index(node.key) <= index:
+                if node.left is not None:
+                    total = _compose(total, (node.left.total_multiply, node.left.total_add))
+                total = _compose(total, (node.multiply, node.add))
+                node = node.right
+            else:
+                node = node.left
+        return total
+
+    def __set_root(self, root):
+        self.root = root
+        if root is not None:
+            root.parent = None
+
+
+class ModifierStacks:
+    """
+    Order aware stacking of stat modifiers over the history.
+
+    Categories declare modifiers as (Stat, Operation, Expression, Stage): every entry of the category adds (+ / -) or
+    multiplies (* / /) its character's stat by the expression, evaluated over the entry's own properties. Within a
+    stage modifiers apply in history order, so mixing additions and multiplications behaves exactly as written down.
+    Stages apply in ascending order, giving explicit precedence where that is wanted instead (e.g. all flat bonuses in
+    stage 0 before percentage multipliers in stage 1). Stats start at 0.
+
+    Every modifier is an affine map (x -> x * m + a) and those compose associatively, so each (character, stat, stage)
+    keeps its modifiers in a treap ordered by history position that is augmented with their composition. A stat's
+    value at any history index, or its change between two indices, is then a handful of tree walks, and inserting,
+    editing, removing or moving an entry only touches the trees of the stats it modifies.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sequences = dict()  # (Character, Stat) -> Stage -> _ModifierSequence
+        self.entry_modifiers = dict()  # Entry Key -> [(Character, Stat, Stage)] it is stored under
+        self.compiled = dict()  # Category -> [(Stat, Operation, CompiledExpression, Stage)]
+
+    def clear(self):
+        self.sequences.clear()
+        self.entry_modifiers.clear()
+        self.compiled.clear()
+
+    def rebuild(self):
+        # History order means every modifier is simply appended
+        self.clear()
+        for unique_key in self.engine.get_history():
+            self.__add(self.engine.get_entry(unique_key), None)
+
+    def add(self, entry, index):
+        self.__add(entry, index)
+
+    def remove(self, entry):
+        for character, stat, stage in self.entry_modifiers.pop(entry.get_unique_key(), ()):
+            stages = self.sequences[(character, stat)]
+            stages[stage].remove(entry.get_unique_key())
+            if len(stages[stage]) == 0:
+                del stages[stage]
+                if len(stages) == 0:
+                    del self.sequences[(character, stat)]
+
+    def update(self, entry):
+        # Values changed - same stats & stages so just swap the affine maps in place
+        modifiers = self.__evaluate(entry)
+        if [location for location, _ in modifiers] != self.entry_modifiers.get(entry.get_unique_key(), []):
+            index = self.engine.get_history().index(entry.get_unique_key())
+            self.remove(entry)
+            self.__add(entry, index)
+            return
+
+        for (character, stat, stage), (multiply, add) in modifiers:
+            self.sequences[(character, stat)][stage].set(entry.get_unique_key(), multiply, add)
+
+    def move(self, entry):
+        # The entry changed places in the history, relative order amongst everything else is untouched
+        index = self.engine.get_history().index(entry.get_unique_key())
+        self.remove(entry)
+        self.__add(entry, index)
+
+    def get_stats(self, character):
+        return sorted(stat for stat_character, stat in self.sequences.keys() if stat_character == character)
+
+    def value_at(self, character, stat, index):
+        value = 0.0
+        stages = self.sequences.get((character, to_variable_name(stat)), dict())
+        for stage in sorted(stages.keys()):
+            multiply, add = stages[stage].prefix(index)
+            value = value * multiply + add
+        return value
+
+    def change_between(self, character, stat, start, end):
+        return self.value_at(character, stat, end) - self.value_at(character, stat, start)
+
+    def __add(self, entry, index):
+        modifiers = self.__evaluate(entry)
+        if len(modifiers) == 0:
+            return
+
+        self.entry_modifiers[entry.get_unique_key()] = [location for location, _ in modifiers]
+        for (character, stat, stage), (multiply, add) in modifiers:
+            stages = self.sequences.setdefault((character, stat), dict())
+            if stage not in stages:
+                stages[stage] = _ModifierSequence(self.engine.get_history())
+            if index is None:
+                stages[stage].append(entry.get_unique_key(), multiply, add)
+            else:
+                stages[stage].insert(entry.get_unique_key(), multiply, add, index)
+
+    def __get_modifiers(self, category_name):
+        if category_name not in self.compiled:
+            categories = self.engine.get_categories()
+            modifiers = list()
+            if category_name in categories:
+                for stat, operation, expression, stage in categories[category_name].get_modifiers():
+                    modifiers.append((to_variable_name(stat), operation, compile_expression(expression), int(stage)))
+            self.compiled[category_name] = modifiers
+        return self.compiled[category_name]
+
+    def __evaluate(self, entry):
+        # [((Character, Stat, Stage), (Multiply, Add))] for each of the entry's modifiers, combined per location
+        modifiers = self.__get_modifiers(entry.get_category())
+        if len(modifiers) == 0:
+            return []
+
+        variables = get_entry_variables(self.engine.get_categories()[entry.get_category()], entry)
+        evaluated = dict()
+        for stat, operation, expression, stage in modifiers:
+            # A modifier that can't be calculated has no effect
+            try:
+                amount = expression.evaluate({name: variables[to_variable_name(name)] for name in expression.variables})
+            except Exception:
+                amount = None
+
+            affine = (1.0, 0.0)
+            if amount is not None:
+                if operation == "+":
+                    affine = (1.0, amount)
+                elif operation == "-":
+                    affine = (1.0, -amount)
+                elif operation == "*":
+                    affine = (amount, 0.0)
+                elif operation == "/" and amount != 0:
+                    affine = (1.0 / amount, 0.0)
+
+            location = (entry.character, stat, stage)
+            evaluated[location] = _compose(evaluated.get(location, (1.0, 0.0)), affine)
+        return list(evaluated.items())
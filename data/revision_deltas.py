@@ -0,0 +1,83 @@
+"""
+Revisions usually only change a property or two of their parent (e.g. "Level: 14" -> "Level: 15") while carrying along
+long descriptions unchanged.
+
+In memory a revision's unchanged values are the parent's own objects, so each distinct value is held once per chain
+rather than once per revision. In snapshots a revision whose parent precedes it in the same file is written as a
+sparse delta - {"delta": [[Index, Value], ...], "length": Value Count} in place of "values" - and is rebuilt from its
+parent (sharing its objects) when read. Only format 2 snapshots (see FORMAT_VERSION) may hold deltas. Journal
+records & session databases keep full values as an entry there may outlive its parent's values at the time.
+"""
+
+
+def same_value(first, second):
+    # Strict - True == 1 == 1.0 but swapping one for another would change what's stored
+    return type(first) is type(second) and first == second
+
+
+def share_parent_values(values, parent_values):
+    # Values, with those unchanged from the parent swapped for the parent's own objects
+    return [parent_values[i] if i < len(parent_values) and same_value(parent_values[i], value) else value for i, value in enumerate(values)]
+
+
+def encode_values(values, parent_values):
+    # [[Index, Value]] for the values that differ from the parent's, None if nothing is shared
+    delta = [[i, value] for i, value in enumerate(values) if i >= len(parent_values) or not same_value(parent_values[i], value)]
+    if len(delta) == len(values):
+        return None
+    return delta
+
+
+def decode_values(delta, length, parent_values):
+    values = [parent_values[i] if i < len(parent_values) else None for i in range(length)]
+    for i, value in delta:
+        values[i] = value
+    return values
+
+
+def encode_entries(entries: dict):
+    """
+    Delta encodes exported (uuid keyed, JSON ready) entries in place. Each revision is encoded against its parent's
+    full values, so any one can be decoded as soon as its parent has been.
+    """
+    full_values = {uuid_str: data["values"] for uuid_str, data in entries.items() if "values" in data}
+    for data in entries.values():
+        parent_key = data.get("parent_key", None)
+        if "values" not in data or parent_key not in full_values:
+            continue
+
+        delta = encode_values(data["values"], full_values[parent_key])
+        if delta is not None:
+            del data["values"]
+            data["delta"] = delta
+            data["length"] = len(full_values[data["unique_key"]])
+
+
+def decode_entry(data: dict, parent_values):
+    # Swaps a delta encoded entry's delta for its values, in place
+    data["values"] = decode_values(data.pop("delta"), data.pop("length"), parent_values)
+
+
+def decode_entries(entries: dict):
+    """
+    Decodes every delta encoded entry in place. Entries may be JSON dicts or (already decoded) Entry objects, and in
+    any order - revision chains are walked up to their first decoded entry and then decoded back down.
+    """
+    def get_values(item):
+        return item["values"] if isinstance(item, dict) else item.get_values()
+
+    for uuid_str in entries:
+        chain = list()
+        item = entries[uuid_str]
+        while isinstance(item, dict) and "delta" in item:
+            chain.append(item)
+            parent_key = item.get("parent_key", None)
+            if parent_key not in entries:
+                raise ValueError("Revision " + str(item.get("unique_key", None)) + " is stored as changes to " + str(parent_key) + " which is missing.")
+            item = entries[parent_key]
+            if len(chain) > len(entries):
+                raise ValueError("Revision " + str(uuid_str) + " is part of a revision loop.")
+
+        for data in reversed(chain):
+            decode_entry(data, get_values(item))
+            item = data
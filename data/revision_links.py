@@ -0,0 +1,180 @@
+class RevisionLinks:
+    """
+    Bidirectional child <-> parent index for entry revision chains.
+
+    Every revision has at most one parent and at most one child, so both directions are plain dicts. Each chain also
+    carries an explicit chain id (an opaque counter) which maps to the chain's current root, so root lookups are O(1).
+    The structural operations (insert, remove, swap) keep chain ids stable and only ever touch a handful of keys.
+    set_parent is the general fallback and has to relabel the chain it splits or joins.
+    """
+
+    def __init__(self):
+        self.child_to_parent = dict()  # Child -> Parent for Entries
+        self.parent_to_child = dict()  # Parent -> Child for Entries
+        self.chain_ids = dict()  # Entry -> Chain Id for all entries that are part of a chain
+        self.chain_roots = dict()  # Chain Id -> Root Entry
+        self.__next_chain_id = 0
+
+    def clear(self):
+        self.child_to_parent.clear()
+        self.parent_to_child.clear()
+        self.chain_ids.clear()
+        self.chain_roots.clear()
+
+    def rebuild(self, parents: dict):
+        # Parents should be Child -> Parent for all linked entries
+        self.clear()
+        for child_key, parent_key in parents.items():
+            if parent_key in self.parent_to_child:
+                raise ValueError("Should not have duplicate parent keys in child -> parent map. Bad DAG.")
+            self.child_to_parent[child_key] = parent_key
+            self.parent_to_child[parent_key] = child_key
+
+        # Walk each chain from its root
+        for parent_key in self.parent_to_child.keys():
+            if parent_key in self.child_to_parent:
+                continue
+
+            self.__relabel(parent_key, self.__new_chain(parent_key))
+
+        # Anything we haven't reached must be part of a loop
+        if len(self.chain_ids) != len(self.child_to_parent) + len(self.chain_roots):
+            raise ValueError("Revision chains should not contain cycles. Bad DAG.")
+
+    def get_parent(self, child_key):
+        if child_key in self.child_to_parent:
+            return self.child_to_parent[child_key]
+        return None
+
+    def get_child(self, parent_key):
+        if parent_key in self.parent_to_child:
+            return self.parent_to_child[parent_key]
+        return None
+
+    def get_root(self, unique_key):
+        if unique_key in self.chain_ids:
+            return self.chain_roots[self.chain_ids[unique_key]]
+        return unique_key
+
+    def insert(self, unique_key, parent_key):
+        # Splice a brand new key in directly after parent_key. Any existing child of the parent becomes our child.
+        if unique_key in self.chain_ids:
+            raise KeyError("Cannot insert an entry that is already part of a revision chain: " + str(unique_key))
+
+        chain_id = self.__ensure_chain(parent_key)
+        child_key = self.get_child(parent_key)
+        self.child_to_parent[unique_key] = parent_key
+        self.parent_to_child[parent_key] = unique_key
+        if child_key is not None:
+            self.child_to_parent[child_key] = unique_key
+            self.parent_to_child[unique_key] = child_key
+        self.chain_ids[unique_key] = chain_id
+
+    def remove(self, unique_key):
+        # Splice a key out of its chain. Our child (if any) inherits our parent (if any).
+        if unique_key not in self.chain_ids:
+            return
+
+        chain_id = self.chain_ids.pop(unique_key)
+        parent_key = self.child_to_parent.pop(unique_key, None)
+        child_key = self.parent_to_child.pop(unique_key, None)
+        if parent_key is not None:
+            del self.parent_to_child[parent_key]
+        if child_key is not None:
+            del self.child_to_parent[child_key]
+
+        if parent_key is not None and child_key is not None:
+            self.child_to_parent[child_key] = parent_key
+            self.parent_to_child[parent_key] = child_key
+        elif parent_key is None and child_key is not None:
+            self.chain_roots[chain_id] = child_key
+
+        self.__drop_if_singleton(chain_id, parent_key)
+        self.__drop_if_singleton(chain_id, child_key)
+
+    def swap(self, parent_key, child_key):
+        # Turns grandparent -> parent -> child -> grandchild into grandparent -> child -> parent -> grandchild
+        if self.get_parent(child_key) != parent_key:
+            raise KeyError("Can only swap directly linked revisions.")
+
+        grandparent_key = self.get_parent(parent_key)
+        grandchild_key = self.get_child(child_key)
+
+        del self.child_to_parent[child_key]
+        self.child_to_parent[parent_key] = child_key
+        self.parent_to_child[child_key] = parent_key
+        if grandparent_key is not None:
+            self.child_to_parent[child_key] = grandparent_key
+            self.parent_to_child[grandparent_key] = child_key
+        if grandchild_key is not None:
+            self.child_to_parent[grandchild_key] = parent_key
+            self.parent_to_child[parent_key] = grandchild_key
+        else:
+            del self.parent_to_child[parent_key]
+
+        chain_id = self.chain_ids[parent_key]
+        if self.chain_roots[chain_id] == parent_key:
+            self.chain_roots[chain_id] = child_key
+
+    def set_parent(self, child_key, parent_key):
+        # General purpose relink of child_key (and everything after it) onto parent_key
+        self.unlink(child_key)
+        if parent_key is None:
+            return
+
+        if parent_key in self.parent_to_child:
+            raise ValueError("Should not have duplicate parent keys in child -> parent map. Bad DAG.")
+        if self.get_root(parent_key) == child_key:
+            raise ValueError("Revision chains should not contain cycles. Bad DAG.")
+
+        chain_id = self.__ensure_chain(parent_key)
+        self.child_to_parent[child_key] = parent_key
+        self.parent_to_child[parent_key] = child_key
+
+        # Absorb our old chain into our parent's
+        old_chain_id = self.chain_ids.pop(child_key, None)
+        if old_chain_id is not None:
+            del self.chain_roots[old_chain_id]
+        self.__relabel(child_key, chain_id)
+
+    def unlink(self, child_key):
+        # Detach child_key from its parent. It (and everything after it) becomes a chain of its own.
+        if child_key not in self.child_to_parent:
+            return
+
+        parent_key = self.child_to_parent.pop(child_key)
+        del self.parent_to_child[parent_key]
+        self.__drop_if_singleton(self.chain_ids[parent_key], parent_key)
+
+        if child_key in self.parent_to_child:
+            self.__relabel(child_key, self.__new_chain(child_key))
+        else:
+            del self.chain_ids[child_key]
+
+    def __new_chain(self, root_key):
+        chain_id = self.__next_chain_id
+        self.__next_chain_id += 1
+        self.chain_roots[chain_id] = root_key
+        return chain_id
+
+    def __ensure_chain(self, root_key):
+        if root_key not in self.chain_ids:
+            self.chain_ids[root_key] = self.__new_chain(root_key)
+        return self.chain_ids[root_key]
+
+    def __relabel(self, start_key, chain_id):
+        key = start_key
+        while key is not None:
+            self.chain_ids[key] = chain_id
+            key = self.get_child(key)
+
+    def __drop_if_singleton(self, chain_id, unique_key):
+        # Entries that no longer link to anything don't need to carry a chain
+        if unique_key is None or unique_key in self.child_to_parent or unique_key in self.parent_to_child:
+            return
+        del self.chain_ids[unique_key]
+        if self.chain_roots.get(chain_id) == unique_key:
+            del self.chain_roots[chain_id]
+
+    def __len__(self):
+        return len(self.child_to_parent)
@@ -0,0 +1,298 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from data.data_holder import SerializationData
+from data.entries import Entry
+from utils.data import to_serialisable_dict
+
+DATABASE_SUFFIX = ".litrpgdb"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE characters (position INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE categories (position INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, data TEXT NOT NULL);
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    character INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    print_to_output INTEGER NOT NULL,
+    print_to_history INTEGER NOT NULL,
+    entry_values TEXT NOT NULL
+);
+CREATE TABLE history (uuid TEXT PRIMARY KEY, position REAL NOT NULL);
+CREATE TABLE revisions (uuid TEXT PRIMARY KEY, parent TEXT NOT NULL);
+CREATE TABLE tags (uuid TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE INDEX entries_by_character_category ON entries (character, category);
+CREATE INDEX history_by_position ON history (position);
+CREATE INDEX revisions_by_parent ON revisions (parent);
+"""
+
+
+def is_database_path(path):
+    return path is not None and path.endswith(DATABASE_SUFFIX)
+
+
+def _between(low, high):
+    # A history position strictly between two others (None being either end), None once floats run out of room
+    if low is None and high is None:
+        return 0.0
+    if low is None:
+        return high - 1.0
+    if high is None:
+        return low + 1.0
+
+    middle = (low + high) / 2.0
+    if low < middle < high:
+        return middle
+    return None
+
+
+class SessionDatabase:
+    """
+    A session stored in SQLite (.litrpgdb) rather than a single JSON document.
+
+    Opening one only reads the skeleton - characters, categories, tags, the history order, revision links and each
+    entry's category & character. Entry values stay in the database: loaded entries are backed by our rows (like an
+    EntryStore table) and each is read the first time something asks for it. Saving back to the database we were
+    opened from (or last fully saved to) is a single transaction touching only what changed since.
+
+    History order is kept as a REAL position per entry so an entry can be placed between its neighbours without
+    renumbering everything after it - we only renumber the lot once repeated halving runs out of precision.
+    """
+
+    def __init__(self, path, connection=None):
+        self.path = path
+        self.connection = connection  # None until create has written us out
+        self.lock = threading.RLock()  # Values can be read from background cache warm up threads
+        self.attached = True
+        self.positions = dict()  # uuid -> Stored history position
+        self.rows = dict()  # Row -> Entry backed by it
+        self.values = dict()  # Row -> Values read so far (or since set)
+
+    @staticmethod
+    def connect(path):
+        return sqlite3.connect(path, check_same_thread=False)
+
+    @classmethod
+    def open(cls, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError("No session database at " + path)
+        return cls(path, cls.connect(path))
+
+    @classmethod
+    def prepare_create(cls, path, data: SerializationData):
+        """
+        Returns the database a whole session will be written to at path (replacing any that was there) by create.
+        Data is the same (uuid keyed, exported entries & tags) SerializationData we save as JSON.
+        """
+        database = cls(path)
+        database.positions = {uuid_str: float(position) for position, uuid_str in enumerate(data.history)}
+        return database
+
+    def create(self, data: SerializationData):
+        # Only disk access - safe away from the engine's thread
+        try:
+            self.__create(data)
+        except Exception:
+            self.attached = False
+            raise
+
+    def __create(self, data: SerializationData):
+        temporary_path = self.path + ".tmp"
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+        connection = self.connect(temporary_path)
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [("version", json.dumps(SCHEMA_VERSION)), ("credentials", json.dumps(data.credentials)), ("history_index", json.dumps(data.history_index))])
+            self.__write_characters(connection, data.characters)
+            self.__write_categories(connection, data.categories)
+            self.__write_tags(connection, data.tags)
+
+            entries = [data.entries[uuid_str] for uuid_str in data.history]
+            connection.executemany("INSERT INTO entries (uuid, character, category, print_to_output, print_to_history, entry_values) VALUES (?, ?, ?, ?, ?, ?)", [self.__entry_row(entry) for entry in entries])
+            connection.executemany("INSERT INTO history (uuid, position) VALUES (?, ?)", [(uuid_str, float(position)) for position, uuid_str in enumerate(data.history)])
+            connection.executemany("INSERT INTO revisions (uuid, parent) VALUES (?, ?)", [(entry["unique_key"], entry["parent_key"]) for entry in entries if entry["parent_key"] is not None])
+        connection.close()
+        os.replace(temporary_path, self.path)
+
+        with self.lock:
+            self.connection = self.connect(self.path)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+
+    def is_attached(self, path):
+        return self.attached and self.path == path
+
+    def detach(self):
+        # Saved elsewhere since - we keep serving values for our rows but no longer have the session's latest state
+        self.attached = False
+
+    def read(self) -> SerializationData:
+        """
+        Reads our skeleton into the same SerializationData a JSON load produces, except that its entries are backed by
+        our rows & read on demand.
+        """
+        with self.lock:
+            connection = self.connection
+            try:
+                meta = {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM meta")}
+            except sqlite3.DatabaseError as error:
+                connection.close()
+                raise ValueError("Not a session database: " + str(error))
+            if meta.get("version", None) != SCHEMA_VERSION:
+                raise ValueError("Unsupported session database version: " + str(meta.get("version", None)))
+
+            data = {
+                "credentials": meta["credentials"],
+                "tags": {uuid_str: json.loads(tag) for uuid_str, tag in connection.execute("SELECT uuid, data FROM tags")},
+                "characters": [name for name, in connection.execute("SELECT name FROM characters ORDER BY position")],
+                "categories": OrderedDict((name, json.loads(category)) for name, category in connection.execute("SELECT name, data FROM categories ORDER BY position")),
+                "history": list(),
+                "history_index": meta["history_index"],
+                "entries": dict()
+            }
+            data_holder = SerializationData.from_json(data)
+
+            parents = dict(connection.execute("SELECT uuid, parent FROM revisions"))
+            query = "SELECT entries.id, entries.uuid, entries.character, entries.category, entries.print_to_output, entries.print_to_history, history.position FROM history JOIN entries ON entries.uuid = history.uuid ORDER BY history.position"
+            for row, uuid_str, character, category, print_to_output, print_to_history, position in connection.execute(query):
+                entry = Entry(category, None, uuid_str, parents.get(uuid_str, None), bool(print_to_output), character, bool(print_to_history))
+                entry.attach_row(self, row)
+                self.rows[row] = entry
+                self.positions[uuid_str] = position
+                data_holder.history.append(uuid_str)
+                data_holder.entries[uuid_str] = entry
+        return data_holder
+
+    def get_row(self, row):
+        with self.lock:
+            if row not in self.values:
+                entry_values, = self.connection.execute("SELECT entry_values FROM entries WHERE id = ?", (row,)).fetchone()
+                self.values[row] = json.loads(entry_values)
+            return self.values[row]
+
+    def set_row(self, row, values):
+        # Changed values are held until the engine saves them (the entry is marked as changed)
+        with self.lock:
+            self.values[row] = values
+
+    def release(self, row):
+        with self.lock:
+            self.rows.pop(row, None)
+            self.values.pop(row, None)
+
+    def detach_entries(self):
+        # Moves every entry still backed by us back into memory, returning them
+        with self.lock:
+            entries = list(self.rows.values())
+            for entry in entries:
+                entry.detach()
+        return entries
+
+    def prepare_update(self, engine, changes):
+        """
+        Captures the rows changes (as SessionJournal.take_changes returns them) will write, for apply_update. Touched
+        entries are placed between their neighbours: entries that weren't touched kept their relative order, so their
+        stored positions still increase along the history.
+        """
+        present, deleted, sections = changes
+        entry_ids = engine.entry_ids
+        history = engine.get_history()
+        touched = {unique_key for _, unique_key in present}
+        for uuid_str in deleted:
+            self.positions.pop(uuid_str, None)
+
+        positions = dict()
+        for index, unique_key in present:
+            low = positions.get(entry_ids.get_uuid(history[index - 1]), self.positions.get(entry_ids.get_uuid(history[index - 1]), None)) if index > 0 else None
+            following = index + 1
+            while following < len(history) and history[following] in touched:
+                following += 1
+            high = self.positions[entry_ids.get_uuid(history[following])] if following < len(history) else None
+
+            position = _between(low, high)
+            if position is None:
+                positions = {entry_ids.get_uuid(key): float(i) for i, key in enumerate(history)}
+                break
+            positions[entry_ids.get_uuid(unique_key)] = position
+        self.positions.update(positions)
+
+        return {
+            "deleted": deleted,
+            "entries": [entry_ids.export_entry(engine.get_entry(unique_key)) for _, unique_key in present],
+            "positions": positions,
+            "sections": sections,
+            "meta": [("credentials", json.dumps(engine.gsheets_credentials_path)), ("history_index", json.dumps(engine.get_history_index()))]
+        }
+
+    def apply_update(self, update):
+        # Writes a prepared update in one transaction - only disk access, safe away from the engine's thread
+        if not self.attached or self.connection is None:
+            raise OSError("An earlier save to " + self.path + " failed, the next save rewrites it in full.")
+        try:
+            self.__apply_update(update)
+        except Exception:
+            # Rolled back, but the changes it held are no longer tracked - the next save writes everything
+            self.attached = False
+            raise
+
+    def __apply_update(self, update):
+        with self.lock, self.connection as connection:
+            for uuid_str in update["deleted"]:
+                connection.execute("DELETE FROM entries WHERE uuid = ?", (uuid_str,))
+                connection.execute("DELETE FROM history WHERE uuid = ?", (uuid_str,))
+                connection.execute("DELETE FROM revisions WHERE uuid = ?", (uuid_str,))
+
+            # Renumbered - everything else moves too
+            positions = update["positions"]
+            touched = {entry["unique_key"] for entry in update["entries"]}
+            connection.executemany("UPDATE history SET position = ? WHERE uuid = ?", [(position, uuid_str) for uuid_str, position in positions.items() if uuid_str not in touched])
+
+            for entry in update["entries"]:
+                uuid_str = entry["unique_key"]
+                connection.execute("INSERT INTO entries (uuid, character, category, print_to_output, print_to_history, entry_values) VALUES (?, ?, ?, ?, ?, ?) "
+                                   "ON CONFLICT (uuid) DO UPDATE SET character = excluded.character, category = excluded.category, print_to_output = excluded.print_to_output, "
+                                   "print_to_history = excluded.print_to_history, entry_values = excluded.entry_values", self.__entry_row(entry))
+                connection.execute("INSERT OR REPLACE INTO history (uuid, position) VALUES (?, ?)", (uuid_str, positions[uuid_str]))
+                if entry["parent_key"] is None:
+                    connection.execute("DELETE FROM revisions WHERE uuid = ?", (uuid_str,))
+                else:
+                    connection.execute("INSERT OR REPLACE INTO revisions (uuid, parent) VALUES (?, ?)", (uuid_str, entry["parent_key"]))
+
+            sections = update["sections"]
+            if "characters" in sections:
+                connection.execute("DELETE FROM characters")
+                self.__write_characters(connection, sections["characters"])
+            if "categories" in sections:
+                connection.execute("DELETE FROM categories")
+                self.__write_categories(connection, sections["categories"])
+            if "tags" in sections:
+                connection.execute("DELETE FROM tags")
+                self.__write_tags(connection, sections["tags"])
+            connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", update["meta"])
+
+    @staticmethod
+    def __entry_row(entry: dict):
+        return entry["unique_key"], entry["character"], entry["category"], int(entry["print_to_output"]), int(entry["print_to_history"]), json.dumps(entry["values"])
+
+    @staticmethod
+    def __write_characters(connection, characters):
+        connection.executemany("INSERT INTO characters (position, name) VALUES (?, ?)", list(enumerate(characters)))
+
+    @staticmethod
+    def __write_categories(connection, categories):
+        connection.executemany("INSERT INTO categories (position, name, data) VALUES (?, ?, ?)", [(position, name, json.dumps(category, default=to_serialisable_dict)) for position, (name, category) in enumerate(categories.items())])
+
+    @staticmethod
+    def __write_tags(connection, tags):
+        connection.executemany("INSERT INTO tags (uuid, data) VALUES (?, ?)", [(uuid_str, json.dumps(tag, default=to_serialisable_dict)) for uuid_str, tag in tags.items()])
@@ -0,0 +1,356 @@
+import json
+import os
+import threading
+import uuid
+
+from data.data_holder import FORMAT_VERSION
+from data.indexed_history import IndexedHistory
+from data.revision_deltas import decode_entries, encode_entries
+from data.session_reader import check_format_version
+from utils.data import to_serialisable_dict
+
+JOURNAL_SUFFIX = ".journal"
+SECTIONS = ("characters", "categories", "tags")
+
+
+def get_journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+
+def read_records(journal_path):
+    """
+    Returns ([Record], Valid Byte Length) for a journal file. A final line that isn't complete JSON is the remains of a
+    save that never finished and is left out of both.
+    """
+    records = list()
+    valid_length = 0
+    if not os.path.exists(journal_path):
+        return records, valid_length
+
+    with open(journal_path, "rb") as journal_file:
+        for line in journal_file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            valid_length += len(line)
+    return records, valid_length
+
+
+def apply_records(data, records):
+    """
+    Replays journal records onto snapshot data (the .litrpg JSON as loaded) in place. Records from another journal, or
+    that the snapshot already includes, are skipped. Returns the sequence number of the last record applied.
+    """
+    journal = data.get("journal", None)
+    if journal is None:
+        return None
+
+    sequence = journal["seq"]
+    history = None
+    for record in records:
+        if record["journal"] != journal["id"] or record["seq"] <= sequence:
+            continue
+        if history is None:
+            history = IndexedHistory(data["history"])
+
+        # Entries whose place in history may have changed are taken out and put back after their predecessor, in
+        # history order so every predecessor is back in place first
+        for uuid_str in record["deleted"]:
+            if uuid_str in history:
+                history.remove(uuid_str)
+            data["entries"].pop(uuid_str, None)
+        for uuid_str, _ in record["order"]:
+            if uuid_str in history:
+                history.remove(uuid_str)
+        for uuid_str, predecessor in record["order"]:
+            history.insert(0 if predecessor is None else history.index(predecessor) + 1, uuid_str)
+        data["entries"].update(record["entries"])
+
+        for section in SECTIONS:
+            if section in record:
+                data[section] = record[section]
+        data["history_index"] = record["history_index"]
+        data["credentials"] = record["credentials"]
+        sequence = record["seq"]
+
+    if history is not None:
+        data["history"] = list(history)
+    journal["seq"] = sequence
+    return sequence
+
+
+def write_atomically(path, text):
+    # Readers (and crashes) only ever see the old file or the whole new one
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as output_file:
+        output_file.write(text)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+    os.replace(temporary_path, path)
+
+
+class SessionJournal:
+    """
+    Journaled persistence for a session: a base snapshot (the usual .litrpg file) plus an append only log beside it
+    (<path>.journal) of everything that changed at each save since.
+
+    We track which entries were touched between saves. Saving back to the snapshot we were loaded from (or last fully
+    saved) appends one line holding just those entries (or their deletion, plus where they now sit in the history),
+    whichever of the characters, categories and tags changed, and the history index - then fsyncs. Loading replays the
+    log on top of the snapshot.
+
+    Every snapshot carries a journal id and the sequence number of the last record folded into it, and every record
+    carries both too, so a log can never be replayed onto the wrong snapshot or twice. Once the log outgrows
+    compact_ratio of the snapshot, a background thread folds it into a fresh snapshot (from the files alone, the
+    engine is never touched), swaps that in and trims the records it folded in from the log.
+    """
+
+    def __init__(self, engine, compact_ratio=0.25, compact_min_bytes=1 << 20):
+        self.engine = engine
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.lock = threading.Lock()  # Our state, only ever held briefly
+        self.file_lock = threading.Lock()  # Writing our snapshot & log, which compaction does off to the side
+        self.worker = None
+
+        # The snapshot our log belongs to
+        self.path = None
+        self.journal_id = None
+        self.sequence = 0  # Last record handed out
+        self.written_sequence = 0  # Last record actually on disk
+        self.snapshot_bytes = 0
+        self.journal_bytes = 0
+
+        # What changed since our last save
+        self.dirty_entries = set()
+        self.saved_sections = dict()  # Section -> JSON as last written
+        self.saved_state = None  # (History Index, Credentials) as last written
+
+    def mark_entry(self, unique_key):
+        self.dirty_entries.add(unique_key)
+
+    def is_attached(self, path):
+        return path is not None and self.path == path
+
+    def detach(self):
+        with self.lock:
+            self.path = None
+            self.journal_id = None
+        self.dirty_entries.clear()
+        self.saved_sections.clear()
+        self.saved_state = None
+
+    def begin_snapshot(self, path):
+        """
+        Starts a new log for a full snapshot about to be written to path, returning the journal details to embed in
+        it. From here on saves to path append to that log (once write_snapshot has put the snapshot in place).
+        """
+        with self.lock:
+            self.path = path
+            self.journal_id = str(uuid.uuid4())
+            self.sequence = 0
+            self.written_sequence = 0
+        self.mark_clean()
+        return {"id": self.journal_id, "seq": 0}
+
+    def write_snapshot(self, path, text, journal_id):
+        # Only disk access - safe away from the engine's thread
+        try:
+            with self.file_lock:
+                write_atomically(path, text)
+                if os.path.exists(get_journal_path(path)):
+                    os.remove(get_journal_path(path))
+        except Exception:
+            self.__abandon(journal_id)
+            raise
+        with self.lock:
+            if self.journal_id == journal_id:
+                self.snapshot_bytes = len(text)
+                self.journal_bytes = 0
+
+    def load(self, path, data):
+        """
+        Replays our log onto freshly loaded snapshot data and picks up where it left off. A torn final record (from a
+        save that never finished) is cut off so later saves append cleanly.
+        """
+        journal_path = get_journal_path(path)
+        records, valid_length = read_records(journal_path)
+        sequence = apply_records(data, records)
+
+        with self.lock:
+            if sequence is None:
+                self.path = None
+                self.journal_id = None
+            else:
+                if os.path.exists(journal_path) and os.path.getsize(journal_path) != valid_length:
+                    with open(journal_path, "rb+") as journal_file:
+                        journal_file.truncate(valid_length)
+                self.path = path
+                self.journal_id = data["journal"]["id"]
+                self.sequence = sequence
+                self.written_sequence = sequence
+                self.snapshot_bytes = os.path.getsize(path)
+                self.journal_bytes = valid_length
+        self.dirty_entries.clear()
+
+    def mark_clean(self):
+        # Everything the engine now holds is on disk
+        self.dirty_entries.clear()
+        self.saved_sections = self.__get_sections()
+        self.saved_state = (self.engine.get_history_index(), self.engine.gsheets_credentials_path)
+
+    def take_changes(self):
+        """
+        Returns what changed since our last save and starts tracking afresh: ([(History Index, Entry Key)] for touched
+        entries still in history in history order, [uuid] of touched entries that were deleted, {Section: Value} for
+        the characters, categories and tags if they changed).
+        """
+        engine = self.engine
+        history = engine.get_history()
+        present = sorted((history.index(unique_key), unique_key) for unique_key in self.dirty_entries if unique_key in history)
+
+        # Entries created and deleted between saves never made it to disk
+        deleted = [engine.entry_ids.get_uuid(unique_key) for unique_key in self.dirty_entries if unique_key not in history and unique_key in engine.entry_ids.uuids]
+
+        sections = self.__get_sections()
+        changed = {section: json.loads(text) for section, text in sections.items() if self.saved_sections.get(section, None) != text}
+
+        self.dirty_entries.clear()
+        self.saved_sections = sections
+        return present, deleted, changed
+
+    def prepare_append(self):
+        """
+        Captures the record our next save appends, None if nothing changed. Only the record is needed to write it
+        (see write_record), the engine can carry on being edited meanwhile.
+        """
+        state = (self.engine.get_history_index(), self.engine.gsheets_credentials_path)
+        if len(self.dirty_entries) == 0 and state == self.saved_state and self.__get_sections() == self.saved_sections:
+            return None
+
+        record = self.__build_record()
+        self.saved_state = state
+        with self.lock:
+            self.sequence += 1
+            record["seq"] = self.sequence
+        return record
+
+    def write_record(self, path, record):
+        # Records are written in the order they were prepared (the engine has a single writer)
+        line = json.dumps(record, default=to_serialisable_dict) + "\n"
+        with self.lock:
+            if self.journal_id != record["journal"]:
+                raise OSError("An earlier save to " + path + " failed, the next save rewrites it in full.")
+        try:
+            with self.file_lock:
+                with open(get_journal_path(path), "a") as journal_file:
+                    journal_file.write(line)
+                    journal_file.flush()
+                    os.fsync(journal_file.fileno())
+        except Exception:
+            self.__abandon(record["journal"])
+            raise
+
+        with self.lock:
+            self.written_sequence = record["seq"]
+            self.journal_bytes += len(line.encode())
+            should_compact = self.journal_bytes > max(self.compact_min_bytes, self.compact_ratio * self.snapshot_bytes)
+
+        if should_compact:
+            self.compact_in_background()
+
+    def append(self):
+        record = self.prepare_append()
+        if record is not None:
+            self.write_record(self.path, record)
+
+    def __abandon(self, journal_id):
+        # A write failed so our log can't be trusted to follow on - the next save writes a whole new snapshot (it holds
+        # everything the lost changes did) and anything written after it meanwhile is refused
+        with self.lock:
+            if self.journal_id == journal_id:
+                self.path = None
+                self.journal_id = None
+
+    def compact_in_background(self):
+        if self.worker is not None and self.worker.is_alive():
+            return
+        self.worker = threading.Thread(target=self.compact, daemon=True)
+        self.worker.start()
+
+    def compact(self):
+        """
+        Folds the log into a new snapshot. Records appended while we work stay in the log, and if the session was
+        loaded or fully saved elsewhere in the meantime our work is thrown away.
+        """
+        with self.lock:
+            path, journal_id, sequence = self.path, self.journal_id, self.written_sequence
+        if path is None:
+            return
+
+        with self.file_lock:
+            with open(path, "r") as json_file:
+                data = json.load(json_file)
+            records, _ = read_records(get_journal_path(path))
+        if data.get("journal", None) is None or data["journal"]["id"] != journal_id:
+            return
+
+        # Revisions are decoded against the parents they were encoded against, before any record replaces those
+        check_format_version(data.get("format_version", 1))
+        decode_entries(data["entries"])
+        apply_records(data, [record for record in records if record["seq"] <= sequence])
+
+        # Keep entries in history order - just helps debugging save data (and lets readers decode revisions as they go)
+        data["entries"] = {uuid_str: data["entries"][uuid_str] for uuid_str in data["history"]}
+        encode_entries(data["entries"])
+        data.pop("format_version", None)
+        data = {"format_version": FORMAT_VERSION, **data}  # It leads so readers see it before our entries
+        text = json.dumps(data, indent=4)
+        temporary_path = path + ".compact"
+        with open(temporary_path, "w") as output_file:
+            output_file.write(text)
+            output_file.flush()
+            os.fsync(output_file.fileno())
+
+        with self.file_lock, self.lock:
+            if self.path != path or self.journal_id != journal_id:
+                os.remove(temporary_path)
+                return
+
+            # The new snapshot includes everything up to sequence, so from here the log's older records are skipped
+            os.replace(temporary_path, path)
+            records, _ = read_records(get_journal_path(path))
+            remaining = "".join(json.dumps(record) + "\n" for record in records if record["journal"] == journal_id and record["seq"] > sequence)
+            write_atomically(get_journal_path(path), remaining)
+            self.snapshot_bytes = len(text)
+            self.journal_bytes = len(remaining.encode())
+
+    def __get_sections(self):
+        engine = self.engine
+        sections = {
+            "characters": engine.get_characters(),
+            "categories": engine.get_categories(),
+            "tags": {engine.entry_ids.get_uuid(entry_key): engine.entry_ids.export_tag(tag) for entry_key, tag in engine.get_tags().items()}
+        }
+        return {section: json.dumps(value, default=to_serialisable_dict) for section, value in sections.items()}
+
+    def __build_record(self):
+        engine = self.engine
+        entry_ids = engine.entry_ids
+        history = engine.get_history()
+        present, deleted, sections = self.take_changes()
+        record = {"journal": self.journal_id, "seq": None, "entries": dict(), "deleted": deleted, "order": list()}
+
+        # Touched entries still about, in history order, alongside whatever now precedes them
+        for position, unique_key in present:
+            uuid_str = entry_ids.get_uuid(unique_key)
+            record["entries"][uuid_str] = entry_ids.export_entry(engine.get_entry(unique_key))
+            record["order"].append([uuid_str, entry_ids.get_uuid(history[position - 1]) if position > 0 else None])
+
+        record.update(sections)
+        record["history_index"] = engine.get_history_index()
+        record["credentials"] = engine.gsheets_credentials_path
+        return record
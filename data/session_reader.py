@@ -0,0 +1,178 @@
+import codecs
+import json
+import os
+
+from data.data_holder import FORMAT_VERSION
+from data.entries import Entry
+from data.revision_deltas import decode_entries, decode_entry, share_parent_values
+
+LEGACY_MARKER = '"__class__"'
+
+
+def is_legacy_session(path):
+    # Legacy saves are a serialised DataHolder, whose first key is always its class name
+    with open(path, "r") as json_file:
+        start = json_file.read(64).lstrip()
+    return start.startswith("{") and start[1:].lstrip().startswith(LEGACY_MARKER)
+
+
+def check_format_version(format_version):
+    if not isinstance(format_version, int) or format_version > FORMAT_VERSION:
+        raise ValueError("Session file format " + str(format_version) + " is newer than this version of LitRPGTools reads (up to format " + str(FORMAT_VERSION) + ").")
+
+
+class _StreamingDecoder:
+    """
+    Reads one JSON document from a binary file a chunk at a time. Values are decoded whole (via the standard decoder)
+    once enough of the file has been read to hold them, so a caller can walk a big object member by member without the
+    entire document ever being in memory. Chunks are decoded from UTF-8 as they are read (a character split across two
+    chunks is held back until the next), so progress is counted in bytes like the file's size.
+    """
+
+    def __init__(self, json_file, total, progress=None, chunk_size=1 << 16):
+        self.file = json_file
+        self.total = total
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.read_count = 0  # Bytes
+        self.character_count = 0  # Characters decoded into our buffer so far
+        self.finished = False
+
+    def __read(self, size):
+        # Drop what we've consumed before growing our buffer
+        if self.position > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.position:]
+            self.position = 0
+
+        data = self.file.read(size)
+        if data == b"":
+            # Anything still held back is a character the file cut short, which this reports
+            self.text_decoder.decode(b"", final=True)
+            self.finished = True
+            return False
+
+        chunk = self.text_decoder.decode(data)
+        self.buffer += chunk
+        self.read_count += len(data)
+        self.character_count += len(chunk)
+        if self.progress is not None:
+            self.progress(min(self.read_count, self.total), self.total)
+        return True
+
+    def __ensure(self, count=1):
+        while len(self.buffer) - self.position < count and self.__read(self.chunk_size):
+            pass
+        return len(self.buffer) - self.position >= count
+
+    def skip_whitespace(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\n\r":
+                self.position += 1
+            if self.position < len(self.buffer) or not self.__ensure():
+                return
+
+    def peek(self):
+        self.skip_whitespace()
+        if not self.__ensure():
+            raise ValueError("Unexpected end of session file.")
+        return self.buffer[self.position]
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError("Expected '" + character + "' at character " + str(self.character_count - len(self.buffer) + self.position) + " of the session file.")
+        self.position += 1
+
+    def next_separator(self, closing):
+        # True if another member follows, False once the container is closed
+        character = self.peek()
+        self.position += 1
+        if character == ",":
+            return True
+        if character == closing:
+            return False
+        raise ValueError("Expected ',' or '" + closing + "' in the session file.")
+
+    def decode(self):
+        # The whole value has to be buffered, and a number could still be cut short at the end of our buffer
+        self.skip_whitespace()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.finished:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.finished:
+                    raise
+
+            # Grow geometrically so huge values (e.g. our history) still only take a linear amount of reading
+            self.__read(size)
+            size *= 2
+
+
+def read_session(path, progress=None):
+    """
+    Reads a (non legacy) .litrpg session in a single streaming pass. Returns its JSON as a dict, except that entries
+    are already Entry objects - each is built as soon as it is parsed so the file's entries are never held as both raw
+    JSON and objects. Revisions share their parent's objects for the values they didn't change, and delta encoded
+    ones are decoded as they are read (or at the end, in the rare case their parent comes after them). Progress is
+    called with (Bytes Read, File Size).
+    """
+    data = dict()
+    format_version = 1
+    with open(path, "rb") as json_file:
+        decoder = _StreamingDecoder(json_file, os.path.getsize(path), progress)
+        decoder.expect("{")
+        if decoder.peek() == "}":
+            return data
+
+        while True:
+            key = decoder.decode()
+            decoder.expect(":")
+            if key == "format_version":
+                format_version = decoder.decode()
+                check_format_version(format_version)
+                data[key] = format_version
+            elif key == "entries":
+                entries = dict()
+                pending = False
+                decoder.expect("{")
+                if decoder.peek() == "}":
+                    decoder.expect("}")
+                else:
+                    while True:
+                        uuid_str = decoder.decode()
+                        decoder.expect(":")
+                        value = decoder.decode()
+                        if "delta" in value and format_version < 2:
+                            raise ValueError("Entry " + str(uuid_str) + " is stored as a revision delta, which format " + str(format_version) + " session files can't hold.")
+                        parent = entries.get(value.get("parent_key", None), None)
+                        if isinstance(parent, Entry):
+                            if "delta" in value:
+                                decode_entry(value, parent.get_values())
+                            else:
+                                value["values"] = share_parent_values(value["values"], parent.get_values())
+
+                        if "delta" in value:
+                            entries[uuid_str] = value
+                            pending = True
+                        else:
+                            entries[uuid_str] = Entry.from_json(value)
+                        if not decoder.next_separator("}"):
+                            break
+
+                if pending:
+                    decode_entries(entries)
+                    entries = {uuid_str: Entry.from_json(value) if isinstance(value, dict) else value for uuid_str, value in entries.items()}
+                data[key] = entries
+            else:
+                data[key] = decoder.decode()
+
+            if not decoder.next_separator("}"):
+                break
+    return data
@@ -0,0 +1,165 @@
+import threading
+from itertools import islice
+
+from data.derived_values import to_variable_name, get_entry_variables
+from utils.expressions import compile_expression
+
+
+class StateSimulation:
+    """
+    Event sourced simulation of each character's state.
+
+    Every entry in the history is an event. Categories declare modifications as (State Variable, Expression) pairs,
+    the expression being in Parser syntax over the entry's own properties and the character's current state variables
+    (entry properties win if a name is both). Applying an event evaluates each of its category's modifications in order
+    and writes the result back into the character's state vector. State variables start at 0.
+
+    Like HistoryCheckpoints we snapshot every state vector every interval events so resolving any history index replays
+    at most interval events, and a mutation only drops the snapshots from its position onwards. Snapshots are built
+    lazily, either on demand or ahead of time on a background thread via warm_up, so the GUI thread can stay clear of
+    long replays.
+    """
+
+    def __init__(self, engine, interval=256):
+        self.engine = engine
+        self.interval = interval
+        self.checkpoints = list()  # Checkpoint n is the state after applying history[0 .. (n + 1) * interval - 1]
+        self.compiled = dict()  # Category -> [(State Variable, CompiledExpression)]
+        self.generation = 0  # Bumped by every invalidation so background work can tell it is stale
+        self.lock = threading.RLock()
+        self.worker = None
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.checkpoints.clear()
+            self.compiled = dict()  # Replaced rather than cleared as a background warm up may still hold the old one
+
+    def invalidate_from(self, index):
+        with self.lock:
+            self.generation += 1
+            del self.checkpoints[max(0, index) // self.interval:]
+
+    def state_at(self, index, character):
+        # Returns State Variable -> Value for the character after history[index] has been applied
+        index = min(index, len(self.engine.get_history()) - 1)
+        with self.lock:
+            usable = (index + 1) // self.interval
+            self.__build_up_to(usable)
+
+            states = dict()
+            if usable > 0 and character in self.checkpoints[usable - 1]:
+                states[character] = dict(self.checkpoints[usable - 1][character])
+
+            # Replay the remainder, only our character's events matter
+            position = usable * self.interval
+            for unique_key in self.engine.get_history().iterate_from(position):
+                if position > index:
+                    break
+
+                entry = self.engine.get_entry(unique_key)
+                if entry.character == character:
+                    self.__apply(entry, states, self.compiled, self.engine.get_categories())
+                position += 1
+
+        return states.get(character, dict())
+
+    def warm_up(self, index=None):
+        """
+        Builds the checkpoints up to index (default the end of the history) on a background thread. Work invalidated
+        by a mutation while it runs is discarded.
+        """
+        if self.worker is not None and self.worker.is_alive():
+            return
+
+        history = self.engine.get_history()
+        if index is None:
+            index = len(history) - 1
+        count = (index + 1) // self.interval
+        with self.lock:
+            start = len(self.checkpoints)
+            if start >= count:
+                return
+
+            # Only the engine's thread edits the history, so we take the events to replay from it here - the worker
+            # never walks the history (or the categories) while they may be changing
+            generation = self.generation
+            entries = [self.engine.get_entry(unique_key) for unique_key in islice(history.iterate_from(start * self.interval), (count - start) * self.interval)]
+            categories = dict(self.engine.get_categories())
+
+        self.worker = threading.Thread(target=self.__warm_up, args=(generation, start, count, entries, categories), daemon=True)
+        self.worker.start()
+
+    def __warm_up(self, generation, first, count, entries, categories):
+        while True:
+            with self.lock:
+                start = len(self.checkpoints)
+                if self.generation != generation or start >= count:
+                    return
+                state = self.__copy_last_checkpoint()
+                compiled = self.compiled
+
+            # Replay outside of our lock so foreground queries are never stuck behind us
+            offset = (start - first) * self.interval
+            for entry in entries[offset:offset + self.interval]:
+                if self.generation != generation:
+                    return
+                self.__apply(entry, state, compiled, categories)
+
+            with self.lock:
+                # A foreground query may have built this checkpoint meanwhile
+                if self.generation == generation and len(self.checkpoints) == start:
+                    self.checkpoints.append(state)
+
+    def __build_up_to(self, count):
+        while len(self.checkpoints) < count:
+            state = self.__copy_last_checkpoint()
+            self.__replay_interval(state, len(self.checkpoints) * self.interval, self.compiled)
+            self.checkpoints.append(state)
+
+    def __copy_last_checkpoint(self):
+        # We never mutate a stored checkpoint
+        if len(self.checkpoints) == 0:
+            return dict()
+        return {character: dict(variables) for character, variables in self.checkpoints[-1].items()}
+
+    def __replay_interval(self, states, start, compiled):
+        categories = self.engine.get_categories()
+        for unique_key in islice(self.engine.get_history().iterate_from(start), self.interval):
+            self.__apply(self.engine.get_entry(unique_key), states, compiled, categories)
+
+    def __get_modifications(self, category_name, compiled, categories):
+        if category_name not in compiled:
+            modifications = list()
+            if category_name in categories:
+                for variable, expression in categories[category_name].get_modifications():
+                    modifications.append((to_variable_name(variable), compile_expression(expression)))
+            compiled[category_name] = modifications
+        return compiled[category_name]
+
+    def __apply(self, entry, states, compiled, categories):
+        modifications = self.__get_modifications(entry.get_category(), compiled, categories)
+        if len(modifications) == 0:
+            return
+
+        if entry.character not in states:
+            states[entry.character] = dict()
+        state = states[entry.character]
+
+        # Numeric entry values are available by property name
+        entry_variables = get_entry_variables(categories[entry.get_category()], entry)
+
+        for variable, expression in modifications:
+            variables = dict()
+            for name in expression.variables:
+                key = to_variable_name(name)
+                if key in entry_variables:
+                    variables[name] = entry_variables[key]
+                else:
+                    variables[name] = state.get(key, 0.0)
+
+            # A modification that can't be calculated leaves the state as it was
+            try:
+                state[variable] = expression.evaluate(variables)
+            except Exception:
+                continue
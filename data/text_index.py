@@ -0,0 +1,178 @@
+import re
+from bisect import bisect_left
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+class TextIndex:
+    """
+    Inverted full text index over the values of every entry.
+
+    Each token maps to (Category, Character) -> Entry Key -> Field Index -> Token Positions so both single term and
+    phrase queries only touch the postings of the terms involved, and a search scoped to a category and / or character
+    only those of its scope. Entries remember their scope and the tokens they contributed so they can be unindexed
+    without rescanning anything else.
+
+    Prefix queries bisect a sorted vocabulary. New tokens are only queued for it and tokens no longer in use are left in
+    place, both are settled in one (linear) merge by the next prefix query rather than costing a list insert each.
+    """
+
+    def __init__(self):
+        self.postings = dict()  # Token -> (Category, Character) -> Entry Key -> Field Index -> Positions
+        self.vocabulary = list()  # Sorted tokens, may hold some no longer in postings
+        self.new_tokens = list()  # Tokens added to postings since vocabulary was last merged
+        self.entry_tokens = dict()  # Entry Key -> ((Category, Character), Tokens)
+        self.pending = None  # Live Entry Key -> Entry dict to index on first search
+
+    def clear(self):
+        self.postings.clear()
+        self.vocabulary.clear()
+        self.new_tokens.clear()
+        self.entry_tokens.clear()
+        self.pending = None
+
+    def rebuild(self, entries: dict):
+        self.clear()
+        for entry in entries.values():
+            self.add(entry)
+
+    def defer(self, entries: dict):
+        # Index entries the first time we're searched instead - reading every value can be most of the cost of a load.
+        # Entries is the engine's live dict, so changes made until then are already reflected in it and skipped here
+        self.clear()
+        self.pending = entries
+
+    def __ensure_built(self):
+        if self.pending is not None:
+            self.rebuild(self.pending)
+
+    def add(self, entry):
+        if self.pending is not None:
+            return
+
+        unique_key = entry.get_unique_key()
+        scope = (entry.get_category(), entry.character)
+        tokens = set()
+        for field_index, value in enumerate(entry.get_values()):
+            for position, token in enumerate(tokenize(value)):
+                if token not in self.postings:
+                    self.postings[token] = dict()
+                    self.new_tokens.append(token)
+                fields = self.postings[token].setdefault(scope, dict()).setdefault(unique_key, dict())
+                fields.setdefault(field_index, []).append(position)
+                tokens.add(token)
+        self.entry_tokens[unique_key] = (scope, tokens)
+
+    def remove(self, entry):
+        if self.pending is not None:
+            return
+
+        scope, tokens = self.entry_tokens.pop(entry.get_unique_key(), (None, ()))
+        for token in tokens:
+            scopes = self.postings[token]
+            scopes[scope].pop(entry.get_unique_key(), None)
+            if len(scopes[scope]) == 0:
+                del scopes[scope]
+                if len(scopes) == 0:
+                    del self.postings[token]
+
+    def update(self, entry):
+        self.remove(entry)
+        self.add(entry)
+
+    def rename_category(self, category_name, new_category_name):
+        # Moves the renamed category's postings over to its new scopes
+        if self.pending is not None:
+            return
+
+        for unique_key, (scope, tokens) in self.entry_tokens.items():
+            if scope[0] != category_name:
+                continue
+
+            new_scope = (new_category_name, scope[1])
+            for token in tokens:
+                scopes = self.postings[token]
+                scopes.setdefault(new_scope, dict())[unique_key] = scopes[scope].pop(unique_key)
+                if len(scopes[scope]) == 0:
+                    del scopes[scope]
+            self.entry_tokens[unique_key] = (new_scope, tokens)
+
+    def expand_prefix(self, prefix):
+        self.__ensure_built()
+        if len(self.new_tokens) != 0:
+            # Two sorted runs, so this sort is a linear merge - dropping duplicates and tokens no longer in use as we go
+            merged = sorted(self.vocabulary + sorted(self.new_tokens))
+            self.vocabulary = [token for i, token in enumerate(merged) if token in self.postings and (i == 0 or merged[i - 1] != token)]
+            self.new_tokens.clear()
+
+        start = bisect_left(self.vocabulary, prefix)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(prefix):
+            end += 1
+        return [token for token in self.vocabulary[start:end] if token in self.postings]
+
+    def search(self, query, prefix=False, category_name=None, character=None):
+        """
+        Returns the (Entry Key, Field Index) pairs where the query's tokens appear consecutively, optionally only for
+        entries of the given category and / or character. If prefix is set the final token only has to begin a word.
+        """
+        self.__ensure_built()
+        tokens = tokenize(query)
+        if len(tokens) == 0:
+            return []
+
+        # Resolve the candidate postings (each (Category, Character) -> Entry Key -> ...) for each query position
+        candidates = list()
+        for i, token in enumerate(tokens):
+            if prefix and i == len(tokens) - 1:
+                matches = [self.postings[match] for match in self.expand_prefix(token)]
+            elif token in self.postings:
+                matches = [self.postings[token]]
+            else:
+                matches = []
+            if len(matches) == 0:
+                return []
+            candidates.append(matches)
+
+        def in_scope(scope):
+            return (category_name is None or scope[0] == category_name) and (character is None or scope[1] == character)
+
+        # Only consider entries within our scope holding our rarest term
+        def count(matches):
+            return sum(len(postings) for scopes in matches for scope, postings in scopes.items() if in_scope(scope))
+
+        rarest = min(range(len(candidates)), key=lambda i: count(candidates[i]))
+        hits = dict()
+        for scopes in candidates[rarest]:
+            for scope, postings in scopes.items():
+                if not in_scope(scope):
+                    continue
+                for unique_key, fields in postings.items():
+                    for field_index in fields:
+                        if (unique_key, field_index) not in hits and self.__matches_phrase(candidates, scope, unique_key, field_index):
+                            hits[(unique_key, field_index)] = None
+        return list(hits.keys())
+
+    @staticmethod
+    def __positions(matches, scope, unique_key, field_index):
+        positions = set()
+        for scopes in matches:
+            postings = scopes.get(scope, None)
+            if postings is not None and unique_key in postings and field_index in postings[unique_key]:
+                positions.update(postings[unique_key][field_index])
+        return positions
+
+    def __matches_phrase(self, candidates, scope, unique_key, field_index):
+        starts = self.__positions(candidates[0], scope, unique_key, field_index)
+        for offset in range(1, len(candidates)):
+            if len(starts) == 0:
+                return False
+            positions = self.__positions(candidates[offset], scope, unique_key, field_index)
+            starts = {start for start in starts if start + offset in positions}
+        return len(starts) != 0
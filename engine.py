@@ -0,0 +1,1149 @@
+import json
+import re
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import partial
+
+from data.categories import Category
+from data.derived_values import DerivedValues, DerivedValueError, format_value, to_variable_name
+from data.data_holder import SerializationData
+from data.entries import Entry
+from data.entry_ids import EntryIds
+from data.entry_indexes import EntryIndexes
+from data.entry_store import EntryStore
+from data.history_cache import EntryHistoryCache
+from data.history_checkpoints import HistoryCheckpoints
+from data.indexed_history import IndexedHistory
+from data.modifier_stacks import ModifierStacks
+from data.revision_deltas import encode_entries, share_parent_values
+from data.revision_links import RevisionLinks
+from data.session_database import SessionDatabase, is_database_path
+from data.session_journal import SessionJournal
+from data.session_reader import is_legacy_session, read_session
+from data.state_simulation import StateSimulation
+from data.tags import Tag
+from data.text_index import TextIndex
+from utils.data import DataHolder, convert_to_dict, dict_to_obj, to_serialisable_dict
+
+
+class LitRPGEngine:
+    """
+    Everything but the GUI: session state, caches, persistence and Google Sheets export. Takes file paths and progress
+    callbacks rather than asking for them, and imports neither PyQt6 nor enchant (pygsheets only when exporting) so it
+    can be scripted, benchmarked or run on a server.
+    """
+
+    def __init__(self, columnar_storage=False):
+        # Data holders
+        self.characters = list()
+        self.categories = OrderedDict()
+
+        # Data holders
+        self.__history_index = -1
+        self.history = IndexedHistory()
+        self.entries = dict()
+        self.entry_ids = EntryIds()  # Integer entry key <-> persisted uuid
+        self.gsheets_credentials_path = None
+        self.tags = dict()
+
+        # Caches
+        self.history_cache = EntryHistoryCache(self)  # Revision chains & latest entries up to our history index
+        self.history_checkpoints = HistoryCheckpoints(self)  # Periodic snapshots of latest entries for read only time travel
+        self.revision_links = RevisionLinks()  # Child <-> Parent Cache for Entries
+        self.entry_indexes = EntryIndexes()  # Category / Character -> Entries
+        self.text_index = TextIndex()  # Value tokens -> Entries & Fields
+        self.derived_values = DerivedValues(self)  # Computed properties per history index
+        self.state_simulation = StateSimulation(self)  # Character state vectors replayed from category modifications
+        self.modifier_stacks = ModifierStacks(self)  # Per character stat modifier compositions over the history
+        self.entry_store = EntryStore() if columnar_storage else None  # Optional per category columnar value storage
+
+        # Debug switch - cross check our incrementally maintained caches against a full rebuild after each change
+        self.validate_caches = False
+
+        # Our state is only ever read & edited on the thread we were made on, saves copy what they need off it
+        self.__thread = threading.get_ident()
+
+        # Transactions
+        self.__batch_depth = 0
+        self.__batch_journal = list()  # Inverse operations for everything applied in the outermost open batch
+        self.__rolling_back = False
+        self.__first_edit = None  # Journal position of the open batch's first change beyond moving our history index
+        self.change_listeners = list()  # Called with whether anything beyond our history index changed
+        self.__loading = False  # Loading isn't a change to the session, so listeners aren't told of it
+
+        # Undo / Redo - each step is the inverse journal of one committed batch
+        self.undo_limit = 200
+        self.undo_stack = deque(maxlen=self.undo_limit)
+        self.redo_stack = deque(maxlen=self.undo_limit)
+        self.__replaying = None  # Which stack the open batch's journal belongs on while undoing / redoing
+
+        # Subcomponents
+        self.gsheets_connector = None
+        self.session_path = None
+        self.session_journal = SessionJournal(self)  # Appends each save's changes to our session rather than rewriting it
+        self.session_database = None  # The .litrpgdb we were loaded from / last saved to, if any
+        self.__writer = None  # Thread our saves are written on
+        self.__last_save = None  # Future of the most recent save
+
+        # Unused but it's a nice template
+        self.__character_sheet_template = None
+        self.__components = dict()
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups engine mutations into a single transaction. Cache replay is deferred until the outermost batch exits, at
+        which point change listeners are notified exactly once. If the block raises, everything applied within it is
+        undone (in reverse order) before the exception propagates. Batches can be nested. Listeners are passed whether
+        the batch edited anything, as opposed to just moving our history index.
+        """
+        savepoint = len(self.__batch_journal)
+        self.__batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.__rollback(savepoint)
+            raise
+        finally:
+            self.__batch_depth -= 1
+            if self.__batch_depth == 0:
+                journal = self.__batch_journal
+                edited = self.__first_edit is not None
+                self.__batch_journal = list()
+                self.__first_edit = None
+                if edited:
+                    self.__push_undo_step(journal)
+                self.__sync_caches()
+                if len(journal) != 0 and not self.__loading:
+                    self.__notify_changed(edited)
+
+    def in_batch(self):
+        return self.__batch_depth != 0
+
+    def add_change_listener(self, callback):
+        self.change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        if callback in self.change_listeners:
+            self.change_listeners.remove(callback)
+
+    def __notify_changed(self, edited):
+        for callback in list(self.change_listeners):
+            callback(edited)
+
+    def __record(self, inverse, navigation=False):
+        # Navigation is undone alongside the edits it happened with but never forms an undo step on its own
+        if not self.__rolling_back:
+            if not navigation and self.__first_edit is None:
+                self.__first_edit = len(self.__batch_journal)
+            self.__batch_journal.append(inverse)
+
+    def __rollback(self, savepoint):
+        self.__rolling_back = True
+        try:
+            while len(self.__batch_journal) > savepoint:
+                inverse = self.__batch_journal.pop()
+                inverse()
+        finally:
+            self.__rolling_back = False
+            if self.__first_edit is not None and self.__first_edit >= len(self.__batch_journal):
+                self.__first_edit = None
+
+    def __push_undo_step(self, journal):
+        if self.__replaying == "undo":
+            self.redo_stack.append(journal)
+        elif self.__replaying == "redo":
+            self.undo_stack.append(journal)
+        else:
+            self.undo_stack.append(journal)
+            self.redo_stack.clear()
+
+    def can_undo(self):
+        return len(self.undo_stack) != 0
+
+    def can_redo(self):
+        return len(self.redo_stack) != 0
+
+    def undo(self):
+        """
+        Reverts the most recent committed batch by applying its recorded inverses, which go through the same
+        incremental paths as any other edit. The inverses record their own inverses as they run and that journal becomes
+        the matching redo step.
+        """
+        if len(self.undo_stack) != 0:
+            self.__replay(self.undo_stack, "undo")
+
+    def redo(self):
+        if len(self.redo_stack) != 0:
+            self.__replay(self.redo_stack, "redo")
+
+    def set_undo_limit(self, limit):
+        self.undo_limit = limit
+        self.undo_stack = deque(self.undo_stack, maxlen=limit)
+        self.redo_stack = deque(self.redo_stack, maxlen=limit)
+
+    def clear_undo_history(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def __replay(self, stack, direction):
+        if self.in_batch():
+            raise RuntimeError("Cannot " + direction + " while a batch is open.")
+
+        journal = stack.pop()
+        self.__replaying = direction
+        try:
+            with self.batch():
+                for inverse in reversed(journal):
+                    inverse()
+
+        # Our batch has rolled us back to where we were so the step is still valid
+        except BaseException:
+            stack.append(journal)
+            raise
+        finally:
+            self.__replaying = None
+
+    def add_character(self, nickname):
+        with self.batch():
+            self.characters.append(nickname)
+            self.__record(partial(self.delete_character_by_index, len(self.characters) - 1))
+
+    def get_character(self, index):
+        return self.characters[index]
+
+    def get_characters(self):
+        return self.characters
+
+    def delete_character(self, character):
+        self.delete_character_by_index(self.characters.index(character))
+
+    def delete_character_by_index(self, index):
+        with self.batch():
+            character = self.characters.pop(index)
+            self.__record(partial(self.__insert_character, index, character))
+
+    def __insert_character(self, index, character):
+        with self.batch():
+            self.characters.insert(index, character)
+            self.__record(partial(self.delete_character_by_index, index))
+
+    def get_category(self, category_name: str) -> Category:
+        return self.categories[category_name]
+
+    def get_categories(self):
+        return self.categories
+
+    def set_categories(self, categories: OrderedDict):
+        with self.batch():
+            self.__record(partial(self.set_categories, self.categories))
+            self.categories = categories
+            self.derived_values.clear()
+            self.state_simulation.clear()
+            self.modifier_stacks.rebuild()
+
+    def add_category(self, category: Category):
+        self.check_category_variables(category)
+        with self.batch():
+            self.__record(partial(self.set_categories, OrderedDict(self.categories)))
+            self.categories[category.get_name()] = category
+            self.derived_values.clear()
+            self.state_simulation.clear()
+            self.modifier_stacks.rebuild()
+
+    def edit_category(self, category_name, category: Category, instructions=None):
+        if category_name not in self.categories:
+            return
+        self.check_category_variables(category, category_name)
+
+        with self.batch():
+            old_category = self.categories[category_name]
+
+            # Try and maintain our order
+            if category_name != category.get_name():
+                new_categories = OrderedDict()
+                for category_key, value in self.categories.items():
+                    if category_key != category_name:
+                        new_categories[category_key] = value
+                    else:
+                        new_categories[category.get_name()] = category
+
+                self.categories = new_categories
+
+            else:
+                self.categories[category.get_name()] = category
+
+            # Change all entries
+            if category_name != category.get_name():
+                renamed_entries = list(self.get_all_category_entries(category_name))
+                for entry in renamed_entries:
+                    entry.category = category.get_name()
+                    self.session_journal.mark_entry(entry.get_unique_key())
+
+                self.entry_indexes.rename_category(category_name, category.get_name())
+                self.text_index.rename_category(category_name, category.get_name())
+                if self.entry_store is not None:
+                    self.entry_store.rename_category(category_name, category.get_name(), renamed_entries)
+                self.history_cache.rename_category(category_name, category.get_name())
+                self.history_checkpoints.clear()
+                self.__validate_caches()
+            self.derived_values.clear()
+            self.state_simulation.clear()
+            self.modifier_stacks.rebuild()
+            self.__record(partial(self.edit_category, category.get_name(), old_category))
+
+            # Restructure our entries' values to match any property changes
+            if instructions is not None and len(instructions) != 0:
+                self.apply_category_instructions(category.get_name(), instructions)
+
+    def apply_category_instructions(self, category_name, instructions):
+        with self.batch():
+            for entry in self.get_all_category_entries(category_name):
+                values = list(entry.get_values())
+
+                # Handle all available instructions in order (ORDER MATTERS)
+                for instruction, location in instructions:
+                    if instruction == "INSERT_AT":
+                        values.insert(location, "")
+                    elif instruction == "DELETE":
+                        values.pop(location)
+                    elif instruction == "MOVE UP":
+                        item = values.pop(location)
+                        values.insert(location - 1, item)
+                    elif instruction == "MOVE DOWN":
+                        item = values.pop(location)
+                        values.insert(location + 1, item)
+
+                self.update_existing_entry_values(entry.get_unique_key(), values)
+
+    def delete_category(self, category_name: str):
+        if category_name in self.categories:
+            with self.batch():
+                self.__record(partial(self.set_categories, OrderedDict(self.categories)))
+                del self.categories[category_name]
+                self.derived_values.clear()
+                self.state_simulation.clear()
+                self.modifier_stacks.rebuild()
+
+                # Delete all of the category's entries, latest first so we unwind as little of our caches as possible
+                indices = [self.history.index(entry.unique_key) for entry in self.get_all_category_entries(category_name)]
+                for index in sorted(indices, reverse=True):
+                    self.delete_entry_at_index(index)
+
+    def get_category_state_for_entity(self, category: str, entity):
+        if isinstance(entity, str):
+            entity = self.characters.index(entity)
+
+        self.__sync_caches()
+        return self.history_cache.get_latest_keys(entity, category)
+
+    def get_category_state_for_entity_at_time(self, category: str, entity: int, time: int):
+        if time == self.get_history_index():
+            return self.get_category_state_for_entity(category, entity)
+
+        return self.state_at(time, entity, category)
+
+    def state_at(self, index: int, character, category: str):
+        # Read only - does not move our current history index, but walks our live history so must be on our thread
+        if threading.get_ident() != self.__thread:
+            raise RuntimeError("state_at walks the live history and has to be called on the engine's thread.")
+        if isinstance(character, str):
+            character = self.characters.index(character)
+
+        return self.history_checkpoints.state_at(index, character, category)
+
+    def diff(self, index_a: int, index_b: int):
+        """
+        What changed between two points in history, as Character -> Category -> {"added": [...], "removed": [...],
+        "revised": [(revision at a, revision at b), ...]}. Only the entries between the two points are visited.
+
+        Revision chains are ordered by history, so the first revision of a chain in the range has the chain's live
+        revision at the lower point as its parent (or no parent if the chain starts in the range).
+        """
+        index_a = max(-1, min(index_a, len(self.history) - 1))
+        index_b = max(-1, min(index_b, len(self.history) - 1))
+        start, end = min(index_a, index_b), max(index_a, index_b)
+
+        # Root -> [Revision before the range, Last revision in the range]
+        changed = dict()
+        position = start + 1
+        for unique_key in self.history.iterate_from(start + 1):
+            if position > end:
+                break
+
+            root_key = self.revision_links.get_root(unique_key)
+            if root_key not in changed:
+                changed[root_key] = [self.revision_links.get_parent(unique_key), unique_key]
+            else:
+                changed[root_key][1] = unique_key
+            position += 1
+
+        diff = dict()
+        for root_key, (before, after) in changed.items():
+            # Walking backwards simply swaps the roles of our two points
+            if index_a > index_b:
+                before, after = after, before
+
+            root_entry = self.entries[root_key]
+            if root_entry.character not in diff:
+                diff[root_entry.character] = dict()
+            if root_entry.category not in diff[root_entry.character]:
+                diff[root_entry.character][root_entry.category] = {"added": [], "removed": [], "revised": []}
+            changes = diff[root_entry.character][root_entry.category]
+
+            if before is None:
+                changes["added"].append(after)
+            elif after is None:
+                changes["removed"].append(before)
+            else:
+                changes["revised"].append((before, after))
+        return diff
+
+    def diff_tags(self, entry_key_a: int, entry_key_b: int):
+        # Tags are keyed by the entry they label
+        return self.diff(self.history.index(entry_key_a), self.history.index(entry_key_b))
+
+    def get_derived_value(self, unique_key: int, field_index: int, index=None):
+        # Raises DerivedValueError (or DependencyCycleError) if the value cannot be calculated
+        if index is None:
+            index = self.__history_index
+        return self.derived_values.get_value(unique_key, field_index, index)
+
+    def get_evaluated_values(self, unique_key: int, index=None):
+        # An entry's values with any derived properties calculated, failures are shown in place of the value
+        entry = self.entries[unique_key]
+        values = list(entry.get_values())
+        properties = self.categories[entry.get_category()].get_properties()
+        for field_index in range(len(properties)):
+            if not properties[field_index].is_derived():
+                continue
+
+            while len(values) <= field_index:
+                values.append("")
+            try:
+                values[field_index] = format_value(self.get_derived_value(unique_key, field_index, index))
+            except DerivedValueError as error:
+                values[field_index] = "Error: " + str(error)
+        return values
+
+    def get_character_state(self, character, index=None):
+        # State Variable -> Value for the character once every entry up to index (default our history index) is applied
+        if isinstance(character, str):
+            character = self.characters.index(character)
+        if index is None:
+            index = self.__history_index
+        if index < 0:
+            return dict()
+        return self.state_simulation.state_at(index, character)
+
+    def get_stat_value(self, character, stat, index=None):
+        # A stat's value once every modifier up to index (default our history index) is stacked
+        if isinstance(character, str):
+            character = self.characters.index(character)
+        if index is None:
+            index = self.__history_index
+        return self.modifier_stacks.value_at(character, stat, index)
+
+    def get_stat_change(self, character, stat, start: int, end: int):
+        # Net change in a stat from history index start to end
+        if isinstance(character, str):
+            character = self.characters.index(character)
+        return self.modifier_stacks.change_between(character, stat, start, end)
+
+    def get_stat_values(self, character, index=None):
+        # Stat -> Value for every stat the character has modifiers for
+        if isinstance(character, str):
+            character = self.characters.index(character)
+        return {stat: self.get_stat_value(character, stat, index) for stat in self.modifier_stacks.get_stats(character)}
+
+    def check_category_variables(self, category: Category, replacing=None):
+        # Raises ValueError if adding the category (in place of replacing) would give a stat the name of a state variable
+        categories = [existing for name, existing in self.categories.items() if name != replacing] + [category]
+        self.__check_variable_names(categories)
+
+    @staticmethod
+    def __check_variable_names(categories):
+        # Stats and state variables are separate namespaces, but share how they are referred to
+        state_variables = {to_variable_name(variable) for category in categories for variable, _ in category.get_modifications()}
+        stats = {to_variable_name(modifier[0]) for category in categories for modifier in category.get_modifiers()}
+        clashes = sorted(state_variables & stats)
+        if len(clashes) != 0:
+            raise ValueError("Names used as both a stat and a state variable: " + ", ".join(clashes) + ".")
+
+    def check_derived_properties(self):
+        # Raises DependencyCycleError if any category's derived properties (indirectly) depend on themselves
+        self.derived_values.check_cycles()
+
+    def validate(self):
+        """
+        Checks the session hangs together, raising ValueError (or DependencyCycleError for derived properties) on the
+        first problem found. Loading already rejects revision chains that fork or loop, this also checks that every
+        revision's parent exists and comes before it in the history, and that no stat shares a state variable's name.
+        """
+        for position, unique_key in enumerate(self.history):
+            parent_key = self.entries[unique_key].get_parent_key()
+            if parent_key is None:
+                continue
+
+            if parent_key not in self.entries:
+                raise ValueError("Entry " + self.entry_ids.get_uuid(unique_key) + " revises an entry that does not exist. Bad DAG.")
+            if self.history.index(parent_key) > position:
+                raise ValueError("Entry " + self.entry_ids.get_uuid(unique_key) + " comes before the entry it revises. Bad DAG.")
+
+        self.__check_variable_names(self.categories.values())
+        self.check_derived_properties()
+
+    def get_entry(self, unique_key) -> Entry:
+        return self.entries[unique_key]
+
+    def get_current_entry(self) -> Entry:
+        unique_key = self.history[self.__history_index]
+        return self.entries[unique_key]
+
+    def get_entry_by_index(self, index) -> Entry:
+        try:
+            unique_key = self.history[index]
+        except IndexError:
+            return None
+        return self.entries[unique_key]
+
+    def get_history_index_from_entry(self, unique_key: int):
+        return self.history.index(unique_key)
+
+    def get_entry_key_by_index(self, index):
+        return self.history[index]
+
+    def add_entry(self, entry: Entry):
+        with self.batch():
+            self.__insert_entry(self.__history_index + 1, entry)
+            self.set_current_history_index(self.__history_index + 1)
+
+    def __insert_entry(self, index, entry: Entry, child_key=None):
+        if entry.unique_key is None:
+            entry.unique_key = self.entry_ids.allocate()
+
+        # Unwind our caches to just before the entry so they can be replayed with the new linkage
+        self.history_cache.rewind_to(index - 1)
+        if not entry.is_stored():
+            entry.set_values(self.__share_parent_values(entry, entry.get_values()))
+        self.entries[entry.unique_key] = entry
+        self.entry_indexes.add(entry)
+        self.text_index.add(entry)
+        if self.entry_store is not None:
+            entry.attach(self.entry_store)
+
+        # Handle linkage insertion - our parent's existing child (if any) becomes our child
+        if entry.parent_key is not None:
+            self.revision_links.insert(entry.unique_key, entry.parent_key)
+        elif child_key is not None:
+            self.revision_links.set_parent(child_key, entry.unique_key)
+        self.__sync_entry_parents(self.revision_links.get_child(entry.unique_key))
+
+        # Add the data to our history
+        self.history.insert(index, entry.unique_key)
+        self.__invalidate_from(index)
+        self.modifier_stacks.add(entry, index)
+        self.session_journal.mark_entry(entry.unique_key)
+        self.__record(partial(self.__remove_entry, entry.unique_key))
+
+    def __share_parent_values(self, entry, values):
+        # Revisions hold their parent's objects for the values they didn't change. Stored parents are skipped - our
+        # columnar store interns its strings anyway and reading a database's values back just makes fresh copies
+        parent = self.entries.get(entry.parent_key, None) if entry.parent_key is not None else None
+        if parent is None or parent.is_stored():
+            return values
+        return share_parent_values(values, parent.get_values())
+
+    def __invalidate_from(self, index):
+        # Drops everything our history position based caches hold from index onwards
+        self.history_checkpoints.invalidate_from(index)
+        self.derived_values.invalidate_from(index)
+        self.state_simulation.invalidate_from(index)
+
+    def __remove_entry(self, unique_key):
+        # Inverse of __insert_entry, also pulls our history index back if it pointed at or past the entry
+        with self.batch():
+            self.delete_entry_at_index(self.history.index(unique_key))
+
+    def update_existing_entry_values(self, unique_key: int, values: list, should_print_to_output=None, should_print_to_history=None):
+        with self.batch():
+            entry = self.entries[unique_key]
+            self.__record(partial(self.update_existing_entry_values, unique_key, entry.get_values(), entry.get_print_to_output(), entry.print_to_history))
+            entry.set_values(self.__share_parent_values(entry, values))
+            self.session_journal.mark_entry(unique_key)
+            self.text_index.update(entry)
+            self.derived_values.invalidate_entry(unique_key)
+            self.state_simulation.invalidate_from(self.history.index(unique_key))
+            self.modifier_stacks.update(entry)
+            if should_print_to_output is not None:
+                entry.set_print_to_output(should_print_to_output)
+            if should_print_to_history is not None:
+                entry.print_to_history = should_print_to_history
+
+    def delete_entry_at_index(self, index):
+        with self.batch():
+            # Unwind our caches to just before the entry so they can be replayed with the new linkage
+            self.history_cache.rewind_to(index - 1)
+            history_index = self.__history_index
+
+            # Remove the entry from our history list
+            unique_id = self.history.pop(index)
+            self.__invalidate_from(index)
+            self.session_journal.mark_entry(unique_id)
+
+            # Handle linkage deletion - our child (if any) inherits our parent (if any)
+            entry = self.entries[unique_id]
+            child_key = self.revision_links.get_child(unique_id)
+            self.revision_links.remove(unique_id)
+            self.__sync_entry_parents(child_key)
+            self.entry_indexes.remove(entry)
+            self.text_index.remove(entry)
+            self.modifier_stacks.remove(entry)
+            entry.detach()
+            del self.entries[unique_id]
+
+            # Handle the edge case where we were deleting an item before what we have 'selected'
+            if index <= self.__history_index:
+                self.set_current_history_index(self.__history_index - 1)
+            else:
+                self.set_current_history_index(self.__history_index)
+            self.__record(partial(self.__restore_entry, index, entry, child_key, history_index))
+
+    def __restore_entry(self, index, entry: Entry, child_key, history_index):
+        with self.batch():
+            self.__insert_entry(index, entry, child_key)
+            self.set_current_history_index(history_index)
+
+    def get_entry_parent_key(self, unique_key: int):
+        return self.revision_links.get_parent(unique_key)
+
+    def get_child_key_from_parent_key(self, parent_key: int):
+        return self.revision_links.get_child(parent_key)
+
+    def set_entry_parent(self, unique_key: int, parent_key):
+        with self.batch():
+            # Relinking can change the roots of everything after us so replay our caches from here
+            self.history_cache.rewind_to(self.history.index(unique_key) - 1)
+            self.__invalidate_from(self.history.index(unique_key))
+            self.__record(partial(self.set_entry_parent, unique_key, self.revision_links.get_parent(unique_key)))
+            self.revision_links.set_parent(unique_key, parent_key)
+            self.entries[unique_key].parent_key = parent_key
+            self.session_journal.mark_entry(unique_key)
+
+    def __sync_entry_parents(self, *unique_keys):
+        # Push our linkage back onto the entries so it is persisted
+        for unique_key in unique_keys:
+            if unique_key is not None:
+                self.entries[unique_key].parent_key = self.revision_links.get_parent(unique_key)
+                self.session_journal.mark_entry(unique_key)
+
+    def __swap_revisions(self, parent_key: int, child_key: int):
+        # Turns grandparent -> parent -> child -> grandchild into grandparent -> child -> parent -> grandchild
+        grandchild_key = self.revision_links.get_child(child_key)
+        self.revision_links.swap(parent_key, child_key)
+        self.__sync_entry_parents(parent_key, child_key, grandchild_key)
+
+    def get_absolute_parent(self, unique_key: int):
+        root_key = self.revision_links.get_root(unique_key)
+        if root_key == unique_key:
+            return None
+        return root_key
+
+    def get_most_recent_revision_for_root_entry_key(self, root_key: int):
+        self.__sync_caches()
+        revisions = self.history_cache.get_revisions(root_key)
+        if revisions is not None:
+            return revisions[-1]
+        return None
+
+    def get_all_revisions_for_root_entry_key(self, root_key: int):
+        self.__sync_caches()
+        return self.history_cache.get_revisions(root_key)
+
+    def move_entry_in_history(self, original_location, up):
+        original_entry = self.get_entry(self.history[original_location])
+
+        with self.batch():
+            # Unwind our caches to just before the swap so they can be replayed with the new ordering
+            if up:
+                self.history_cache.rewind_to(original_location - 2)
+            else:
+                self.history_cache.rewind_to(original_location - 1)
+
+            if up:
+                new_location = original_location - 1
+                displaced_entry = self.get_entry(self.history[new_location])
+
+                # Check if new_location is our parent
+                if original_entry.get_parent_key() == displaced_entry.unique_key:
+                    self.__swap_revisions(displaced_entry.unique_key, original_entry.unique_key)
+
+            else:
+                new_location = original_location + 1
+                displaced_entry = self.get_entry(self.history[new_location])
+
+                # Check if new_location is our child
+                if displaced_entry.get_parent_key() == original_entry.unique_key:
+                    self.__swap_revisions(original_entry.unique_key, displaced_entry.unique_key)
+
+            # Swap!
+            self.history.swap(original_location, new_location)
+            self.__invalidate_from(min(original_location, new_location))
+            self.session_journal.mark_entry(original_entry.unique_key)
+            self.session_journal.mark_entry(displaced_entry.unique_key)
+            self.modifier_stacks.move(original_entry)
+            self.__record(partial(self.move_entry_in_history, new_location, not up))
+
+    def enable_columnar_storage(self):
+        # Moves all entry values into per category tables with interned strings, entries become row views
+        self.entry_store = EntryStore()
+        for entry in self.entries.values():
+            entry.detach()
+            entry.attach(self.entry_store)
+
+    def get_all_category_entries(self, category_name):
+        return [self.entries[unique_key] for unique_key in self.entry_indexes.get_category_keys(category_name)]
+
+    def get_all_character_entries(self, character):
+        if isinstance(character, str):
+            character = self.characters.index(character)
+
+        return [self.entries[unique_key] for unique_key in self.entry_indexes.get_character_keys(character)]
+
+    def get_all_character_category_entries(self, character, category_name):
+        if isinstance(character, str):
+            character = self.characters.index(character)
+
+        return [self.entries[unique_key] for unique_key in self.entry_indexes.get_keys(character, category_name)]
+
+    def search_entries(self, query, prefix=False, category_name=None, character=None, property_name=None):
+        """
+        Full text search over entry values. Returns (Entry Key, Property Index) pairs whose value contains the query's
+        words in order, optionally restricted to a category, character and / or property.
+        """
+        if isinstance(character, str):
+            character = self.characters.index(character)
+
+        hits = list()
+        for unique_key, field_index in self.text_index.search(query, prefix, category_name, character):
+            if property_name is not None:
+                properties = self.categories[self.entries[unique_key].get_category()].get_properties()
+                if field_index >= len(properties) or properties[field_index].get_property_name() != property_name:
+                    continue
+            hits.append((unique_key, field_index))
+        return hits
+
+    def replace_text(self, find, replacement, category_name=None, character=None, property_name=None):
+        """
+        Replaces whole word (case sensitive) occurrences of find across all matching entry values as a single batch.
+        Only the entries the text index reports as candidates are inspected. Returns the number of entries changed.
+        """
+        pattern = re.compile(r"(?<!\w)" + re.escape(find) + r"(?!\w)")
+
+        # Group our hits per entry so each is only updated once
+        fields = dict()
+        for unique_key, field_index in self.search_entries(find, False, category_name, character, property_name):
+            fields.setdefault(unique_key, list()).append(field_index)
+
+        changed = 0
+        with self.batch():
+            for unique_key, field_indices in fields.items():
+                values = list(self.entries[unique_key].get_values())
+                for field_index in field_indices:
+                    values[field_index] = pattern.sub(lambda match: replacement, values[field_index])
+                if values != self.entries[unique_key].get_values():
+                    self.update_existing_entry_values(unique_key, values)
+                    changed += 1
+        return changed
+
+    def build_entry_history_caches(self):
+        self.history_cache.rebuild(self.get_history_index())
+
+    def __sync_caches(self):
+        # Replay our caches up to the current head, this is deferred while a batch is open
+        if self.history_cache.head != self.__history_index:
+            self.history_cache.move_to(self.__history_index)
+            self.__validate_caches()
+
+    def __validate_caches(self):
+        if self.validate_caches:
+            self.history_cache.validate()
+
+    def get_history(self):
+        return self.history
+
+    def get_history_index(self):
+        return self.__history_index
+
+    def set_current_history_index(self, index):
+        if index < -1:
+            index = -1
+        elif index >= len(self.entries) - 1:
+            index = len(self.entries) - 1
+
+        with self.batch():
+            self.__record(partial(self.set_current_history_index, self.__history_index), navigation=True)
+            self.__history_index = index
+
+    def add_tag(self, entry_key, tag_name, tag_target):
+        self.set_tag(Tag(tag_name, entry_key, tag_target))
+
+    def set_tag(self, tag: Tag):
+        with self.batch():
+            entry_key = tag.get_associated_entry_key()
+            self.__record(partial(self.__restore_tag, entry_key, self.get_tag(entry_key)))
+            self.tags[entry_key] = tag
+
+    def __restore_tag(self, entry_key, tag):
+        if tag is None:
+            self.delete_tag(entry_key)
+        else:
+            self.set_tag(tag)
+
+    def get_tag(self, entry_key) -> Tag:
+        if entry_key in self.tags:
+            return self.tags[entry_key]
+        return None
+
+    def get_tags(self):
+        return self.tags
+
+    def delete_tag(self, entry_key):
+        if entry_key in self.tags:
+            with self.batch():
+                self.__record(partial(self.set_tag, self.tags.pop(entry_key)))
+
+    def save(self, path=None):
+        # Saves to path (which becomes our session path) or back to where we were loaded from / last saved to
+        self.save_in_background(path).result()
+
+    def save_in_background(self, path=None):
+        """
+        As save, but only captures what is to be written here - the disk access happens on our writer thread. Returns
+        its Future. Saves are written one at a time in the order they were made.
+        """
+        write = self.__prepare_save(path)
+        self.__last_save = self.__get_writer().submit(write)
+        return self.__last_save
+
+    def wait_for_saves(self):
+        # Blocks until everything saved so far is on disk, raising if the most recent save failed
+        if self.__last_save is not None:
+            self.__last_save.result()
+
+    def __get_writer(self):
+        # A single worker keeps our saves in order
+        if self.__writer is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.__writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-writer")
+        return self.__writer
+
+    def __prepare_save(self, path=None):
+        """
+        Captures everything a save needs from us and returns the function that writes it, which only touches its
+        captures and the disk. For journaled / database sessions being saved back to that's only what changed since
+        the last save, otherwise a full export of our entries.
+        """
+        if path is not None:
+            self.session_path = path
+        if self.session_path is None:
+            raise ValueError("No session path to save to.")
+        path = self.session_path
+
+        # Saving back over our snapshot just appends what changed since our last save
+        if self.session_journal.is_attached(path):
+            record = self.session_journal.prepare_append()
+            return (lambda: None) if record is None else partial(self.session_journal.write_record, path, record)
+        if self.session_database is not None and self.session_database.is_attached(path):
+            return partial(self.session_database.apply_update, self.session_database.prepare_update(self, self.session_journal.take_changes()))
+
+        # Our integer keys are session local - translate everything back to uuids on the way out
+        entry_ids = self.entry_ids
+        history = [entry_ids.get_uuid(unique_key) for unique_key in self.history]
+        tags = {entry_ids.get_uuid(entry_key): entry_ids.export_tag(tag) for entry_key, tag in self.tags.items()}
+
+        # Sort entries with an order - just helps debugging save data
+        entries = {uuid_str: entry_ids.export_entry(self.entries[unique_key]) for uuid_str, unique_key in zip(history, self.history)}
+
+        old = False
+        if old:
+            save_data = DataHolder()
+            save_data.add_to_dict("categories", self.categories)
+            save_data.add_to_dict("history", history)
+            save_data.add_to_dict("history_index", self.__history_index)
+            save_data.add_to_dict("entries", {uuid_str: Entry.from_json(data) for uuid_str, data in entries.items()})
+            save_data.add_to_dict("gsheets_credentials", self.gsheets_credentials_path)
+            save_data.add_to_dict("tags", {uuid_str: Tag.from_json(data) for uuid_str, data in tags.items()})
+
+            # Serialise
+            def write():
+                jsons = json.dumps(save_data, default=convert_to_dict, indent=4)
+                with open(path, "w") as json_file:
+                    json_file.write(jsons)
+            return write
+
+        # Categories are replaced rather than edited in place, so shallow copies keep our capture as it is now
+        characters = list(self.characters)
+        categories = OrderedDict(self.categories)
+        if is_database_path(path):
+            # We may be overwriting the database our entries are read from, so take everything out of it first
+            data_holder = SerializationData(self.gsheets_credentials_path, tags, characters, categories, history, self.__history_index, entries)
+            self.__close_session_database()
+            self.session_database = SessionDatabase.prepare_create(path, data_holder)
+            self.session_journal.detach()
+            self.session_journal.mark_clean()
+            return partial(self.session_database.create, data_holder)
+        else:
+            journal = self.session_journal.begin_snapshot(path)
+            data_holder = SerializationData(self.gsheets_credentials_path, tags, characters, categories, history, self.__history_index, entries, journal)
+            if self.session_database is not None:
+                self.session_database.detach()
+
+            def write():
+                # Revisions are written as just what they change from their parent (the export is ours to change)
+                encode_entries(entries)
+                jsons = json.dumps(data_holder, default=to_serialisable_dict, indent=4)
+                self.session_journal.write_snapshot(path, jsons, journal["id"])
+            return write
+
+    def load(self, path, progress=None):
+        # Progress is called with (Amount Read, Total) while reading a JSON session. Any save still being written
+        # finishes first (its outcome was its caller's to handle)
+        if self.__writer is not None:
+            self.__writer.submit(lambda: None).result()
+        self.session_path = path
+        database = None
+
+        # Only the skeleton of a database is read, entry values are read as they are needed
+        if is_database_path(path):
+            database = SessionDatabase.open(path)
+            data_holder = database.read()
+            self.session_journal.detach()
+            self.characters = data_holder.characters
+            self.categories = data_holder.categories
+            history = data_holder.history
+            entries = data_holder.entries
+            self.gsheets_credentials_path = data_holder.credentials
+            tags = data_holder.tags
+            history_index = data_holder.history_index
+
+        # Load with the old method
+        elif is_legacy_session(path):
+            with open(path, "r") as json_file:
+                data = json.load(json_file, object_hook=dict_to_obj)
+            self.session_journal.detach()
+
+            self.categories = data.data["categories"]
+            history = data.data["history"]
+            entries = data.data["entries"]
+            self.gsheets_credentials_path = data.data["gsheets_credentials"]
+            tags = data.data["tags"]
+            history_index = data.data["history_index"]
+
+        # Our current format, streamed so entries are built as they are parsed
+        else:
+            data = read_session(path, progress)
+
+            # Bring the snapshot up to date with its journal (if any) before reading it
+            self.session_journal.load(path, data)
+            data_holder = SerializationData.from_json(data)
+            self.characters = data_holder.characters
+            self.categories = data_holder.categories
+            history = data_holder.history
+            entries = data_holder.entries
+            self.gsheets_credentials_path = data_holder.credentials
+            tags = data_holder.tags
+            history_index = data_holder.history_index
+
+        # Swap the persisted uuids for compact integer keys - any undo history refers to the old session's keys
+        self.clear_undo_history()
+        self.entry_ids.clear()
+        self.entries, history, self.tags = self.entry_ids.import_entries(entries, history, tags)
+        self.history = IndexedHistory(history)
+        if self.session_database is not None:
+            self.session_database.close()
+        self.session_database = database
+
+        # Rebuild parent entries - validates them as best as we can, can be used to indicate some mess ups in linkage / manual editing
+        self.history_cache.clear()
+        self.history_checkpoints.clear()
+        self.derived_values.clear()
+        self.state_simulation.clear()
+        self.modifier_stacks.rebuild()
+        self.revision_links.rebuild({key: entry.get_parent_key() for key, entry in self.entries.items() if entry.get_parent_key() is not None})
+        self.entry_indexes.rebuild(self.entries)
+        self.text_index.defer(self.entries)
+        if self.entry_store is not None and database is None:
+            self.enable_columnar_storage()
+        elif self.entry_store is not None:
+            # Our entries stay backed by the database's rows and are read as needed, they move into our store once the
+            # database is closed (see __close_session_database)
+            self.entry_store = EntryStore()
+        self.__loading = True
+        try:
+            self.set_current_history_index(history_index)
+        finally:
+            self.__loading = False
+        self.session_journal.mark_clean()
+        self.state_simulation.warm_up()
+
+        # Any gsheets connection is rebuilt from our credentials when first needed
+        self.gsheets_connector = None
+
+    def __close_session_database(self):
+        # Pull any values still only in our database into memory before letting it go
+        if self.session_database is None:
+            return
+
+        for entry in self.session_database.detach_entries():
+            if self.entry_store is not None:
+                entry.attach(self.entry_store)
+        self.session_database.close()
+        self.session_database = None
+
+    def load_gsheets_credentials(self, path):
+        # Imported here so the engine can be used without pygsheets installed
+        from utils.gsheets import build_gsheets_communicator
+
+        self.gsheets_credentials_path = path
+        self.gsheets_connector = build_gsheets_communicator(file_path=path)
+        # self.gsheets_connector.set_batch_mode(True)
+
+    def get_gsheets_connector(self):
+        # Connecting pulls in the Google API client, so we only do it once something is actually sent or fetched
+        if self.gsheets_connector is None and self.gsheets_credentials_path is not None:
+            self.load_gsheets_credentials(self.gsheets_credentials_path)
+        return self.gsheets_connector
+
+    def get_available_sheets(self):
+        try:
+            if self.get_gsheets_connector() is not None:
+                return self.gsheets_connector.spreadsheet_titles()
+            else:
+                return list()
+
+        # Sometimes our connection times out
+        except ConnectionAbortedError:
+            self.load_gsheets_credentials(self.gsheets_credentials_path)
+            return self.gsheets_connector.spreadsheet_titles()
+
+    def plan_dump(self):
+        """
+        Works out everything a dump writes without touching Google Sheets. Returns one step per tag with an output
+        target, in history order:
+            {"target": Spreadsheet Title, "start": First History Index, "end": Tagged History Index,
+             "characters": [(Character, [(Category, Previous View, Current View)])]}
+        where the previous view is the one written out for the previous target (None for the first).
+        """
+        # Sort our tags so they are in order of the appearance in the history
+        self.tags = {k: v for k, v in sorted(self.tags.items(), key=lambda items: self.history.index(items[1].get_associated_entry_key()))}
+
+        steps = list()
+        previous_pointer = 0
+        cache = dict()
+        for tag in self.tags.values():
+            output_target = tag.get_tag_target()
+            if output_target is None or output_target == "" or output_target == "NONE":
+                continue
+
+            # HEAD value
+            historical_index = self.history.index(tag.get_associated_entry_key())
+
+            characters = list()
+            for i in range(len(self.characters)):
+                character = self.characters[i]
+
+                # Loop through in the correct categories order
+                views = list()
+                for category in self.categories.values():
+                    if not category.get_print_to_overview() or category.notes_only:
+                        continue
+
+                    # This category may not exist in the past!
+                    cache_name = character + "+" + category.get_name()
+                    view = self.get_category_state_for_entity_at_time(category.get_name(), i, historical_index)
+                    views.append((category, cache.get(cache_name, None), view))
+                    cache[cache_name] = view
+                characters.append((character, views))
+
+            steps.append({"target": output_target, "start": previous_pointer, "end": historical_index, "characters": characters})
+            previous_pointer = historical_index + 1
+        return steps
+
+    def dump(self, progress=None, track=None):
+        """
+        Writes each tagged point of the history out to its Google Sheet (see plan_dump). Progress is reported as
+        progress(done, total) if given. We save before and after - track is handed each save's Future (e.g.
+        AutosaveService.track) to report on, without it we wait on them and raise if one fails.
+        """
+        from utils.gsheets import SystemSheetLayoutHandler, HistorySheetLayoutHandler
+
+        def save():
+            future = self.save_in_background()
+            if track is not None:
+                track(future)
+            else:
+                future.result()
+
+        # Save before hand as the api has a way of randomly erroring
+        save()
+
+        steps = self.plan_dump()
+        current_count = 0
+        total = sum(1 + sum(2 * len(views) for _, views in step["characters"]) for step in steps)
+
+        def advance(count):
+            nonlocal current_count
+            current_count += count
+            if progress is not None:
+                progress(current_count, total)
+        advance(0)
+
+        for step in steps:
+            # TODO: Try and do a try catch here for bad gsheets connection
+            try:
+                worksheet = self.get_gsheets_connector().open(step["target"])
+            except ConnectionAbortedError:
+                self.load_gsheets_credentials(self.gsheets_credentials_path)
+                worksheet = self.gsheets_connector.open(step["target"])
+
+            # Loop through characters
+            for character, views in step["characters"]:
+
+                # Retrieve the 'Old' Sheet
+                old_system_sheet = SystemSheetLayoutHandler(self.gsheets_connector, worksheet, character + " Previous View")
+                old_system_sheet.clear_all()
+
+                # Retrieve the 'Current' sheet
+                system_sheet = SystemSheetLayoutHandler(self.gsheets_connector, worksheet, character + " Current View")
+                system_sheet.clear_all()
+
+                for category, previous_view, view in views:
+                    # Write our cached obj out
+                    if previous_view is not None and len(previous_view) != 0:
+                        # Write the category data (if applicable) to the system view
+                        old_system_sheet.write_next([[category.get_name(), ""]])
+                        old_system_sheet.write_category_data(self, category, previous_view)
+                        # self.gsheets_connector.run_batch()
+                    advance(1)
+
+                    # Current data
+                    if view is not None and len(view) != 0:
+                        # Write the category data (if applicable) to the system view
+                        system_sheet.write_next([[category.get_name(), ""]])
+                        system_sheet.write_category_data(self, category, view)
+                        # self.gsheets_connector.run_batch()
+                    advance(1)
+
+            # Retrieve the history sheet
+            history_sheet = HistorySheetLayoutHandler(self.gsheets_connector, worksheet, "History")
+            history_sheet.clear_all()
+
+            # Write out this tag's history in order
+            history_sheet.write_historical_data(self.history, self.entries, self.entry_ids, self.categories, self.characters, step["start"], step["end"])
+            # self.gsheets_connector.run_batch()
+            advance(1)
+
+        # Finish up by saving - this will ensure our pointers dont get lost
+        save()
@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import QDialog, QFormLayout, QLineEdit, QTableWidget, QTabl
 from PyQt6.uic.properties import QtGui
 
 from data.categories import CategoryProperty, Category
+from data.modifier_stacks import OPERATIONS
 
 
 def add_check_box_at(category_properties_table, index, state=False):
@@ -18,6 +19,61 @@ def add_check_box_at(category_properties_table, index, state=False):
     category_properties_table.setItem(index, 1, check_box)
 
 
+def get_expression_at(category_properties_table, index):
+    item = category_properties_table.item(index, 2)
+    if item is None or item.text().strip() == "":
+        return None
+    return item.text()
+
+
+def parse_modifications(text):
+    # "xp = xp + amount; level = level + 1" -> [["xp", "xp + amount"], ["level", "level + 1"]]
+    modifications = list()
+    for statement in text.split(";"):
+        if "=" not in statement:
+            continue
+        variable, expression = statement.split("=", 1)
+        if variable.strip() == "" or expression.strip() == "":
+            continue
+        modifications.append([variable.strip(), expression.strip()])
+    return modifications
+
+
+def format_modifications(modifications):
+    return "; ".join(variable + " = " + expression for variable, expression in modifications)
+
+
+def parse_modifiers(text):
+    # "damage += bonus; damage *= multiplier @ 1" -> [["damage", "+", "bonus", 0], ["damage", "*", "multiplier", 1]]
+    modifiers = list()
+    for statement in text.split(";"):
+        stage = 0
+        if "@" in statement:
+            statement, stage_text = statement.rsplit("@", 1)
+            try:
+                stage = int(stage_text.strip())
+            except ValueError:
+                continue
+
+        for operation in OPERATIONS:
+            if operation + "=" in statement:
+                stat, expression = statement.split(operation + "=", 1)
+                if stat.strip() != "" and expression.strip() != "":
+                    modifiers.append([stat.strip(), operation, expression.strip(), stage])
+                break
+    return modifiers
+
+
+def format_modifiers(modifiers):
+    statements = list()
+    for stat, operation, expression, stage in modifiers:
+        statement = stat + " " + operation + "= " + expression
+        if stage != 0:
+            statement += " @ " + str(stage)
+        statements.append(statement)
+    return "; ".join(statements)
+
+
 class CategoryDialog(QDialog):
     def __init__(self, category=None):
         super().__init__()
@@ -32,9 +88,10 @@ class CategoryDialog(QDialog):
         # Form components
         self.category_name = QLineEdit()
         self.category_properties_table = QTableWidget()
-        self.category_properties_table.setColumnCount(2)
+        self.category_properties_table.setColumnCount(3)
         self.category_properties_table.setHorizontalHeaderItem(0, QTableWidgetItem("Property Text"))
         self.category_properties_table.setHorizontalHeaderItem(1, QTableWidgetItem("Requires Large Input Text"))
+        self.category_properties_table.setHorizontalHeaderItem(2, QTableWidgetItem("Derived Expression (Optional)"))
         self.category_properties_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
         self.category_properties_table.setRowCount(1)
         self.category_properties_table.setVerticalHeaderItem(0, QTableWidgetItem("0"))
@@ -64,6 +121,7 @@ class CategoryDialog(QDialog):
                 # Add the data
                 self.category_properties_table.setItem(index, 0, QTableWidgetItem(category_property.get_property_name()))
                 add_check_box_at(self.category_properties_table, index, state=category_property.requires_large_input())
+                self.category_properties_table.setItem(index, 2, QTableWidgetItem(category_property.get_expression() or ""))
 
             # Add extra row blank for user edit
             index += 1
@@ -80,9 +138,15 @@ class CategoryDialog(QDialog):
         if self.category is None:
             self.history_entry = QLineEdit()
             self.update_history_entry = QLineEdit()
+            self.modifications = QLineEdit()
+            self.modifiers = QLineEdit()
         else:
             self.history_entry = QLineEdit(self.category.get_new_history_entry())
             self.update_history_entry = QLineEdit(self.category.get_update_history_entry())
+            self.modifications = QLineEdit(format_modifications(self.category.get_modifications()))
+            self.modifiers = QLineEdit(format_modifiers(self.category.get_modifiers()))
+        self.modifications.setPlaceholderText("xp = xp + amount; level = level + 1")
+        self.modifiers.setPlaceholderText("damage += bonus; damage *= multiplier @ 1")
 
         # Form
         self.layout = QFormLayout()
@@ -95,6 +159,8 @@ class CategoryDialog(QDialog):
         self.layout.addRow("Can entries change over time?", self.can_change_over_time)
         self.layout.addRow("Is Singleton?", self.is_singleton)
         self.layout.addRow("Notes Only (No Output to Sheets)?", self.notes_only)
+        self.layout.addRow("State Modifications:", self.modifications)
+        self.layout.addRow("Stat Modifiers (@ Stage):", self.modifiers)
         self.layout.addRow("", self.done_button)
         self.setLayout(self.layout)
         self.setMinimumWidth(640)
@@ -129,14 +195,14 @@ class CategoryDialog(QDialog):
                 continue
 
             property_requires_large_input = self.category_properties_table.item(row_index, 1).checkState() == Qt.CheckState.Checked
-            prop = CategoryProperty(property_name, property_requires_large_input)
+            prop = CategoryProperty(property_name, property_requires_large_input, get_expression_at(self.category_properties_table, row_index))
             properties.append(prop)
 
         # Empty == NOOP
         if len(properties) == 0:
             return None
 
-        return Category(self.category_name.text(), properties, self.history_entry.text(), self.update_history_entry.text(), self.print_to_overview_button.isChecked(), self.can_change_over_time.isChecked(), self.is_singleton.isChecked(), self.notes_only.isChecked())
+        return Category(self.category_name.text(), properties, self.history_entry.text(), self.update_history_entry.text(), self.print_to_overview_button.isChecked(), self.can_change_over_time.isChecked(), self.is_singleton.isChecked(), self.notes_only.isChecked(), parse_modifications(self.modifications.text()), parse_modifiers(self.modifiers.text()))
 
     def handle_done(self, *args):
         self.viable = True
@@ -158,9 +224,10 @@ class EditCategoryDialog(QDialog):
         # Form components
         self.category_name = QLineEdit()
         self.category_properties_table = QTableWidget()
-        self.category_properties_table.setColumnCount(2)
+        self.category_properties_table.setColumnCount(3)
         self.category_properties_table.setHorizontalHeaderItem(0, QTableWidgetItem("Property Text"))
         self.category_properties_table.setHorizontalHeaderItem(1, QTableWidgetItem("Requires Large Input Text"))
+        self.category_properties_table.setHorizontalHeaderItem(2, QTableWidgetItem("Derived Expression (Optional)"))
         self.category_properties_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
         self.category_properties_table.setVerticalHeaderItem(0, QTableWidgetItem("0"))
         self.category_properties_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
@@ -185,6 +252,10 @@ class EditCategoryDialog(QDialog):
         # Add in our history
         self.history_entry = QLineEdit(self.category.get_new_history_entry())
         self.update_history_entry = QLineEdit(self.category.get_update_history_entry())
+        self.modifications = QLineEdit(format_modifications(self.category.get_modifications()))
+        self.modifications.setPlaceholderText("xp = xp + amount; level = level + 1")
+        self.modifiers = QLineEdit(format_modifiers(self.category.get_modifiers()))
+        self.modifiers.setPlaceholderText("damage += bonus; damage *= multiplier @ 1")
 
         # Form
         self.layout = QFormLayout()
@@ -197,6 +268,8 @@ class EditCategoryDialog(QDialog):
         self.layout.addRow("Can entries change over time?", self.can_change_over_time)
         self.layout.addRow("Is Singleton?", self.is_singleton)
         self.layout.addRow("Notes Only (No Output to Sheets)?", self.notes_only)
+        self.layout.addRow("State Modifications:", self.modifications)
+        self.layout.addRow("Stat Modifiers (@ Stage):", self.modifiers)
         self.layout.addRow("", self.done_button)
         self.setLayout(self.layout)
         self.setMinimumWidth(640)
@@ -210,6 +283,7 @@ class EditCategoryDialog(QDialog):
             category_property = self.category_properties[index]
             self.category_properties_table.setItem(index, 0, QTableWidgetItem(category_property.get_property_name()))
             add_check_box_at(self.category_properties_table, index, state=category_property.requires_large_input())
+            self.category_properties_table.setItem(index, 2, QTableWidgetItem(category_property.get_expression() or ""))
         self.category_properties_table.blockSignals(False)
 
     def get_data(self):
@@ -223,14 +297,14 @@ class EditCategoryDialog(QDialog):
                 continue
 
             property_requires_large_input = self.category_properties_table.item(row_index, 1).checkState() == Qt.CheckState.Checked
-            prop = CategoryProperty(property_name, property_requires_large_input)
+            prop = CategoryProperty(property_name, property_requires_large_input, get_expression_at(self.category_properties_table, row_index))
             properties.append(prop)
 
         # Empty == NOOP
         if len(properties) == 0:
             return None
 
-        return Category(self.category_name.text(), properties, self.history_entry.text(), self.update_history_entry.text(), self.print_to_overview_button.isChecked(), self.can_change_over_time.isChecked(), self.is_singleton.isChecked(), self.notes_only.isChecked())
+        return Category(self.category_name.text(), properties, self.history_entry.text(), self.update_history_entry.text(), self.print_to_overview_button.isChecked(), self.can_change_over_time.isChecked(), self.is_singleton.isChecked(), self.notes_only.isChecked(), parse_modifications(self.modifications.text()), parse_modifiers(self.modifiers.text()))
 
     def get_instructions(self):
         return self.edit_instructions
@@ -3,8 +3,9 @@ from functools import partial
 
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPalette, QColor, QAction
-from PyQt6.QtWidgets import QMainWindow, QListWidget, QAbstractItemView, QPushButton, QVBoxLayout, QWidget, QTabWidget, QFormLayout, QMenu, QHBoxLayout, QLineEdit, QLabel, QCheckBox, QScrollArea
+from PyQt6.QtWidgets import QMainWindow, QListWidget, QAbstractItemView, QPushButton, QVBoxLayout, QWidget, QTabWidget, QFormLayout, QMenu, QHBoxLayout, QLineEdit, QLabel, QCheckBox, QScrollArea, QMessageBox
 
+from data.derived_values import format_value
 from data.entries import Entry
 from gui.category_dialogs import CategoryDialog, EditCategoryDialog
 from gui.character_dialogs import CharacterDialog, CharacterSelectDialog
@@ -271,7 +272,7 @@ class CategoryView(QWidget):
                 continue
 
             # Add in the data
-            values = entry.get_values()
+            values = self.engine.get_evaluated_values(entry_key, current_history_index)
             for row_index in range(len(properties)):
                 try:
                     value = values[row_index]
@@ -320,10 +321,13 @@ class CharacterView(QTabWidget):
         self.category_tab_view.currentChanged.connect(self.tab_changed)
         self.category_tab_view.tabBar().setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.category_tab_view.tabBar().customContextMenuRequested.connect(self.tab_context_menu)
+        self.state_label = QLabel()
+        self.state_label.setWordWrap(True)
 
         # Layout
         self.layout = QVBoxLayout()
         self.layout.addWidget(self.category_tab_view)
+        self.layout.addWidget(self.state_label)
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.setStretch(0, 1000000)
         self.setLayout(self.layout)
@@ -391,6 +395,14 @@ class CharacterView(QTabWidget):
         if current_tab is not None:
             current_tab.handle_update(currently_selected, current_history_index)
 
+        # Update our simulated state - state variables and stats are kept apart
+        sections = list()
+        for title, values in (("State", self.engine.get_character_state(self.character, current_history_index)), ("Stats", self.engine.get_stat_values(self.character, current_history_index))):
+            if len(values) != 0:
+                sections.append(title + ": " + ", ".join(name + ": " + format_value(value) for name, value in sorted(values.items())))
+        self.state_label.setText("\n".join(sections))
+        self.state_label.setVisible(len(sections) != 0)
+
         # Update our tab bar
         categories = self.engine.get_categories()
         num_categories = len(categories)
@@ -447,17 +459,26 @@ class MainGUI(QMainWindow):
         # Main menus
         self.main_menu = self.menu_bar.addMenu("&Main")
         self.save_menu_action = self.main_menu.addAction("Save")
-        self.save_menu_action.triggered.connect(self.engine.save)
+        self.save_menu_action.triggered.connect(self.engine.handle_save)
         self.save_menu_action.setShortcut("Ctrl+s")
         self.save_as_action = self.main_menu.addAction("Save As")
-        self.save_as_action.triggered.connect(self.engine.save_as)
+        self.save_as_action.triggered.connect(self.engine.handle_save_as)
         self.load_menu_action = self.main_menu.addAction("Load")
-        self.load_menu_action.triggered.connect(self.engine.load)
+        self.load_menu_action.triggered.connect(self.engine.handle_load)
         self.load_menu_action.setShortcut("Ctrl+o")
         self.load_gsheet_credentials_action = self.main_menu.addAction("Load GSheet Credentials")
-        self.load_gsheet_credentials_action.triggered.connect(self.engine.load_gsheets_credentials)
+        self.load_gsheet_credentials_action.triggered.connect(self.engine.handle_load_gsheets_credentials)
         self.dump_menu_action = self.main_menu.addAction("Dump")
-        self.dump_menu_action.triggered.connect(self.engine.dump)
+        self.dump_menu_action.triggered.connect(self.engine.handle_dump)
+
+        # Edit Menu
+        self.edit_menu = self.menu_bar.addMenu("&Edit")
+        self.undo_action = self.edit_menu.addAction("Undo")
+        self.undo_action.triggered.connect(self.undo)
+        self.undo_action.setShortcut("Ctrl+z")
+        self.redo_action = self.edit_menu.addAction("Redo")
+        self.redo_action.triggered.connect(self.redo)
+        self.redo_action.setShortcut("Ctrl+y")
 
         # Characters Menu
         self.characters_menu = self.menu_bar.addMenu("&Characters")
@@ -485,11 +506,15 @@ class MainGUI(QMainWindow):
         self.history_list.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.history_list.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
         self.history_list.itemSelectionChanged.connect(self.selection_changed)
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search history...")
+        self.history_search.textChanged.connect(self.filter_history_list)
         self.create_entry_button = QPushButton("Create Entry Below Highlighted")
         self.create_entry_button.clicked.connect(self.create_entry)
         # self.update_entry_button = QPushButton("Update Selected Entry")
         # self.update_entry_button.clicked.connect(self.update_entry)
         self.sidebar_layout = QVBoxLayout()
+        self.sidebar_layout.addWidget(self.history_search)
         self.sidebar_layout.addWidget(self.history_list)
         self.sidebar_layout.addWidget(self.create_entry_button)
         # self.sidebar_layout.addWidget(self.update_entry_button)
@@ -578,7 +603,11 @@ class MainGUI(QMainWindow):
             category = category_dialog.get_data()
             if not category:
                 return
-            self.engine.add_category(category)
+            try:
+                self.engine.add_category(category)
+            except ValueError as error:
+                QMessageBox.warning(self, "Invalid Category", str(error))
+                return
 
             # Update our GUI
             self.handle_update()
@@ -595,27 +624,12 @@ class MainGUI(QMainWindow):
             if not category:
                 return
 
-            # Handle plugins update
-            self.engine.edit_category(category_name, category)
-
-            # Work through our instructions to edit all category entries
-            instructions = category_dialog.get_instructions()
-            entries = self.engine.get_all_category_entries(category_name)
-            for entry in entries:
-                values = entry.get_values()
-
-                # Handle all available instructions in order (ORDER MATTERS)
-                for instruction, location in instructions:
-                    if instruction == "INSERT_AT":
-                        values.insert(location, "")
-                    elif instruction == "DELETE":
-                        values.pop(location)
-                    elif instruction == "MOVE UP":
-                        item = values.pop(location)
-                        values.insert(location - 1, item)
-                    elif instruction == "MOVE DOWN":
-                        item = values.pop(location)
-                        values.insert(location + 1, item)
+            # Handle plugins update & work through our instructions to edit all category entries
+            try:
+                self.engine.edit_category(category_name, category, category_dialog.get_instructions())
+            except ValueError as error:
+                QMessageBox.warning(self, "Invalid Category", str(error))
+                return
 
             # Update our GUI
             self.handle_update()
@@ -626,6 +640,14 @@ class MainGUI(QMainWindow):
         # Update our GUI
         self.handle_update()
 
+    def undo(self):
+        self.engine.undo()
+        self.handle_update()
+
+    def redo(self):
+        self.engine.redo()
+        self.handle_update()
+
     def toggle_display_hidden(self):
         self.handle_update()
 
@@ -798,6 +820,9 @@ class MainGUI(QMainWindow):
         self.handle_update_current_view(currently_selected,history_index)
 
     def handle_update_menus(self, currently_selected, current_history_index):
+        self.undo_action.setEnabled(self.engine.can_undo())
+        self.redo_action.setEnabled(self.engine.can_redo())
+
         characters = self.engine.get_characters()
         self.delete_character_menu.clear()
         self.delete_character_actions.clear()
@@ -824,8 +849,7 @@ class MainGUI(QMainWindow):
         self.history_list.blockSignals(True)
         self.history_list.clear()
         history = self.engine.get_history()
-        for index in range(len(history)):
-            unique_key = history[index]
+        for index, unique_key in enumerate(history):
             entry = self.engine.get_entry(unique_key)
             category = self.engine.get_category(entry.get_category())
 
@@ -850,6 +874,7 @@ class MainGUI(QMainWindow):
 
             self.history_list.addItem(output)
         self.history_list.blockSignals(False)
+        self.filter_history_list()
 
         # Set our current point in history
         index = self.engine.get_history_index()
@@ -861,6 +886,16 @@ class MainGUI(QMainWindow):
         # Update main display tab
         self.selection_changed()
 
+    def filter_history_list(self):
+        # Hide history items that don't match our search, the last word can be partially typed
+        query = self.history_search.text()
+        matches = None
+        if query.strip() != "":
+            matches = {unique_key for unique_key, _ in self.engine.search_entries(query, prefix=True)}
+
+        for index, unique_key in enumerate(self.engine.get_history()):
+            self.history_list.item(index).setHidden(matches is not None and unique_key not in matches)
+
     def handle_update_current_view(self, currently_selected, current_history_index):
         # Update our existing tab
         current_tab = self.character_tab_view.currentWidget()
@@ -18,23 +18,40 @@ def handle_update_later_entries(engine, just_added_key):
     if reply != QMessageBox.StandardButton.Yes:
         return
 
-    # While loop childwards
+    # While loop childwards, only asking for now - edits are applied together once every dialog has closed so the engine
+    # is never left mid transaction (autosaves & background saves included) while a dialog waits on the user
+    edits = list()
     while child_key is not None:
         # Display an update dialog for this entry
-        create_edit_dialog(engine, child_key)
+        edit = ask_for_entry_edit(engine, child_key)
+        if edit is not None:
+            edits.append((child_key, edit))
         child_key = engine.get_child_key_from_parent_key(child_key)
 
+    with engine.batch():
+        for entry_key, (values, print_to_output, print_to_history) in edits:
+            engine.update_existing_entry_values(entry_key, values, should_print_to_output=print_to_output, should_print_to_history=print_to_history)
 
-def create_edit_dialog(main, entry_key_to_update):
+
+def ask_for_entry_edit(main, entry_key_to_update):
+    # (Values, Print To Output, Print To History) as edited by the user, None if they cancelled
     entry = main.get_entry(entry_key_to_update)
     category = main.get_category(entry.get_category())
 
     # Create an edit entry dialog
     entry_dialog = EditEntryDialog(category, entry.get_values(), entry.get_print_to_output(), entry.print_to_history)
     entry_dialog.exec()
-    if entry_dialog.viable:
-        main.update_existing_entry_values(entry_key_to_update, entry_dialog.get_data(), should_print_to_output=entry_dialog.print_to_output.isChecked(), should_print_to_history=entry_dialog.print_to_history.isChecked())
-    return entry_dialog.viable
+    if not entry_dialog.viable:
+        return None
+    return entry_dialog.get_data(), entry_dialog.print_to_output.isChecked(), entry_dialog.print_to_history.isChecked()
+
+
+def create_edit_dialog(main, entry_key_to_update):
+    edit = ask_for_entry_edit(main, entry_key_to_update)
+    if edit is not None:
+        values, print_to_output, print_to_history = edit
+        main.update_existing_entry_values(entry_key_to_update, values, should_print_to_output=print_to_output, should_print_to_history=print_to_history)
+    return edit is not None
 
 
 def create_update_dialog(engine, entry_key_to_update):
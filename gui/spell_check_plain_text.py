@@ -25,14 +25,23 @@ __author__ = 'John Schember; Stephan Sokolow'
 __docformat__ = 'restructuredtext en'
 
 import sys
-import enchant
 from PyQt6.QtCore import QEvent, Qt
 from PyQt6.QtGui import QFocusEvent, QAction, QActionGroup, QTextCursor, QSyntaxHighlighter, QTextCharFormat, QTextBlockUserData
-from enchant import tokenize
-from enchant.utils import trim_suggestions
-from enchant.errors import TokenizerNotFoundError
 from PyQt6.QtWidgets import QPlainTextEdit, QMenu
 
+# PyEnchant (and the dictionary it loads) is slow to start, so it is imported
+# when the first spell checked text box is created rather than with the GUI.
+_default_dict = None
+
+
+def get_default_dict():
+    """Gets the shared dictionary for the current locale, loading it once"""
+    global _default_dict
+    if _default_dict is None:
+        import enchant
+        _default_dict = enchant.Dict()
+    return _default_dict
+
 
 # pylint: disable=no-name-in-module
 # from PyQt5.Qt import Qt
@@ -55,7 +64,7 @@ class SpellTextEdit(QPlainTextEdit):
 
         # Start with a default dictionary based on the current locale.
         self.highlighter = EnchantHighlighter(self.document())
-        self.highlighter.setDict(enchant.Dict())
+        self.highlighter.setDict(get_default_dict())
 
     def contextMenuEvent(self, event):
         """Custom context menu handler to add a spelling suggestions submenu"""
@@ -99,6 +108,7 @@ class SpellTextEdit(QPlainTextEdit):
             return None
 
         text = cursor.selectedText()
+        from enchant.utils import trim_suggestions
         suggests = trim_suggestions(text,
                                     self.highlighter.dict().suggest(text),
                                     self.max_suggestions)
@@ -122,6 +132,7 @@ class SpellTextEdit(QPlainTextEdit):
         lang_menu = QMenu("Language", parent)
         lang_actions = QActionGroup(lang_menu)
 
+        import enchant
         for lang in enchant.list_languages():
             action = lang_actions.addAction(lang)
             action.setCheckable(True)
@@ -138,6 +149,7 @@ class SpellTextEdit(QPlainTextEdit):
         fmt_actions = QActionGroup(fmt_menu)
 
         curr_format = self.highlighter.chunkers()
+        from enchant import tokenize
         for name, chunkers in (('Text', []), ('HTML', [tokenize.HTMLChunker])):
             action = fmt_actions.addAction(name)
             action.setCheckable(True)
@@ -182,6 +194,7 @@ class SpellTextEdit(QPlainTextEdit):
     def cb_set_language(self, action):
         """Event handler for 'Language' menu entries."""
         lang = action.data()
+        import enchant
         self.highlighter.setDict(enchant.Dict(lang))
 
     def cb_set_format(self, action):
@@ -193,7 +206,7 @@ class SpellTextEdit(QPlainTextEdit):
 class EnchantHighlighter(QSyntaxHighlighter):
     """QSyntaxHighlighter subclass which consults a PyEnchant dictionary"""
     tokenizer = None
-    token_filters = (tokenize.EmailFilter, tokenize.URLFilter)
+    token_filters = None  # Email & URL filters, set once enchant is loaded
 
     # Define the spellcheck style once and just assign it as necessary
     # XXX: Does QSyntaxHighlighter.setFormat handle keeping this from
@@ -225,6 +238,11 @@ class EnchantHighlighter(QSyntaxHighlighter):
 
     def setDict(self, sp_dict):
         """Sets the spelling dictionary to be used"""
+        from enchant import tokenize
+        from enchant.errors import TokenizerNotFoundError
+        if self.token_filters is None:
+            self.token_filters = (tokenize.EmailFilter, tokenize.URLFilter)
+
         try:
             self.tokenizer = tokenize.get_tokenizer(sp_dict.tag,
                 chunkers=self._chunkers, filters=self.token_filters)
@@ -0,0 +1,229 @@
+"""
+Command line access to a session without the GUI.
+
+Usage:
+    python litrpg.py validate session.litrpg
+    python litrpg.py stats session.litrpg
+    python litrpg.py export session.litrpg [--at-tag NAME] [--format csv|json] [--output FILE]
+    python litrpg.py dump session.litrpg [--credentials FILE] [--local DIRECTORY]
+    python litrpg.py convert session.litrpg session.litrpgdb
+
+Sessions can be JSON (.litrpg) or SQLite (.litrpgdb) files, convert copies one to the other.
+
+Every command exits with 1 if the session can't be loaded (including the revision DAG errors loading raises) and
+validate also exits with 1 if the session fails its checks.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from data.derived_values import DerivedValueError
+from engine import LitRPGEngine
+
+
+class CommandError(Exception):
+    pass
+
+
+def load_session(path):
+    engine = LitRPGEngine()
+    try:
+        engine.load(path)
+    except (OSError, ValueError, KeyError) as error:
+        raise CommandError("Could not load " + path + ": " + type(error).__name__ + " " + str(error))
+    return engine
+
+
+def find_tag(engine, tag_name):
+    for tag in engine.get_tags().values():
+        if tag.get_name() == tag_name:
+            return tag
+    raise CommandError("No tag named '" + tag_name + "'.")
+
+
+def print_progress(label):
+    # Prints whenever the whole percentage changes so logs stay readable on big dumps
+    last = [-1]
+
+    def progress(done, total):
+        percent = (100 * done) // max(1, total)
+        if percent != last[0]:
+            last[0] = percent
+            print("{}: {}% ({}/{})".format(label, percent, done, total), flush=True)
+    return progress
+
+
+def collect_rows(engine, index):
+    # (Character, Category, Entry ID, Property, Value) for every live entry at the history index, derived values included
+    rows = list()
+    for character_index, character in enumerate(engine.get_characters()):
+        for category in engine.get_categories().values():
+            view = engine.get_category_state_for_entity_at_time(category.get_name(), character_index, index)
+            for unique_key in view or []:
+                values = engine.get_evaluated_values(unique_key, index)
+                properties = category.get_properties()
+                for field_index in range(len(properties)):
+                    value = values[field_index] if field_index < len(values) else ""
+                    rows.append((character, category.get_name(), engine.entry_ids.get_uuid(unique_key), properties[field_index].get_property_name(), value))
+    return rows
+
+
+def rows_to_json(rows):
+    # Character -> Category -> [{"id": Entry ID, "values": {Property: Value}}]
+    output = dict()
+    for character, category, entry_id, property_name, value in rows:
+        entries = output.setdefault(character, dict()).setdefault(category, list())
+        if len(entries) == 0 or entries[-1]["id"] != entry_id:
+            entries.append({"id": entry_id, "values": dict()})
+        entries[-1]["values"][property_name] = value
+    return output
+
+
+def command_validate(args):
+    engine = load_session(args.session)
+    try:
+        engine.validate()
+    except (ValueError, DerivedValueError) as error:
+        raise CommandError("Invalid session " + args.session + ": " + str(error))
+    print("OK: {} entries, {} characters, {} categories, {} tags".format(len(engine.get_history()), len(engine.get_characters()), len(engine.get_categories()), len(engine.get_tags())))
+
+
+def command_stats(args):
+    engine = load_session(args.session)
+    history = engine.get_history()
+    chains = sum(1 for unique_key in history if engine.get_entry(unique_key).get_parent_key() is None)
+    print("Entries: " + str(len(history)))
+    print("Revision chains: " + str(chains))
+    print("History index: " + str(engine.get_history_index()))
+    print("Tags: " + str(len(engine.get_tags())))
+
+    print("Categories:")
+    for category_name in engine.get_categories().keys():
+        print("    {}: {} entries".format(category_name, len(engine.get_all_category_entries(category_name))))
+
+    print("Characters:")
+    for character in engine.get_characters():
+        print("    {}: {} entries".format(character, len(engine.get_all_character_entries(character))))
+        for variable, value in sorted(engine.get_character_state(character).items()):
+            print("        {} = {}".format(variable, value))
+        for stat, value in sorted(engine.get_stat_values(character).items()):
+            print("        stat {} = {}".format(stat, value))
+
+
+def command_export(args):
+    engine = load_session(args.session)
+    if args.at_tag is not None:
+        index = engine.get_history().index(find_tag(engine, args.at_tag).get_associated_entry_key())
+    else:
+        index = engine.get_history_index()
+    rows = collect_rows(engine, index)
+
+    output = open(args.output, "w", newline="") if args.output is not None else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.writer(output)
+            writer.writerow(["Character", "Category", "Entry", "Property", "Value"])
+            writer.writerows(rows)
+        else:
+            json.dump({"tag": args.at_tag, "history_index": index, "characters": rows_to_json(rows)}, output, indent=4)
+            output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def command_dump(args):
+    engine = load_session(args.session)
+
+    # Local stand in - the same plan as a Sheets dump, one JSON file per output target
+    if args.local is not None:
+        os.makedirs(args.local, exist_ok=True)
+        steps = engine.plan_dump()
+        progress = print_progress("Dump")
+        progress(0, len(steps))
+        previous_end = -1
+        for count, step in enumerate(steps):
+            sheets = dict()
+            for character, views in step["characters"]:
+                sheets[character + " Previous View"] = {category.get_name(): [engine.get_evaluated_values(key, previous_end) for key in previous_view or []] for category, previous_view, _ in views}
+                sheets[character + " Current View"] = {category.get_name(): [engine.get_evaluated_values(key, step["end"]) for key in view or []] for category, _, view in views}
+
+            history = list()
+            for unique_key in engine.get_history()[step["start"]:step["end"] + 1]:
+                entry = engine.get_entry(unique_key)
+                history.append({"id": engine.entry_ids.get_uuid(unique_key), "character": engine.get_character(entry.character), "category": entry.get_category(), "values": entry.get_values()})
+            sheets["History"] = history
+
+            with open(os.path.join(args.local, step["target"] + ".json"), "w") as json_file:
+                json.dump(sheets, json_file, indent=4)
+            previous_end = step["end"]
+            progress(count + 1, len(steps))
+        return
+
+    if args.credentials is not None:
+        engine.load_gsheets_credentials(args.credentials)
+    elif engine.gsheets_credentials_path is None:
+        raise CommandError("No Google Sheets credentials - pass --credentials or --local.")
+    engine.dump(print_progress("Dump"))
+
+    # Dumping saves in the background, make sure that made it to disk
+    try:
+        engine.wait_for_saves()
+    except OSError as error:
+        raise CommandError("Could not save " + args.session + ": " + str(error))
+
+
+def command_convert(args):
+    if os.path.abspath(args.session) == os.path.abspath(args.destination):
+        raise CommandError("Converting a session onto itself.")
+    engine = load_session(args.session)
+    engine.save(args.destination)
+    print("Wrote {} entries to {}".format(len(engine.get_history()), args.destination))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="litrpg", description="Work with LitRPG Tools sessions without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    validate = commands.add_parser("validate", help="Load a session and check it for errors.")
+    validate.add_argument("session")
+    validate.set_defaults(handler=command_validate)
+
+    stats = commands.add_parser("stats", help="Summarise a session.")
+    stats.add_argument("session")
+    stats.set_defaults(handler=command_stats)
+
+    export = commands.add_parser("export", help="Write every character's live entries at a point in history.")
+    export.add_argument("session")
+    export.add_argument("--at-tag", metavar="NAME", help="Export at the tagged entry rather than the saved history index.")
+    export.add_argument("--format", choices=["csv", "json"], default="json")
+    export.add_argument("--output", metavar="FILE", help="Write to a file rather than stdout.")
+    export.set_defaults(handler=command_export)
+
+    dump = commands.add_parser("dump", help="Regenerate every tagged character sheet.")
+    dump.add_argument("session")
+    dump.add_argument("--credentials", metavar="FILE", help="Google service account file, defaults to the session's.")
+    dump.add_argument("--local", metavar="DIRECTORY", help="Write each sheet as JSON to a directory instead of Google Sheets.")
+    dump.set_defaults(handler=command_dump)
+
+    convert = commands.add_parser("convert", help="Copy a session between the JSON (.litrpg) and SQLite (.litrpgdb) formats.")
+    convert.add_argument("session")
+    convert.add_argument("destination")
+    convert.set_defaults(handler=command_convert)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except CommandError as error:
+        print(str(error), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pytest
+
+# The repository root holds our top level modules (engine, data, utils) rather than an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.categories import Category, CategoryProperty  # noqa: E402
+from data.entries import Entry  # noqa: E402
+from engine import LitRPGEngine  # noqa: E402
+
+
+def session_snapshot(engine):
+    # Everything a save should preserve, keyed by uuid so sessions loaded separately compare equal
+    entry_ids = engine.entry_ids
+    return {
+        "history": [entry_ids.get_uuid(unique_key) for unique_key in engine.get_history()],
+        "entries": {entry_ids.get_uuid(unique_key): entry_ids.export_entry(engine.get_entry(unique_key)) for unique_key in engine.get_history()},
+        "history_index": engine.get_history_index(),
+        "characters": list(engine.get_characters()),
+        "categories": list(engine.get_categories().keys()),
+        "tags": sorted((entry_ids.get_uuid(unique_key), tag.tag_name) for unique_key, tag in engine.get_tags().items()),
+    }
+
+
+def reload_session(path):
+    engine = LitRPGEngine()
+    engine.load(path)
+    return engine
+
+
+def apply_random_edit(engine, rng, add_entry, new_values):
+    """
+    One random insert (via add_entry(engine, rng)), move, delete or value edit (new_values(entry, rng), None to skip)
+    somewhere in the history.
+    """
+    size = len(engine.get_history())
+    operation = rng.random()
+    if operation < 0.4:
+        engine.set_current_history_index(rng.randrange(size))
+        add_entry(engine, rng)
+    elif operation < 0.7:
+        engine.move_entry_in_history(rng.randrange(1, size - 1), rng.random() < 0.5)
+    elif operation < 0.85:
+        engine.delete_entry_at_index(rng.randrange(size))
+    else:
+        unique_key = engine.get_history()[rng.randrange(size)]
+        values = new_values(engine.get_entry(unique_key), rng)
+        if values is not None:
+            engine.update_existing_entry_values(unique_key, values)
+
+
+@pytest.fixture
+def make_engine():
+    # Engines with the given categories and characters
+    def make(*categories, characters=("Alice", "Bob")):
+        engine = LitRPGEngine()
+        for character in characters:
+            engine.add_character(character)
+        for category in categories:
+            engine.add_category(category)
+        return engine
+    return make
+
+
+@pytest.fixture
+def skill_engine(make_engine):
+    # A small session of unrelated skills, one of them tagged
+    engine = make_engine(Category("Skill", [CategoryProperty("Name", False), CategoryProperty("Level", False)], "", ""))
+    for i in range(20):
+        engine.add_entry(Entry("Skill", ["Skill " + str(i), "1"], character=i % 2))
+    engine.add_tag(engine.get_history()[3], "Sheet", "NONE")
+    return engine
+
+
+@pytest.fixture
+def snapshot():
+    return session_snapshot
+
+
+@pytest.fixture
+def reload():
+    return reload_session
+
+
+@pytest.fixture
+def random_edit():
+    return apply_random_edit
@@ -0,0 +1,59 @@
+import json
+import time
+
+from data.entries import Entry
+from data.revision_deltas import decode_entries
+from engine import LitRPGEngine
+from utils.autosave import AutosaveService
+
+
+def write_version_1(engine, path):
+    # As saved before format versions (and revision deltas) existed
+    engine.save(path)
+    with open(path, "r") as json_file:
+        data = json.load(json_file)
+    del data["format_version"]
+    del data["journal"]
+    decode_entries(data["entries"])
+    with open(path, "w") as json_file:
+        json.dump(data, json_file, indent=4)
+
+
+def settle(engine, autosave):
+    # Long enough for any autosave our changes armed to have fired and been written
+    time.sleep(autosave.delay * 10)
+    engine.wait_for_saves()
+
+
+def test_loading_and_navigating_never_rewrite(tmp_path, skill_engine):
+    path = str(tmp_path / "session.litrpg")
+    skill_engine.add_entry(Entry("Skill", ["Skill 19", "2"], parent_key=skill_engine.get_history()[-1]))
+    write_version_1(skill_engine, path)
+    with open(path, "rb") as session_file:
+        original = session_file.read()
+
+    engine = LitRPGEngine()
+    autosave = AutosaveService(engine, delay=0.01)
+    engine.load(path)
+    engine.set_current_history_index(3)
+    settle(engine, autosave)
+    with open(path, "rb") as session_file:
+        assert session_file.read() == original
+    assert autosave.last_saved is None
+
+    # Edits are still autosaved
+    engine.update_existing_entry_values(engine.get_history()[0], ["Renamed", "1"])
+    settle(engine, autosave)
+    assert autosave.last_saved is not None and autosave.last_error is None
+    with open(path, "rb") as session_file:
+        assert session_file.read() != original
+
+
+def test_cancel_drops_a_pending_autosave(tmp_path, skill_engine):
+    path = str(tmp_path / "session.litrpg")
+    skill_engine.save(path)
+    autosave = AutosaveService(skill_engine, delay=0.05)
+    skill_engine.update_existing_entry_values(skill_engine.get_history()[0], ["Renamed", "1"])
+    autosave.cancel()
+    settle(skill_engine, autosave)
+    assert autosave.last_saved is None
@@ -0,0 +1,81 @@
+import math
+import random
+
+import pytest
+
+from utils.expressions import compile_expression, evaluate
+from utils.string_utils import Parser
+
+# "missing" is never given a value, "zero" always is zero
+NAMES = ["a", "b", "zero", "missing", "pi"]
+
+
+def random_expression(rng, depth=0):
+    choice = rng.random()
+    if depth > 3 or choice < 0.3:
+        return rng.choice([str(rng.randint(0, 9)), str(rng.randint(0, 9)) + "." + str(rng.randint(0, 9)), rng.choice(NAMES)])
+    if choice < 0.4:
+        return "-" + random_expression(rng, depth + 1)
+    if choice < 0.55:
+        return "(" + random_expression(rng, depth + 1) + ")"
+    operands = [random_expression(rng, depth + 1) for _ in range(rng.randint(2, 4))]
+    source = operands[0]
+    for operand in operands[1:]:
+        source += rng.choice([" + ", "-", " * ", "/", " / "]) + operand
+    return source
+
+
+def reference(source, variables):
+    # (Value, None) or (None, Message) from the original interpreter
+    try:
+        return Parser(source, variables).getValue(), None
+    except Exception as error:
+        return None, str(error)
+
+
+def outcome(function):
+    try:
+        return function(), None
+    except Exception as error:
+        return None, str(error)
+
+
+def same_value(first, second):
+    return first == second or (first is not None and second is not None and math.isnan(first) and math.isnan(second))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_compiled_matches_parser(seed):
+    rng = random.Random(seed)
+    sources = [random_expression(rng) for _ in range(300)]
+
+    # And a few that don't parse, which are handed back to Parser to report
+    sources += ["1 +", "(a * 2", "2 $ 3", "1..2", "a b", "", "zero / (", "4 / 0 +"]
+    for source in sources:
+        variables = {"a": rng.randint(-3, 3), "b": rng.randint(-3, 3) + 0.5, "zero": 0}
+        expected_value, expected_error = reference(source, variables)
+        for value, error in (outcome(lambda: compile_expression(source).evaluate(variables)), outcome(lambda: evaluate(source, variables))):
+            assert error == expected_error, source
+            assert same_value(value, expected_value), source
+
+
+def test_constants_cannot_be_redefined():
+    assert outcome(lambda: evaluate("pi * 2", {"pi": 3})) == reference("pi * 2", {"pi": 3})
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_batch_matches_parser(seed):
+    numpy = pytest.importorskip("numpy")
+    rng = random.Random(seed)
+    columns = {"a": numpy.array([rng.randint(-2, 2) for _ in range(12)], dtype=float), "b": 1.5, "zero": numpy.zeros(12)}
+    for source in [random_expression(rng) for _ in range(200)] + ["1 +", "(a * 2"]:
+        values, errors = compile_expression(source).evaluate_batch(columns)
+        assert len(values) == 12
+        for element in range(12):
+            variables = {"a": float(columns["a"][element]), "b": 1.5, "zero": 0.0}
+            expected_value, expected_error = reference(source, variables)
+            assert errors.get(element, None) == expected_error, source
+            if expected_error is None:
+                assert same_value(float(values[element]), expected_value), source
+            else:
+                assert math.isnan(values[element]), source
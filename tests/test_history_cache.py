@@ -0,0 +1,70 @@
+import random
+
+from data.categories import Category, CategoryProperty
+from data.entries import Entry
+
+
+def add_entry(engine, rng):
+    # Half of our entries revise the latest revision (as of the head) of something already in place, as the gui does
+    head = engine.get_history_index()
+    if head >= 0 and rng.random() < 0.5:
+        unique_key = engine.get_history()[rng.randrange(head + 1)]
+        root_key = unique_key if engine.get_absolute_parent(unique_key) is None else engine.get_absolute_parent(unique_key)
+        root = engine.get_entry(root_key)
+        parent_key = engine.get_most_recent_revision_for_root_entry_key(root_key)
+        engine.add_entry(Entry(root.get_category(), [str(rng.randint(0, 99))], parent_key=parent_key, character=root.character))
+    else:
+        engine.add_entry(Entry(rng.choice(list(engine.get_categories())), [str(rng.randint(0, 99))], character=rng.randrange(2)))
+
+
+def new_values(entry, rng):
+    return [str(rng.randint(0, 99))]
+
+
+def naive_latest(engine):
+    # Character -> Category -> Root -> Latest Revision, walking parent keys through the history up to the head
+    latest = dict()
+    for unique_key in list(engine.get_history())[:engine.get_history_index() + 1]:
+        root = engine.get_entry(unique_key)
+        while root.get_parent_key() is not None:
+            root = engine.get_entry(root.get_parent_key())
+        latest.setdefault(root.character, dict()).setdefault(root.get_category(), dict())[root.get_unique_key()] = unique_key
+    return latest
+
+
+def test_random_edits_match_a_rebuild(make_engine, random_edit):
+    engine = make_engine(Category("Skill", [CategoryProperty("Level", False)], "", ""), Category("Item", [CategoryProperty("Count", False)], "", ""))
+    engine.validate_caches = True
+    rng = random.Random(3)
+    for _ in range(30):
+        add_entry(engine, rng)
+
+    for step in range(400):
+        operation = rng.random()
+        if operation < 0.6:
+            random_edit(engine, rng, add_entry, new_values)
+        elif operation < 0.8:
+            engine.set_current_history_index(rng.randrange(-1, len(engine.get_history())))
+        elif operation < 0.9:
+            engine.undo()
+        else:
+            engine.redo()
+        if step == 200:
+            engine.edit_category("Item", Category("Gear", [CategoryProperty("Count", False)], "", ""))
+
+        expected = naive_latest(engine)
+        for character in range(2):
+            for category_name in engine.get_categories():
+                latest = expected.get(character, dict()).get(category_name, None)
+                assert engine.get_category_state_for_entity(category_name, character) == (None if latest is None else list(latest.values()))
+        for root_key in {root for categories in expected.values() for latest in categories.values() for root in latest}:
+            assert engine.get_most_recent_revision_for_root_entry_key(root_key) == expected_revision(expected, root_key)
+        engine.history_cache.validate()
+
+
+def expected_revision(expected, root_key):
+    for categories in expected.values():
+        for latest in categories.values():
+            if root_key in latest:
+                return latest[root_key]
+    return None
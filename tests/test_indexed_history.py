@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from data.indexed_history import IndexedHistory
+
+
+def check(history, expected):
+    assert len(history) == len(expected)
+    assert list(history) == expected
+    assert all(history.index(key) == i for i, key in enumerate(expected))
+    if len(expected) != 0:
+        assert history[-1] == expected[-1]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_a_list(seed):
+    rng = random.Random(seed)
+    expected = list(range(rng.randrange(0, 50)))
+    history = IndexedHistory(expected)
+    next_key = len(expected)
+    check(history, expected)
+
+    for _ in range(2000):
+        operation = rng.random()
+        if operation < 0.35 or len(expected) < 2:
+            index = rng.randint(-len(expected) - 2, len(expected) + 2)
+            history.insert(index, next_key)
+            expected.insert(index, next_key)
+            next_key += 1
+        elif operation < 0.55:
+            index = rng.randrange(-len(expected), len(expected))
+            assert history.pop(index) == expected.pop(index)
+        elif operation < 0.65:
+            key = rng.choice(expected)
+            history.remove(key)
+            expected.remove(key)
+        elif operation < 0.8:
+            first, second = rng.randrange(len(expected)), rng.randrange(len(expected))
+            history.swap(first, second)
+            expected[first], expected[second] = expected[second], expected[first]
+        elif operation < 0.9:
+            start = rng.randrange(len(expected) + 1)
+            assert list(history.iterate_from(start)) == expected[start:]
+        else:
+            start, stop = sorted(rng.randint(-len(expected) - 2, len(expected) + 2) for _ in range(2))
+            assert history[start:stop] == expected[start:stop]
+            assert history[start:stop:2] == expected[start:stop:2]
+
+        # Never empty - we only pop or remove with two or more keys left
+        key = rng.choice(expected)
+        assert key in history and next_key not in history
+        assert history.index(key) == expected.index(key)
+    check(history, expected)
+
+
+def test_errors_match_a_list():
+    history = IndexedHistory(["a", "b"])
+    with pytest.raises(IndexError):
+        history[2]
+    with pytest.raises(IndexError):
+        history.pop(-3)
+    with pytest.raises(ValueError):
+        history.index("c")
+    with pytest.raises(ValueError):
+        history.remove("c")
+    with pytest.raises(KeyError):
+        history.insert(0, "a")
+    check(history, ["a", "b"])
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from data.categories import Category, CategoryProperty
+from data.derived_values import get_entry_variables, to_variable_name
+from data.entries import Entry
+from utils.expressions import compile_expression
+
+
+@pytest.fixture
+def buff_engine(make_engine):
+    def build(seed):
+        engine = make_engine(
+            Category("Buff", [CategoryProperty("Amount", False)], "", "", modifiers=[["Damage", "+", "amount", 0], ["Armour", "-", "amount / 2", 1]]),
+            Category("Curse", [CategoryProperty("Factor", False)], "", "", modifiers=[["Damage", "*", "factor", 0], ["Armour", "/", "factor", 0], ["Damage", "+", "1", 1]]))
+        rng = random.Random(seed)
+        for _ in range(40):
+            add_random_entry(engine, rng)
+        return engine, rng
+    return build
+
+
+def add_random_entry(engine, rng):
+    if rng.random() < 0.6:
+        engine.add_entry(Entry("Buff", [str(rng.randint(-5, 20))], character=rng.randrange(2)))
+    else:
+        engine.add_entry(Entry("Curse", [str(rng.choice([0, 0.5, 2, 3]))], character=rng.randrange(2)))
+
+
+def naive_stats(engine, character, index):
+    # Applies every modifier up to index one at a time - stage by stage, each in history order
+    history = [engine.get_entry(unique_key) for unique_key in list(engine.get_history())[:index + 1]]
+    modifiers = list()
+    for position, entry in enumerate(history):
+        if entry.character != character:
+            continue
+        category = engine.get_categories()[entry.get_category()]
+        variables = get_entry_variables(category, entry)
+        for stat, operation, expression, stage in category.get_modifiers():
+            compiled = compile_expression(expression)
+            amount = compiled.evaluate({name: variables[to_variable_name(name)] for name in compiled.variables})
+            modifiers.append((stage, position, to_variable_name(stat), operation, amount))
+
+    stats = dict()
+    for _, _, stat, operation, amount in sorted(modifiers, key=lambda modifier: modifier[:2]):
+        value = stats.get(stat, 0.0)
+        if operation == "+":
+            value += amount
+        elif operation == "-":
+            value -= amount
+        elif operation == "*":
+            value *= amount
+        elif amount != 0:
+            value /= amount
+        stats[stat] = value
+    return stats
+
+
+def new_values(entry, rng):
+    return [str(rng.randint(-5, 20))] if entry.get_category() == "Buff" else None
+
+
+def check_all(engine):
+    for index in range(len(engine.get_history())):
+        for character in range(2):
+            expected = naive_stats(engine, character, index)
+            actual = engine.get_stat_values(character, index)
+            assert set(expected) <= set(actual)
+            for stat, value in actual.items():
+                assert value == pytest.approx(expected.get(stat, 0.0))
+
+
+def test_stat_values_match_replay(buff_engine):
+    engine, _ = buff_engine(1)
+    check_all(engine)
+
+
+def test_stat_values_after_mid_history_changes(buff_engine, random_edit):
+    engine, rng = buff_engine(2)
+    for step in range(60):
+        random_edit(engine, rng, add_random_entry, new_values)
+
+        index = rng.randrange(len(engine.get_history()))
+        for character in range(2):
+            for stat, value in engine.get_stat_values(character, index).items():
+                assert value == pytest.approx(naive_stats(engine, character, index).get(stat, 0.0)), step
+    check_all(engine)
+
+
+def test_stat_and_state_names_cannot_clash(buff_engine):
+    engine, _ = buff_engine(3)
+    with pytest.raises(ValueError):
+        engine.add_category(Category("Training", [CategoryProperty("Amount", False)], "", "", modifications=[["damage", "damage + amount"]]))
+    assert "Training" not in engine.get_categories()
+
+    with pytest.raises(ValueError):
+        engine.edit_category("Buff", Category("Buff", [CategoryProperty("Amount", False)], "", "", modifications=[["Armour", "amount"]]))
+    assert engine.get_categories()["Buff"].get_modifications() == []
@@ -0,0 +1,97 @@
+import copy
+import json
+
+import pytest
+
+from data.categories import Category, CategoryProperty
+from data.data_holder import FORMAT_VERSION
+from data.entries import Entry
+from data.revision_deltas import decode_entries, encode_entries
+
+
+def build_entries():
+    # Two revision chains (one value changing, one growing then shrinking) and an unrelated entry
+    entries = dict()
+
+    def add(uuid_str, values, parent_key=None):
+        entries[uuid_str] = {"unique_key": uuid_str, "character": 0, "category": "Skill", "values": values, "parent_key": parent_key, "print_to_output": True, "print_to_history": True}
+
+    description = "A long description " * 20
+    add("a1", ["Sword", "Level: 1", description])
+    add("a2", ["Sword", "Level: 2", description], "a1")
+    add("a3", ["Sword", "Level: 3", description], "a2")
+    add("b1", ["Shield", 1, 1.0])
+    add("b2", ["Shield", True, 1.0, "Extra"], "b1")
+    add("b3", ["Shield"], "b2")
+    add("c1", ["Unrelated"])
+    return entries
+
+
+def test_round_trip():
+    entries = build_entries()
+    encoded = copy.deepcopy(entries)
+    encode_entries(encoded)
+    assert "delta" in encoded["a2"] and "delta" in encoded["a3"]
+    assert encoded["a3"]["delta"] == [[1, "Level: 3"]]
+    assert "values" in encoded["a1"] and "values" in encoded["c1"]
+
+    decoded = json.loads(json.dumps(encoded))
+    decode_entries(decoded)
+    assert json.dumps(decoded, sort_keys=True) == json.dumps(entries, sort_keys=True)
+
+    # Decoded revisions share their parent's unchanged values
+    assert decoded["a3"]["values"][2] is decoded["a1"]["values"][2]
+
+
+def test_parent_after_child():
+    entries = build_entries()
+    encoded = copy.deepcopy(entries)
+    encode_entries(encoded)
+    reordered = {uuid_str: encoded[uuid_str] for uuid_str in reversed(list(encoded))}
+    decode_entries(reordered)
+    assert all(reordered[uuid_str]["values"] == entries[uuid_str]["values"] for uuid_str in entries)
+
+
+def test_decodes_against_entry_objects():
+    entries = build_entries()
+    encoded = copy.deepcopy(entries)
+    encode_entries(encoded)
+    encoded["a1"] = Entry.from_json(encoded["a1"])
+    decode_entries(encoded)
+    assert encoded["a3"]["values"] == entries["a3"]["values"]
+
+
+def test_missing_parent_is_an_error():
+    encoded = build_entries()
+    encode_entries(encoded)
+    del encoded["a1"]
+    with pytest.raises(ValueError):
+        decode_entries(encoded)
+
+
+def test_session_round_trip(tmp_path, make_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpg")
+    engine = make_engine(Category("Skill", [CategoryProperty("Name", False), CategoryProperty("Level", False), CategoryProperty("Description", True)], "", ""))
+    engine.add_entry(Entry("Skill", ["Sword", "Level: 1", "A long description"]))
+    for level in range(2, 6):
+        engine.add_entry(Entry("Skill", ["Sword", "Level: " + str(level), "A long description"], parent_key=engine.get_history()[-1]))
+    engine.save(path)
+
+    with open(path, "r") as json_file:
+        data = json.load(json_file)
+    assert list(data.keys())[0] == "format_version" and data["format_version"] == FORMAT_VERSION
+    assert sum("delta" in entry for entry in data["entries"].values()) == 4
+    assert snapshot(reload(path)) == snapshot(engine)
+
+
+def test_unknown_format_is_refused(tmp_path, skill_engine, reload):
+    path = str(tmp_path / "session.litrpg")
+    skill_engine.save(path)
+
+    with open(path, "r") as json_file:
+        data = json.load(json_file)
+    data["format_version"] = FORMAT_VERSION + 1
+    with open(path, "w") as json_file:
+        json.dump(data, json_file)
+    with pytest.raises(ValueError):
+        reload(path)
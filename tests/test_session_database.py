@@ -0,0 +1,78 @@
+import os
+
+from data.categories import Category, CategoryProperty
+from data.entries import Entry
+from engine import LitRPGEngine
+
+
+def test_save_and_reload(tmp_path, skill_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpgdb")
+    skill_engine.save(path)
+
+    loaded = reload(path)
+    # Values are only read from the database once they are needed
+    assert all(loaded.get_entry(unique_key).is_stored() for unique_key in loaded.get_history())
+    assert snapshot(loaded) == snapshot(skill_engine)
+
+
+def test_incremental_saves(tmp_path, skill_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpgdb")
+    skill_engine.save(path)
+    engine = reload(path)
+    database = engine.session_database
+
+    # Revise, edit, move and delete, then save back into the same database
+    parent_key = engine.get_history()[2]
+    engine.add_entry(Entry("Skill", ["Skill 2", "2"], parent_key=parent_key))
+    engine.update_existing_entry_values(engine.get_history()[5], ["Renamed", "7"])
+    engine.move_entry_in_history(10, True)
+    engine.delete_entry_at_index(0)
+    engine.add_character("Carol")
+    engine.save()
+    assert engine.session_database is database
+    assert snapshot(reload(path)) == snapshot(engine)
+
+    # Placing many entries between the same two runs out of room between their positions, so the lot are renumbered
+    for i in range(100):
+        engine.set_current_history_index(4)
+        engine.add_entry(Entry("Skill", ["Inserted " + str(i), "1"]))
+    engine.save()
+    assert sorted(database.positions.values()) == [float(i) for i in range(len(engine.get_history()))]
+    assert snapshot(reload(path)) == snapshot(engine)
+
+
+def test_convert_between_formats(tmp_path, skill_engine, snapshot, reload):
+    skill_engine.save(str(tmp_path / "session.litrpgdb"))
+    loaded = reload(str(tmp_path / "session.litrpgdb"))
+    loaded.save(str(tmp_path / "session.litrpg"))
+    assert snapshot(reload(str(tmp_path / "session.litrpg"))) == snapshot(skill_engine)
+
+    # Saving over the database we are reading from
+    loaded = reload(str(tmp_path / "session.litrpgdb"))
+    loaded.save(str(tmp_path / "session.litrpgdb"))
+    assert os.path.exists(str(tmp_path / "session.litrpgdb"))
+    assert snapshot(reload(str(tmp_path / "session.litrpgdb"))) == snapshot(skill_engine)
+
+
+def test_columnar_storage_stays_lazy(tmp_path, skill_engine, snapshot):
+    path = str(tmp_path / "session.litrpgdb")
+    skill_engine.save(path)
+    engine = LitRPGEngine(columnar_storage=True)
+    engine.load(path)
+    database = engine.session_database
+
+    # Nothing was read to move entries into our columnar store
+    assert len(database.values) == 0
+    assert all(engine.get_entry(unique_key).is_stored_in(database) for unique_key in engine.get_history())
+
+    # New entries are stored by us, alongside those still read from the database
+    engine.add_entry(Entry("Skill", ["Skill 20", "1"]))
+    assert engine.get_entry(engine.get_history()[-1]).is_stored_in(engine.entry_store.get_table("Skill"))
+    engine.edit_category("Skill", Category("Ability", [CategoryProperty("Name", False), CategoryProperty("Level", False)], "", ""))
+    assert [engine.get_entry(unique_key).get_values()[0] for unique_key in engine.get_history()] == ["Skill " + str(i) for i in range(21)]
+
+    # Saving elsewhere as a database closes ours, moving every entry into our store
+    expected = snapshot(engine)
+    engine.save(str(tmp_path / "copy.litrpgdb"))
+    assert all(engine.get_entry(unique_key).is_stored_in(engine.entry_store.get_table("Ability")) for unique_key in engine.get_history())
+    assert snapshot(engine) == expected
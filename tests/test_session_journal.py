@@ -0,0 +1,93 @@
+import json
+import os
+
+from data.entries import Entry
+from data.session_journal import get_journal_path, read_records
+
+
+def edit(engine, step):
+    # A revision, a value change, a move and deletions of a saved and an unsaved entry
+    parent_key = engine.get_history()[step % 10]
+    if engine.get_child_key_from_parent_key(parent_key) is None:
+        engine.set_current_history_index(len(engine.get_history()) - 1)
+        engine.add_entry(Entry("Skill", ["Revised " + str(step), str(step)], parent_key=parent_key))
+    engine.update_existing_entry_values(engine.get_history()[-1], ["Edited " + str(step), str(step)])
+    engine.move_entry_in_history(len(engine.get_history()) - 2, True)
+    if step % 3 == 0:
+        engine.delete_entry_at_index(0)
+    temporary = Entry("Skill", ["Temporary", "0"])
+    engine.add_entry(temporary)
+    engine.delete_entry_at_index(engine.get_history().index(temporary.unique_key))
+
+
+def test_saves_append_and_reload(tmp_path, skill_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpg")
+    engine = skill_engine
+    engine.save(path)
+    with open(path, "r") as json_file:
+        original = json_file.read()
+
+    for step in range(5):
+        edit(engine, step)
+        engine.save()
+
+    # The snapshot is untouched and every save is a record in its journal
+    with open(path, "r") as json_file:
+        assert json_file.read() == original
+    records, _ = read_records(get_journal_path(path))
+    assert [record["seq"] for record in records] == [1, 2, 3, 4, 5]
+    assert snapshot(reload(path)) == snapshot(engine)
+
+    # Saving with nothing changed appends nothing
+    engine.save()
+    assert len(read_records(get_journal_path(path))[0]) == 5
+
+
+def test_compaction_folds_the_journal_in(tmp_path, skill_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpg")
+    engine = skill_engine
+    engine.save(path)
+    engine.session_journal.compact_min_bytes = 0
+    engine.session_journal.compact_ratio = 0.01
+
+    for step in range(10):
+        edit(engine, step)
+        engine.save()
+        if engine.session_journal.worker is not None:
+            engine.session_journal.worker.join()
+    engine.session_journal.compact()
+
+    with open(path, "r") as json_file:
+        assert json.load(json_file)["journal"]["seq"] == 10
+    assert read_records(get_journal_path(path))[0] == []
+    assert snapshot(reload(path)) == snapshot(engine)
+
+    # Carries on appending onto the compacted snapshot
+    edit(engine, 10)
+    engine.save()
+    assert snapshot(reload(path)) == snapshot(engine)
+
+
+def test_torn_record_is_dropped(tmp_path, skill_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpg")
+    engine = skill_engine
+    engine.save(path)
+    edit(engine, 0)
+    engine.save()
+    saved = snapshot(engine)
+    journal_size = os.path.getsize(get_journal_path(path))
+
+    # A save that died half way through its record
+    edit(engine, 1)
+    engine.save()
+    with open(get_journal_path(path), "rb+") as journal_file:
+        journal_file.truncate(journal_size + (os.path.getsize(get_journal_path(path)) - journal_size) // 2)
+
+    recovered = reload(path)
+    assert snapshot(recovered) == saved
+    assert os.path.getsize(get_journal_path(path)) == journal_size
+
+    # Later saves append cleanly after the last whole record
+    edit(recovered, 2)
+    recovered.save()
+    assert snapshot(reload(path)) == snapshot(recovered)
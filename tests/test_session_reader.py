@@ -0,0 +1,33 @@
+import io
+import json
+import os
+
+from data.session_reader import _StreamingDecoder, read_session
+
+VALUES = ["Épée de feu", "火の剣", "Level: 3 ⚔️"]
+
+
+def test_progress_counts_bytes(tmp_path, skill_engine, snapshot, reload):
+    path = str(tmp_path / "session.litrpg")
+    for unique_key, value in zip(skill_engine.get_history(), VALUES):
+        skill_engine.update_existing_entry_values(unique_key, [value, "1"])
+    skill_engine.save(path)
+
+    # Write the characters themselves rather than their escapes, as other tools may
+    with open(path, "r") as json_file:
+        data = json.load(json_file)
+    with open(path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, ensure_ascii=False, indent=4)
+    assert os.path.getsize(path) > len(json.dumps(data, ensure_ascii=False, indent=4))
+
+    calls = list()
+    read_session(path, lambda done, total: calls.append((done, total)))
+    assert calls[-1] == (os.path.getsize(path), os.path.getsize(path))
+    assert snapshot(reload(path)) == snapshot(skill_engine)
+
+
+def test_characters_split_across_chunks():
+    text = json.dumps({"values": VALUES, "after": 1}, ensure_ascii=False)
+    decoder = _StreamingDecoder(io.BytesIO(text.encode("utf-8")), len(text.encode("utf-8")), chunk_size=1)
+    assert decoder.decode() == {"values": VALUES, "after": 1}
+    assert decoder.read_count == len(text.encode("utf-8"))
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from data.categories import Category, CategoryProperty
+from data.derived_values import get_entry_variables, to_variable_name
+from data.entries import Entry
+from utils.expressions import compile_expression
+
+
+@pytest.fixture
+def quest_engine(make_engine):
+    def build(seed):
+        engine = make_engine(Category("Quest", [CategoryProperty("Amount", False)], "", "", modifications=[["XP", "xp + amount"], ["Gold", "gold * 2 - amount"]]), Category("Note", [CategoryProperty("Text", False)], "", ""))
+        engine.state_simulation.interval = 4  # Plenty of checkpoints for a small history
+        rng = random.Random(seed)
+        for _ in range(40):
+            add_random_entry(engine, rng)
+        return engine, rng
+    return build
+
+
+def add_random_entry(engine, rng):
+    if rng.random() < 0.8:
+        engine.add_entry(Entry("Quest", [str(rng.randint(-5, 20))], character=rng.randrange(2)))
+    else:
+        engine.add_entry(Entry("Note", ["nothing"], character=rng.randrange(2)))
+
+
+def naive_state(engine, character, index):
+    # Replays every event up to index from scratch
+    state = dict()
+    for unique_key in list(engine.get_history())[:index + 1]:
+        entry = engine.get_entry(unique_key)
+        if entry.character != character:
+            continue
+
+        category = engine.get_categories()[entry.get_category()]
+        entry_variables = get_entry_variables(category, entry)
+        for variable, expression in category.get_modifications():
+            compiled = compile_expression(expression)
+            variables = {name: entry_variables.get(to_variable_name(name), state.get(to_variable_name(name), 0.0)) for name in compiled.variables}
+            state[to_variable_name(variable)] = compiled.evaluate(variables)
+    return state
+
+
+def new_values(entry, rng):
+    return [str(rng.randint(-5, 20))] if entry.get_category() == "Quest" else None
+
+
+def check_all(engine):
+    for index in range(len(engine.get_history())):
+        for character in range(2):
+            assert engine.get_character_state(character, index) == naive_state(engine, character, index)
+
+
+def test_state_at_matches_replay(quest_engine):
+    engine, _ = quest_engine(1)
+    check_all(engine)
+
+
+def test_state_at_after_mid_history_changes(quest_engine, random_edit):
+    engine, rng = quest_engine(2)
+    for step in range(60):
+        # Build every checkpoint first so each change has some to invalidate
+        engine.get_character_state(0, len(engine.get_history()) - 1)
+        random_edit(engine, rng, add_random_entry, new_values)
+
+        index = rng.randrange(len(engine.get_history()))
+        for character in range(2):
+            assert engine.get_character_state(character, index) == naive_state(engine, character, index), step
+    check_all(engine)
+
+
+def test_warm_up_matches_replay(quest_engine):
+    engine, rng = quest_engine(3)
+    engine.state_simulation.clear()
+    engine.state_simulation.warm_up()
+    engine.state_simulation.worker.join()
+    assert len(engine.state_simulation.checkpoints) == len(engine.get_history()) // 4
+    check_all(engine)
+
+    # A change while warming up discards the stale work
+    engine.state_simulation.clear()
+    engine.state_simulation.warm_up()
+    engine.set_current_history_index(5)
+    add_random_entry(engine, rng)
+    engine.state_simulation.worker.join()
+    check_all(engine)
@@ -0,0 +1,54 @@
+import random
+import re
+
+from data.categories import Category, CategoryProperty
+from data.entries import Entry
+
+WORDS = ["sword", "swift", "shield", "fire", "fireball", "ice", "storm", "stone"]
+
+
+def add_entry(engine, rng):
+    category = rng.choice(list(engine.get_categories()))
+    engine.add_entry(Entry(category, [" ".join(rng.choices(WORDS, k=rng.randint(1, 4))), rng.choice(WORDS)], character=rng.randrange(2)))
+
+
+def new_values(entry, rng):
+    return [" ".join(rng.choices(WORDS, k=rng.randint(1, 4))), rng.choice(WORDS)]
+
+
+def brute_force(engine, query, prefix, category_name, character):
+    # Every field whose words hold the query's words in order, scanning all live entries
+    tokens = query.lower().split()
+    hits = set()
+    for unique_key, entry in engine.entries.items():
+        if (category_name is not None and entry.get_category() != category_name) or (character is not None and entry.character != character):
+            continue
+        for field_index, value in enumerate(entry.get_values()):
+            words = re.findall(r"\w+", value.lower())
+            for start in range(len(words) - len(tokens) + 1):
+                window = words[start:start + len(tokens)]
+                if window[:-1] == tokens[:-1] and (window[-1].startswith(tokens[-1]) if prefix else window[-1] == tokens[-1]):
+                    hits.add((unique_key, field_index))
+    return hits
+
+
+def test_scoped_searches_match_a_scan(make_engine, random_edit):
+    properties = [CategoryProperty("Name", False), CategoryProperty("Element", False)]
+    engine = make_engine(Category("Skill", list(properties), "", ""), Category("Spell", list(properties), "", ""))
+    rng = random.Random(12)
+    for _ in range(30):
+        add_entry(engine, rng)
+
+    for step in range(300):
+        random_edit(engine, rng, add_entry, new_values)
+        if step == 150:
+            engine.edit_category("Spell", Category("Magic", list(properties), "", ""))
+
+        query = " ".join(rng.choices(WORDS, k=rng.randint(1, 2)))
+        prefix = rng.random() < 0.5
+        if prefix:
+            query = query[:-rng.randint(0, 2)] or query
+        category_name = rng.choice([None, "Skill", "Spell", "Magic"])
+        character = rng.choice([None, 0, 1])
+        expected = brute_force(engine, query, prefix, category_name, character)
+        assert set(engine.search_entries(query, prefix, category_name, character)) == expected
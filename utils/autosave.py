@@ -0,0 +1,89 @@
+"""
+Background autosaving for an engine.
+
+AutosaveService listens for committed edits and, once the session has been quiet for delay seconds, saves it with
+save_in_background - so the engine's thread only ever captures what changed (a copy-on-write snapshot of the touched
+entries, or a full export the first time a path is saved) and the serialising & disk access all happen on the
+engine's writer thread. Rapid edits restart the wait so they coalesce into a single save. Just moving through the
+history (or loading a session) isn't an edit, so never rewrites a session by itself.
+"""
+import threading
+import time
+
+
+class AutosaveService:
+    def __init__(self, engine, delay=3.0, dispatch=None):
+        """
+        Dispatch(callback) must run callback on the engine's thread - our debounce timer fires on its own thread. It
+        defaults to calling straight away, which is only safe if nothing else edits the engine meanwhile (the Qt shell
+        queues the call onto its event loop instead).
+        """
+        self.engine = engine
+        self.delay = delay
+        self.dispatch = dispatch if dispatch is not None else (lambda callback: callback())
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.timer = None
+        self.pending = False  # An edit is waiting on our timer - a fired timer whose call is still queued checks this
+
+        # Outcome of the most recent save we know of (manual saves can be tracked too)
+        self.last_saved = None  # time.time() it finished
+        self.last_error = None
+        self.status_listeners = list()  # Called (on the engine's thread) with us whenever a save finishes
+
+        engine.add_change_listener(self.changed)
+
+    def stop(self):
+        self.engine.remove_change_listener(self.changed)
+        self.cancel()
+
+    def cancel(self):
+        with self.lock:
+            self.pending = False
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def changed(self, edited=True):
+        # Only edits to sessions that already have somewhere to go are autosaved
+        if not edited or not self.enabled or self.engine.session_path is None:
+            return
+
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.pending = True
+            self.timer = threading.Timer(self.delay, self.dispatch, (self.__save_pending,))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def __save_pending(self):
+        # On the engine's thread - we may have been cancelled (e.g. by a load) since our timer fired
+        with self.lock:
+            pending = self.pending
+        if pending:
+            self.save_now()
+
+    def save_now(self):
+        # On the engine's thread
+        if self.engine.session_path is None or self.engine.in_batch():
+            return None
+        return self.track(self.engine.save_in_background())
+
+    def track(self, future):
+        # Reports the outcome of a save made elsewhere (e.g. an explicit save) along with our own, which it covers
+        self.cancel()
+        future.add_done_callback(self.__finished)
+        return future
+
+    def __finished(self, future):
+        # On the writer thread
+        error = future.exception()
+        if error is None:
+            self.last_saved = time.time()
+            self.last_error = None
+        else:
+            self.last_error = error
+
+        for listener in list(self.status_listeners):
+            self.dispatch(lambda listener=listener: listener(self))
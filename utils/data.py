@@ -29,11 +29,21 @@ def convert_to_dict(obj):
     })
 
     #  Populate the dictionary with object properties
-    obj_dict.update(obj.__dict__)
+    obj_dict.update(to_serialisable_dict(obj))
 
     return obj_dict
 
 
+def to_serialisable_dict(obj):
+    """
+    Returns the plain dict representation of one of our data objects. Objects that don't carry a __dict__ (i.e. use
+    __slots__) provide their own via to_json.
+    """
+    if hasattr(obj, "to_json"):
+        return obj.to_json()
+    return obj.__dict__
+
+
 def dict_to_obj(our_dict):
     """
     Function that takes in a dict and returns a custom object associated with the dict.
@@ -0,0 +1,353 @@
+"""
+Compile once expression evaluation for the Parser grammar.
+
+Parser interprets its source character by character every time it is evaluated. Here an expression is tokenized and
+parsed into a small syntax tree once, which is then turned into a tree of closures. Compiled expressions are cached by
+their source text so evaluating the same formula against different variables skips parsing entirely.
+
+Results are identical to Parser: the same operations are applied in the same order (additions are summed from 0,
+division multiplies by the reciprocal) and evaluation errors (unrecognised variables, division by zero) carry the same
+messages. Sources that don't parse cleanly fall back to Parser on evaluation so syntax errors, and the order they are
+raised in relative to evaluation errors, are reported exactly as before.
+"""
+from functools import lru_cache
+
+from utils.string_utils import Parser
+
+# Optional - only required for batch evaluation, and slow to import so it is loaded when that is first used
+numpy = None
+
+CONSTANTS = {
+    'pi': 3.141592653589793,
+    'e': 2.718281828459045
+}
+WHITESPACE = ' \t\n\r'
+NUMBER_CHARACTERS = '0123456789.'
+NAME_CHARACTERS = '_abcdefghijklmnopqrstuvwxyz0123456789'
+OPERATORS = '+-*/()'
+
+
+class ExpressionSyntaxError(Exception):
+    pass
+
+
+def tokenize(source):
+    """
+    Splits source into (Kind, Value, Index) tokens where kind is one of "number", "name", an operator character or
+    "end". Numbers and names are lexed exactly as Parser does.
+    """
+    tokens = list()
+    index = 0
+    length = len(source)
+    while index < length:
+        char = source[index]
+        if char in WHITESPACE:
+            index += 1
+        elif char in NUMBER_CHARACTERS:
+            start = index
+            while index < length and source[index] in NUMBER_CHARACTERS:
+                index += 1
+            text = source[start:index]
+            if text.count('.') > 1:
+                raise ExpressionSyntaxError("Extra period in number at character " + str(start))
+            try:
+                tokens.append(("number", float(text), start))
+            except ValueError:
+                raise ExpressionSyntaxError("Invalid number at character " + str(start))
+        elif char in OPERATORS:
+            tokens.append((char, char, index))
+            index += 1
+        elif char.lower() in NAME_CHARACTERS:
+            start = index
+            while index < length and source[index].lower() in NAME_CHARACTERS:
+                index += 1
+            tokens.append(("name", source[start:index], start))
+        else:
+            raise ExpressionSyntaxError("Unexpected character at " + str(index))
+    tokens.append(("end", None, length))
+    return tokens
+
+
+class _TreeBuilder:
+    """
+    Recursive descent over tokens mirroring Parser's grammar. Nodes are tuples:
+        ("number", value)
+        ("variable", name)
+        ("negate", node)
+        ("add", [(is_subtraction, node), ...])
+        ("multiply", [(is_division, node, operator index), ...])
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0]
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def build(self):
+        node = self.addition()
+        if self.peek() != "end":
+            raise ExpressionSyntaxError("Unexpected token at " + str(self.tokens[self.position][2]))
+        return node
+
+    def addition(self):
+        terms = [(False, self.multiplication())]
+        while self.peek() in "+-":
+            operator = self.take()[0]
+            terms.append((operator == "-", self.multiplication()))
+        return ("add", terms)
+
+    def multiplication(self):
+        factors = [(False, self.parenthesis(), None)]
+        while self.peek() in "*/":
+            operator = self.take()
+            factors.append((operator[0] == "/", self.parenthesis(), operator[2]))
+        return ("multiply", factors)
+
+    def parenthesis(self):
+        if self.peek() == "(":
+            self.take()
+            node = self.addition()
+            if self.peek() != ")":
+                raise ExpressionSyntaxError("No closing parenthesis")
+            self.take()
+            return node
+        return self.negative()
+
+    def negative(self):
+        if self.peek() == "-":
+            self.take()
+            return ("negate", self.parenthesis())
+        return self.value()
+
+    def value(self):
+        kind, value, _ = self.take()
+        if kind == "number":
+            return ("number", value)
+        if kind == "name":
+            if value in CONSTANTS:
+                return ("number", CONSTANTS[value])
+            return ("variable", value)
+        raise ExpressionSyntaxError("Expected a value")
+
+
+def _lookup(variables, name):
+    value = variables.get(name, None)
+    if value == None:
+        raise Exception("Unrecognized variable: '" + name + "'")
+    return float(value)
+
+
+def _compile_node(node):
+    kind = node[0]
+    if kind == "number":
+        value = node[1]
+        return lambda variables: value
+
+    if kind == "variable":
+        name = node[1]
+        return lambda variables: _lookup(variables, name)
+
+    if kind == "negate":
+        operand = _compile_node(node[1])
+        return lambda variables: -1 * operand(variables)
+
+    if kind == "add":
+        terms = [(is_subtraction, _compile_node(term)) for is_subtraction, term in node[1]]
+
+        # Parenthesised sub expressions and plain values are single term 'sums', keep those cheap
+        if len(terms) == 1:
+            term = terms[0][1]
+            return lambda variables: 0 + term(variables)
+
+        def add(variables):
+            total = 0
+            for is_subtraction, term in terms:
+                if is_subtraction:
+                    total += -1 * term(variables)
+                else:
+                    total += term(variables)
+            return total
+        return add
+
+    if kind == "multiply":
+        factors = [(is_division, _compile_node(factor), index) for is_division, factor, index in node[1]]
+        if len(factors) == 1:
+            factor = factors[0][1]
+            return lambda variables: 1.0 * factor(variables)
+
+        def multiply(variables):
+            value = 1.0
+            for is_division, factor, index in factors:
+                if is_division:
+                    denominator = factor(variables)
+                    if denominator == 0:
+                        raise Exception("Division by 0 kills baby whales (occured at index " + str(index) + ")")
+                    value *= 1.0 / denominator
+                else:
+                    value *= factor(variables)
+            return value
+        return multiply
+
+    raise ValueError("Unknown expression node: " + str(kind))
+
+
+def _collect_variables(node, names):
+    kind = node[0]
+    if kind == "variable":
+        names[node[1]] = None
+    elif kind == "negate":
+        _collect_variables(node[1], names)
+    elif kind == "add":
+        for _, term in node[1]:
+            _collect_variables(term, names)
+    elif kind == "multiply":
+        for _, factor, _ in node[1]:
+            _collect_variables(factor, names)
+    return names
+
+
+class _BatchState:
+    # Tracks which elements have already failed so each reports the first error it would have hit on its own
+    def __init__(self, size):
+        self.failed = numpy.zeros(size, dtype=bool)
+        self.errors = dict()  # Element Index -> Message
+
+    def fail(self, mask, message):
+        mask = mask & ~self.failed
+        for element in numpy.flatnonzero(mask):
+            self.errors[int(element)] = message
+        self.failed |= mask
+
+
+def _evaluate_batch_node(node, columns, size, state):
+    # Nodes are visited in the same order as the scalar closures so errors are attributed identically
+    kind = node[0]
+    if kind == "number":
+        return numpy.full(size, node[1])
+
+    if kind == "variable":
+        name = node[1]
+        if name not in columns:
+            state.fail(numpy.ones(size, dtype=bool), "Unrecognized variable: '" + name + "'")
+            return numpy.full(size, numpy.nan)
+        return columns[name]
+
+    if kind == "negate":
+        return -1 * _evaluate_batch_node(node[1], columns, size, state)
+
+    if kind == "add":
+        total = numpy.zeros(size)
+        for is_subtraction, term in node[1]:
+            if is_subtraction:
+                total = total + -1 * _evaluate_batch_node(term, columns, size, state)
+            else:
+                total = total + _evaluate_batch_node(term, columns, size, state)
+        return total
+
+    if kind == "multiply":
+        value = numpy.ones(size)
+        for is_division, factor, index in node[1]:
+            if is_division:
+                denominator = _evaluate_batch_node(factor, columns, size, state)
+                zero = denominator == 0
+                state.fail(zero, "Division by 0 kills baby whales (occured at index " + str(index) + ")")
+                value = value * (1.0 / numpy.where(zero, numpy.nan, denominator))
+            else:
+                value = value * _evaluate_batch_node(factor, columns, size, state)
+        return value
+
+    raise ValueError("Unknown expression node: " + str(kind))
+
+
+class CompiledExpression:
+    def __init__(self, source):
+        self.source = source
+        try:
+            self.tree = _TreeBuilder(tokenize(source)).build()
+        except ExpressionSyntaxError:
+            self.tree = None
+
+        if self.tree is not None:
+            self.variables = tuple(_collect_variables(self.tree, dict()).keys())
+            self.function = _compile_node(self.tree)
+        else:
+            self.variables = ()
+            self.function = None
+
+    def is_valid(self):
+        return self.tree is not None
+
+    def evaluate(self, variables=None):
+        if variables is None:
+            variables = {}
+
+        # Let Parser report the problem, exactly as it always has
+        if self.function is None:
+            return Parser(self.source, variables).getValue()
+
+        for var in variables.keys():
+            if var in CONSTANTS:
+                raise Exception("Cannot redefine the value of " + var)
+        return self.function(variables)
+
+    def evaluate_batch(self, columns):
+        """
+        Evaluates the expression for every element of the given variable columns (1D array likes, or scalars which are
+        broadcast) in one vectorised pass. Returns (values, errors) where values is a float array holding NaN for any
+        element that failed and errors maps those element indices to the message evaluating them one at a time would
+        have raised (e.g. division by zero). Requires numpy.
+        """
+        global numpy
+        if numpy is None:
+            try:
+                import numpy
+            except ImportError:
+                raise ImportError("numpy is required for batch evaluation")
+
+        for var in columns.keys():
+            if var in CONSTANTS:
+                raise Exception("Cannot redefine the value of " + var)
+
+        names = list(columns.keys())
+        arrays = numpy.broadcast_arrays(*[numpy.atleast_1d(numpy.asarray(columns[name], dtype=float)) for name in names]) if len(names) != 0 else []
+        if len(arrays) != 0 and arrays[0].ndim != 1:
+            raise ValueError("Batch columns must be one dimensional")
+        size = len(arrays[0]) if len(arrays) != 0 else 1
+        columns = dict(zip(names, arrays))
+
+        # Invalid sources have no tree to vectorise, let Parser report on each element
+        if self.tree is None:
+            values = numpy.full(size, numpy.nan)
+            errors = dict()
+            for element in range(size):
+                try:
+                    values[element] = self.evaluate({name: float(column[element]) for name, column in columns.items()})
+                except Exception as error:
+                    errors[element] = str(error)
+            return values, errors
+
+        state = _BatchState(size)
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            values = numpy.array(_evaluate_batch_node(self.tree, columns, size, state), dtype=float)
+        values[state.failed] = numpy.nan
+        return values, state.errors
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source) -> CompiledExpression:
+    return CompiledExpression(source)
+
+
+def evaluate(source, variables=None):
+    return compile_expression(source).evaluate(variables)
+
+
+def evaluate_batch(source, columns):
+    return compile_expression(source).evaluate_batch(columns)
@@ -244,7 +244,7 @@ class HistorySheetLayoutHandler(SystemSheetLayoutHandler):
     def __init__(self, gsheets_connector, target_spreadsheet, target_worksheet):
         super().__init__(gsheets_connector, target_spreadsheet, target_worksheet)
 
-    def write_historical_data(self, history, entries, categorites, characters, start_inclusive, end_exclusive):
+    def write_historical_data(self, history, entries, entry_ids, categorites, characters, start_inclusive, end_exclusive):
         # Loop through the given part of the history
         counter = start_inclusive
         for unique_key in history[start_inclusive:end_exclusive + 1]:
@@ -274,7 +274,7 @@ class HistorySheetLayoutHandler(SystemSheetLayoutHandler):
             # Write out with a buffer line
             str_counter = f"{counter:03}"
             self.write_next(([[characters[entry.character], str_counter]]))
-            self.write_next(payload, name="id_" + unique_key)
+            self.write_next(payload, name="id_" + entry_ids.get_uuid(unique_key))
             self.write_next([["", ""]])
             counter += 1
 
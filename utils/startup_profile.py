@@ -0,0 +1,80 @@
+"""
+Startup timing for the GUI.
+
+profile_startup relaunches the given script under `python -X importtime` with STARTUP_PROBE_VARIABLE set, which makes
+the app announce (FIRST_WINDOW_MARKER on stdout) and quit as soon as its first window is up. The report is the wall
+time until then, the slowest imports and whether the subsystems we load lazily were imported during startup.
+"""
+import os
+import sys
+import tempfile
+import time
+
+STARTUP_PROBE_VARIABLE = "LITRPG_STARTUP_PROBE"
+FIRST_WINDOW_MARKER = "LITRPG_FIRST_WINDOW"
+DEFERRED_PACKAGES = ("pygsheets", "googleapiclient", "enchant")
+
+
+def parse_import_times(output):
+    # [(Module, Self us, Cumulative us, Depth)] from -X importtime's stderr, depth 0 being imported by the app itself
+    imports = list()
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Column headings
+
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    return imports
+
+
+def format_report(elapsed, imports, top=15):
+    lines = list()
+    if elapsed is None:
+        lines.append("Time to first window: the window never appeared")
+    else:
+        lines.append("Time to first window: {:.1f} ms".format(elapsed * 1000.0))
+    lines.append("Total import time: {:.1f} ms".format(sum(self_time for _, self_time, _, _ in imports) / 1000.0))
+
+    lines.append("Slowest top level imports (cumulative):")
+    top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: entry[2], reverse=True)
+    for name, _, cumulative, _ in top_level[:top]:
+        lines.append("    {:<40} {:10.1f} ms".format(name, cumulative / 1000.0))
+
+    lines.append("Deferred subsystems:")
+    for package in DEFERRED_PACKAGES:
+        loaded = [entry for entry in imports if entry[0] == package or entry[0].startswith(package + ".")]
+        if len(loaded) == 0:
+            lines.append("    {:<40} {:>13}".format(package, "not imported"))
+        else:
+            lines.append("    {:<40} {:10.1f} ms".format(package, sum(entry[1] for entry in loaded) / 1000.0))
+    return "\n".join(lines)
+
+
+def profile_startup(script, arguments=()):
+    import subprocess
+
+    environment = dict(os.environ)
+    environment[STARTUP_PROBE_VARIABLE] = "1"
+
+    # Import timings go to a file - they can outgrow a pipe while we're waiting on stdout
+    with tempfile.TemporaryFile(mode="w+") as timings:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-X", "importtime", script] + list(arguments), stdout=subprocess.PIPE, stderr=timings, env=environment, text=True)
+        elapsed = None
+        for line in process.stdout:
+            if line.strip() == FIRST_WINDOW_MARKER:
+                elapsed = time.perf_counter() - start
+                break
+        process.stdout.close()
+        process.wait()
+
+        timings.seek(0)
+        imports = parse_import_times(timings.read())
+
+    print(format_report(elapsed, imports))
+    return 0 if elapsed is not None else 1